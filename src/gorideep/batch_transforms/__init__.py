@@ -0,0 +1,4 @@
+"""
+Batch Transforms are transformations applied to collated data batches on the training device,
+before module forward passes, which include device transfers and batched label encoding.
+"""
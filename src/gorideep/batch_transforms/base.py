@@ -0,0 +1,37 @@
+class BaseBatchTransform:
+    """
+    Base batch transform class for processing collated data batches on the training device.
+    Subclasses of this class are expected to implement the `__call__` method.
+
+    Batch transforms are invoked by module transforms (see
+    `gorideep.module_transforms.base.BaseModuleTransform`) on every data batch, and should use
+    vectorized operations on `self._device` rather than per data point operations.
+
+    :param device: torch.device
+        PyTorch device to process data batches on.
+    :param logger: any, optional
+        Logger object in case logging are needed.
+    """
+
+
+    def __init__(
+        self,
+        device,
+        logger=None
+    ):
+
+        self._device = device
+        self._logger = logger
+
+
+    def __call__(
+        self,
+        data_batch
+    ):
+        """
+        :param data_batch: dict of str -> any
+            The data batch to process.
+            Its entries may be read, modified, added or removed.
+        """
+
+        raise NotImplementedError()
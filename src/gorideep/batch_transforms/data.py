@@ -0,0 +1,43 @@
+from gorideep.batch_transforms.base import BaseBatchTransform
+
+
+
+class DataBatchTransform(BaseBatchTransform):
+    """
+    Runs a data transform on whole data batches on the device, using its batched implementation
+    (see `gorideep.data_transforms.base.BaseDataTransform.transform_batch`).
+
+    This allows moving batchable per data point work (e.g. label encoding) out of the DataLoader
+    workers, into a single vectorized operation per data batch. The data transform must then be
+    removed from the dataset.
+
+    :param data_transform: gorideep.data_transforms.base.BaseDataTransform
+        Data transform to run. Must implement `transform_batch`.
+    :param device: torch.device
+        PyTorch device to create output tensors on.
+
+    :param logger: any, optional
+        Logger object in case logging are needed.
+    """
+
+    def __init__(
+        self,
+        data_transform,
+        device,
+        logger=None
+    ):
+
+        super().__init__(
+            device,
+            logger
+        )
+
+        self._data_transform = data_transform
+
+
+    def __call__(
+        self,
+        data_batch
+    ):
+
+        return self._data_transform.transform_batch(data_batch, self._device)
@@ -0,0 +1,52 @@
+from gorideep.batch_transforms.base import BaseBatchTransform
+from gorideep.utils.device import move_data_to_device
+
+
+
+class DeviceBatchTransform(BaseBatchTransform):
+    """
+    Moves the tensors of a data batch to the device.
+
+    CPU tensors are pinned before being transferred with `non_blocking=True`, so that transfers
+    do not block the host. Using a DataLoader with `pin_memory=True` avoids the extra pinned copy.
+
+    :param device: torch.device
+        PyTorch device to send tensors to.
+    :param key_list: list of str, optional
+        Keys of the data batch entries to move.
+        If not provided, all entries are moved (recursively through dicts, lists and tuples).
+    :param non_blocking: bool, default=True
+        If True, transfers are asynchronous when possible.
+
+    :param logger: any, optional
+        Logger object in case logging are needed.
+    """
+
+    def __init__(
+        self,
+        device,
+        key_list=None,
+        non_blocking=True,
+        logger=None
+    ):
+
+        super().__init__(
+            device,
+            logger
+        )
+
+        self._key_list = key_list
+        self._non_blocking = non_blocking
+
+
+    def __call__(
+        self,
+        data_batch
+    ):
+
+        key_list = data_batch.keys() if self._key_list is None else self._key_list
+
+        for key in list(key_list):
+            data_batch[key] = move_data_to_device(data_batch[key], self._device, self._non_blocking)
+
+        return data_batch
@@ -1,3 +1,7 @@
+import numpy
+
+
+
 class BaseDataCounter:
     """
     Base class for data counters.
@@ -21,6 +25,118 @@ class BaseDataCounter:
         raise NotImplementedError
 
 
+    def count_batch(
+        self,
+        dataset_name,
+        metadata_point_list
+    ):
+        """
+        Accumulates data counts from multiple dataset items.
+        Subclasses may override this method to gather the metadata points into columnar arrays and
+        call `count_arrays`. By default, `count` is called on every metadata point.
+
+        :param dataset_name: str
+            Name of the dataset that the metadata points come from.
+        :param metadata_point_list: list of dict
+            A list of dicts containing metadata information of dataset items.
+        """
+
+        for metadata_point in metadata_point_list:
+            self.count(dataset_name, metadata_point)
+
+
+    def count_arrays(
+        self,
+        dataset_name,
+        num_items,
+        metadata_arr_dict
+    ):
+        """
+        Accumulates data counts from multiple dataset items in columnar format.
+
+        :param dataset_name: str
+            Name of the dataset that the metadata points come from.
+        :param num_items: int
+            Number of dataset items.
+        :param metadata_arr_dict: dict of str -> numpy.ndarray
+            A dict with the metadata values of all dataset items concatenated into a flat array,
+            indexed by metadata key (the same keys as in metadata points).
+            Dataset items without a metadata key simply do not contribute values to its array.
+        """
+
+        raise NotImplementedError
+
+
+    def get_count_arrs(
+        self
+    ):
+        """
+        Returns the internal count arrays, always in the same order.
+        The returned arrays are not copies, so modifying them modifies the internal state.
+
+        :return: list of numpy.ndarray
+            The internal count arrays.
+        """
+
+        raise NotImplementedError
+
+
+    def merge(
+        self,
+        other
+    ):
+        """
+        Accumulates the data counts of another data counter of the same type and configuration.
+
+        :param other: BaseDataCounter
+            Data counter to merge data counts from.
+        """
+
+        self.merge_count_arrs(other.get_count_arrs())
+
+
+    def merge_count_arrs(
+        self,
+        count_arr_list
+    ):
+        """
+        Accumulates data counts from count arrays, following the same order as `get_count_arrs`.
+
+        :param count_arr_list: list of numpy.ndarray
+            Count arrays to accumulate.
+        """
+
+        for count_arr, other_count_arr in zip(self.get_count_arrs(), count_arr_list):
+            count_arr += numpy.asarray(other_count_arr).astype(count_arr.dtype)
+
+        self._reset_derived_data()
+
+
+    def _reset_derived_data(
+        self
+    ):
+        """
+        Resets data derived from the data counts (e.g. weights), which must be re-computed.
+        """
+
+        pass
+
+
+    def get_config_str(
+        self
+    ):
+        """
+        Returns a string describing the data counter type and configuration.
+        Data counters with the same configuration string must produce the same data counts when
+        counting the same dataset items.
+
+        :return: str
+            The configuration string.
+        """
+
+        raise NotImplementedError
+
+
     def save(
         self,
         dirname
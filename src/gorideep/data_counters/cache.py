@@ -0,0 +1,164 @@
+import os
+import copy
+import shutil
+import hashlib
+
+import numpy
+
+from gorideep.data_counters.counting import count_dataset
+
+
+
+def get_data_counter_cache_key(
+    data_counter,
+    dataset_name,
+    dataset,
+    dataset_idxs=None
+):
+    """
+    Computes the cache key of the data counts of a dataset, for a specific data counter.
+    The key changes whenever the data counter configuration, the dataset fingerprint or the
+    counted dataset indices change.
+
+    :param data_counter: gorideep.data_counters.base.BaseDataCounter
+        Data counter to compute the cache key for.
+    :param dataset_name: str
+        Name of the dataset.
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to compute the cache key for.
+    :param dataset_idxs: sequence of int, optional
+        Indices of the counted dataset items.
+        If not provided, all dataset items are assumed to be counted.
+
+    :return: str
+        Hex digest of the cache key.
+    """
+
+    cache_key_hash = hashlib.sha256()
+
+    cache_key_hash.update(data_counter.get_config_str().encode("utf-8"))
+    cache_key_hash.update(dataset_name.encode("utf-8"))
+    cache_key_hash.update(dataset.get_fingerprint().encode("utf-8"))
+
+    if dataset_idxs is not None:
+        cache_key_hash.update(numpy.asarray(dataset_idxs, dtype=numpy.int64).tobytes())
+
+    return cache_key_hash.hexdigest()
+
+
+def count_dataset_cached(
+    data_counter_list,
+    dataset_name,
+    dataset,
+    cache_dirname,
+    dataset_idxs=None,
+    count_fn=count_dataset,
+    **count_fn_kwargs
+):
+    """
+    Accumulates data counts from a dataset into multiple data counters, reusing data counts
+    persisted in a cache directory whenever possible.
+
+    The data counts of every data counter are stored in a cache subdirectory named after
+    its cache key (see `get_data_counter_cache_key`), with the data counter `save` format.
+    Data counters with cached data counts load and merge them, and the rest count the dataset
+    with `count_fn` and store their data counts in the cache.
+
+    :param data_counter_list: list of gorideep.data_counters.base.BaseDataCounter
+        Data counters to accumulate data counts into.
+    :param dataset_name: str
+        Name of the dataset.
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to load metadata points from.
+    :param cache_dirname: str
+        Name of the cache directory. Created if it does not exist.
+    :param dataset_idxs: sequence of int, optional
+        Indices of the dataset items to count.
+        If not provided, all dataset items are counted.
+    :param count_fn: callable, default=gorideep.data_counters.counting.count_dataset
+        Counting function to use on cache misses (e.g. `count_dataset_parallel`).
+    :param count_fn_kwargs: dict
+        Extra keyword arguments for `count_fn`.
+    """
+
+    os.makedirs(cache_dirname, exist_ok=True)
+
+    # Look up cached data counts
+
+    miss_data_counter_list = []
+    miss_cache_subdirname_list = []
+
+    for data_counter in data_counter_list:
+
+        cache_key = get_data_counter_cache_key(data_counter, dataset_name, dataset, dataset_idxs)
+        cache_subdirname = os.path.join(cache_dirname, cache_key)
+
+        if os.path.isdir(cache_subdirname):
+
+            cached_data_counter = _create_empty_copy(data_counter)
+            cached_data_counter.load(cache_subdirname)
+            data_counter.merge(cached_data_counter)
+
+        else:
+
+            miss_data_counter_list.append(data_counter)
+            miss_cache_subdirname_list.append(cache_subdirname)
+
+    if len(miss_data_counter_list) == 0: return
+
+    # Count dataset with empty data counters on cache misses
+
+    new_data_counter_list = [_create_empty_copy(data_counter) for data_counter in miss_data_counter_list]
+
+    count_fn(
+        new_data_counter_list,
+        dataset_name,
+        dataset,
+        dataset_idxs=dataset_idxs,
+        **count_fn_kwargs
+    )
+
+    # Store data counts into the cache and merge them
+
+    for data_counter, new_data_counter, cache_subdirname in zip(
+        miss_data_counter_list,
+        new_data_counter_list,
+        miss_cache_subdirname_list
+    ):
+
+        # Save into a temporary directory first, so that partial entries are never loaded
+
+        tmp_cache_subdirname = "{:s}.{:d}.tmp".format(cache_subdirname, os.getpid())
+        os.makedirs(tmp_cache_subdirname, exist_ok=True)
+
+        new_data_counter.save(tmp_cache_subdirname)
+
+        try:
+            os.rename(tmp_cache_subdirname, cache_subdirname)
+        except OSError:
+            shutil.rmtree(tmp_cache_subdirname, ignore_errors=True)
+
+        data_counter.merge(new_data_counter)
+
+
+def _create_empty_copy(
+    data_counter
+):
+    """
+    Creates a copy of a data counter with all data counts set to zero.
+
+    :param data_counter: gorideep.data_counters.base.BaseDataCounter
+        Data counter to copy.
+
+    :return: gorideep.data_counters.base.BaseDataCounter
+        The empty copy of the data counter.
+    """
+
+    empty_data_counter = copy.deepcopy(data_counter)
+
+    for count_arr in empty_data_counter.get_count_arrs():
+        count_arr[:] = 0
+
+    empty_data_counter._reset_derived_data()
+
+    return empty_data_counter
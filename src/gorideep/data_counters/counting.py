@@ -0,0 +1,230 @@
+import copy
+import multiprocessing
+
+import numpy
+import torch
+
+from gorideep.utils.device import get_collective_device
+
+
+
+def count_dataset(
+    data_counter_list,
+    dataset_name,
+    dataset,
+    dataset_idxs=None,
+    chunk_size=4096
+):
+    """
+    Accumulates data counts from a dataset into multiple data counters.
+    Metadata points are streamed from the dataset in chunks (via `getitems_metadata`), and every
+    chunk is accumulated with a single `count_batch` call per data counter.
+
+    :param data_counter_list: list of gorideep.data_counters.base.BaseDataCounter
+        Data counters to accumulate data counts into.
+    :param dataset_name: str
+        Name of the dataset.
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to load metadata points from.
+    :param dataset_idxs: sequence of int, optional
+        Indices of the dataset items to count.
+        If not provided, all dataset items are counted.
+    :param chunk_size: int, default=4096
+        Number of metadata points to load per chunk.
+    """
+
+    if dataset_idxs is None:
+        dataset_idxs = range(dataset.get_num_items())
+
+    for chunk_start in range(0, len(dataset_idxs), chunk_size):
+
+        metadata_point_list = dataset.getitems_metadata(dataset_idxs[chunk_start:chunk_start + chunk_size])
+
+        for data_counter in data_counter_list:
+            data_counter.count_batch(dataset_name, metadata_point_list)
+
+
+
+########
+# PARALLEL COUNTING
+########
+
+
+# Per-worker state of the process pool used in `count_dataset_parallel`
+_worker_state_dict = {}
+
+
+def _init_count_worker(
+    data_counter_list,
+    dataset_name,
+    dataset
+):
+
+    _worker_state_dict["data_counter_list"] = data_counter_list
+    _worker_state_dict["dataset_name"] = dataset_name
+    _worker_state_dict["dataset"] = dataset
+
+
+def _count_worker_chunk(
+    chunk_dataset_idxs
+):
+
+    data_counter_list = _worker_state_dict["data_counter_list"]
+
+    for data_counter in data_counter_list:
+        for count_arr in data_counter.get_count_arrs():
+            count_arr[:] = 0
+
+    metadata_point_list = _worker_state_dict["dataset"].getitems_metadata(chunk_dataset_idxs)
+
+    for data_counter in data_counter_list:
+        data_counter.count_batch(_worker_state_dict["dataset_name"], metadata_point_list)
+
+    return [
+        [count_arr.copy() for count_arr in data_counter.get_count_arrs()]
+        for data_counter in data_counter_list
+    ]
+
+
+def count_dataset_parallel(
+    data_counter_list,
+    dataset_name,
+    dataset,
+    dataset_idxs=None,
+    chunk_size=4096,
+    num_workers=None,
+    mp_context=None
+):
+    """
+    Accumulates data counts from a dataset into multiple data counters, using a process pool.
+    Dataset index chunks are counted by the pool workers into empty copies of the data counters,
+    and the partial counts are merged back into the original data counters.
+
+    :param data_counter_list: list of gorideep.data_counters.base.BaseDataCounter
+        Data counters to accumulate data counts into.
+    :param dataset_name: str
+        Name of the dataset.
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to load metadata points from.
+        Sent once to every worker.
+    :param dataset_idxs: sequence of int, optional
+        Indices of the dataset items to count.
+        If not provided, all dataset items are counted.
+    :param chunk_size: int, default=4096
+        Number of metadata points to load per chunk.
+    :param num_workers: int, optional
+        Number of worker processes.
+        If not provided, the number of CPUs is used.
+    :param mp_context: str, optional
+        Multiprocessing start method (e.g. "fork", "spawn").
+        If not provided, the default start method is used.
+    """
+
+    if dataset_idxs is None:
+        dataset_idxs = range(dataset.get_num_items())
+
+    chunk_dataset_idxs_list = [
+        dataset_idxs[chunk_start:chunk_start + chunk_size]
+        for chunk_start in range(0, len(dataset_idxs), chunk_size)
+    ]
+
+    worker_data_counter_list = copy.deepcopy(data_counter_list)
+
+    with multiprocessing.get_context(mp_context).Pool(
+        processes=num_workers,
+        initializer=_init_count_worker,
+        initargs=(worker_data_counter_list, dataset_name, dataset)
+    ) as pool:
+
+        for chunk_count_arr_ll in pool.imap_unordered(_count_worker_chunk, chunk_dataset_idxs_list):
+            for data_counter, chunk_count_arr_list in zip(data_counter_list, chunk_count_arr_ll):
+                data_counter.merge_count_arrs(chunk_count_arr_list)
+
+
+########
+# DISTRIBUTED COUNTING
+########
+
+
+def count_dataset_distributed(
+    data_counter_list,
+    dataset_name,
+    dataset,
+    dataset_idxs=None,
+    chunk_size=4096
+):
+    """
+    Accumulates data counts from a dataset into multiple data counters, splitting dataset indices
+    among all subprocesses of a distributed setting.
+    Must be called by all subprocesses. Afterwards, all data counters hold the same data counts.
+
+    Partial counts are synchronized with a single all-reduce over all count arrays of all data
+    counters.
+
+    :param data_counter_list: list of gorideep.data_counters.base.BaseDataCounter
+        Data counters to accumulate data counts into.
+        Must be created with the same configuration and data counts in all subprocesses.
+    :param dataset_name: str
+        Name of the dataset.
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to load metadata points from.
+    :param dataset_idxs: sequence of int, optional
+        Indices of the dataset items to count.
+        If not provided, all dataset items are counted.
+    :param chunk_size: int, default=4096
+        Number of metadata points to load per chunk.
+    """
+
+    rank = torch.distributed.get_rank()
+    world_size = torch.distributed.get_world_size()
+
+    if dataset_idxs is None:
+        dataset_idxs = range(dataset.get_num_items())
+
+    # Count local shard, keeping track of the counts before counting
+
+    count_arr_list = [
+        count_arr
+        for data_counter in data_counter_list
+        for count_arr in data_counter.get_count_arrs()
+    ]
+
+    prev_count_arr = numpy.concatenate([count_arr.ravel() for count_arr in count_arr_list]).astype(numpy.int64)
+
+    count_dataset(
+        data_counter_list,
+        dataset_name,
+        dataset,
+        dataset_idxs=dataset_idxs[rank::world_size],
+        chunk_size=chunk_size
+    )
+
+    count_arr_list = [
+        count_arr
+        for data_counter in data_counter_list
+        for count_arr in data_counter.get_count_arrs()
+    ]
+
+    delta_count_arr = numpy.concatenate([count_arr.ravel() for count_arr in count_arr_list]).astype(numpy.int64)
+    delta_count_arr -= prev_count_arr
+
+    # Reduce count deltas in a single collective
+
+    device = get_collective_device()
+
+    with torch.no_grad():
+
+        delta_count_ten = torch.from_numpy(delta_count_arr).to(device)
+        torch.distributed.all_reduce(delta_count_ten, torch.distributed.ReduceOp.SUM)
+        delta_count_arr = delta_count_ten.cpu().numpy()
+
+    # Scatter synchronized counts back
+
+    offset = 0
+
+    for count_arr in count_arr_list:
+        count_arr.ravel()[:] = prev_count_arr[offset:offset + count_arr.size] + delta_count_arr[offset:offset + count_arr.size]
+        offset += count_arr.size
+
+    for data_counter in data_counter_list:
+        data_counter._reset_derived_data()
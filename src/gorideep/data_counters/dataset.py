@@ -46,6 +46,40 @@ class DatasetSizeDataCounter(BaseDataCounter):
         self._dataset_count_arr[dataset_idx] += 1
 
 
+    def count_batch(
+        self,
+        dataset_name,
+        metadata_point_list
+    ):
+
+        self.count_arrays(dataset_name, len(metadata_point_list), {})
+
+
+    def count_arrays(
+        self,
+        dataset_name,
+        num_items,
+        metadata_arr_dict
+    ):
+
+        dataset_idx = self._dataset_name_to_idx_dict[dataset_name]
+        self._dataset_count_arr[dataset_idx] += num_items
+
+
+    def get_count_arrs(
+        self
+    ):
+
+        return [self._dataset_count_arr]
+
+
+    def get_config_str(
+        self
+    ):
+
+        return "DatasetSizeDataCounter;{:s}".format(";".join(self._dataset_name_list))
+
+
     def save(
         self,
         dirname
@@ -9,6 +9,44 @@ from gorideep.data_counters.base import BaseDataCounter
 
 
 
+def _gather_metadata_arrs(
+    metadata_point_list,
+    metadata_key_list
+):
+    """
+    Gathers metadata values from multiple metadata points into flat columnar arrays.
+    Missing and `None` values are skipped.
+
+    :param metadata_point_list: list of dict
+        A list of dicts containing metadata information of dataset items.
+    :param metadata_key_list: list of str
+        Metadata keys to gather.
+
+    :return: dict of str -> numpy.ndarray
+        A dict with the concatenated metadata values, indexed by metadata key.
+    """
+
+    metadata_arr_dict = {}
+
+    for metadata_key in metadata_key_list:
+
+        metadata_value_list = [
+            metadata_point[metadata_key]
+            for metadata_point in metadata_point_list
+            if metadata_point.get(metadata_key, None) is not None
+        ]
+
+        if len(metadata_value_list) == 0: continue
+
+        metadata_arr_dict[metadata_key] = numpy.concatenate([
+            numpy.atleast_1d(numpy.asarray(metadata_value, dtype=numpy.int64))
+            for metadata_value in metadata_value_list
+        ])
+
+    return metadata_arr_dict
+
+
+
 class CategoryDataCounter(BaseDataCounter):
     """
     Counts categories from a dataset.
@@ -28,6 +66,8 @@ class CategoryDataCounter(BaseDataCounter):
 
         self._cat_metadata = CategoryMetadata(cat_subset_name)
 
+        self._cat_idx_name = "{:s}_cat_idx".format(self._cat_subset_name)
+
         # Initialize counters
 
         self._cat_idx_count_arr = numpy.zeros(
@@ -52,10 +92,68 @@ class CategoryDataCounter(BaseDataCounter):
 
         # Accumulate category counts
 
-        cat_idx_name = "{:s}_cat_idx".format(self._cat_subset_name)
-        if cat_idx_name not in metadata_point: return
+        if self._cat_idx_name not in metadata_point: return
+
+        self._cat_idx_count_arr[metadata_point[self._cat_idx_name]] += 1
+
+
+    def count_batch(
+        self,
+        dataset_name,
+        metadata_point_list
+    ):
+
+        self.count_arrays(
+            dataset_name,
+            len(metadata_point_list),
+            _gather_metadata_arrs(metadata_point_list, [self._cat_idx_name])
+        )
+
+
+    def count_arrays(
+        self,
+        dataset_name,
+        num_items,
+        metadata_arr_dict
+    ):
+
+        # Reset weights
+
+        self._cat_weight_arr = None
+
+        # Accumulate category counts
+
+        cat_idx_arr = metadata_arr_dict.get(self._cat_idx_name, None)
+        if cat_idx_arr is None: return
+
+        self._cat_idx_count_arr += numpy.bincount(
+            cat_idx_arr,
+            minlength=self._cat_idx_count_arr.shape[0]
+        ).astype(self._cat_idx_count_arr.dtype)
 
-        self._cat_idx_count_arr[metadata_point[cat_idx_name]] += 1
+
+    def get_count_arrs(
+        self
+    ):
+
+        return [self._cat_idx_count_arr]
+
+
+    def get_config_str(
+        self
+    ):
+
+        return "CategoryDataCounter;{:s};{:s}".format(
+            self._cat_subset_name,
+            ";".join(self._cat_metadata.cat_name_list)
+        )
+
+
+    def _reset_derived_data(
+        self
+    ):
+
+        self._cat_weight_arr = None
 
 
     def save(
@@ -125,6 +223,15 @@ class MultiAttributeDataCounter(BaseDataCounter):
 
         self._multiattr_metadata = MultiAttributeMetadata(multiattr_subset_name)
 
+        self._supattr_attr_idx_arr_name_list = [
+            (
+                supattr_name,
+                "{:s}_{:s}_pos_attr_idx_arr".format(self._multiattr_subset_name, supattr_name),
+                "{:s}_{:s}_neg_attr_idx_arr".format(self._multiattr_subset_name, supattr_name)
+            )
+            for supattr_name in self._multiattr_metadata.supattr_name_list
+        ]
+
         # Initialize counters
 
         self._supattr_idx_count_arr_ddict = {
@@ -155,17 +262,107 @@ class MultiAttributeDataCounter(BaseDataCounter):
 
         # Accumulate attribute counts
 
-        for supattr_name in self._multiattr_metadata.supattr_name_list:
+        for (
+            supattr_name,
+            supattr_pos_attr_idx_arr_name,
+            supattr_neg_attr_idx_arr_name
+        ) in self._supattr_attr_idx_arr_name_list:
 
-            supattr_pos_attr_idx_arr_name = "{:s}_{:s}_pos_attr_idx_arr".format(self._multiattr_subset_name, supattr_name)
             for supattr_attr_idx in metadata_point.get(supattr_pos_attr_idx_arr_name, []):
                 self._supattr_idx_count_arr_ddict[supattr_name]["positive"][supattr_attr_idx] += 1
 
-            supattr_neg_attr_idx_arr_name = "{:s}_{:s}_neg_attr_idx_arr".format(self._multiattr_subset_name, supattr_name)
             for supattr_attr_idx in metadata_point.get(supattr_neg_attr_idx_arr_name, []):
                 self._supattr_idx_count_arr_ddict[supattr_name]["negative"][supattr_attr_idx] += 1
 
 
+    def count_batch(
+        self,
+        dataset_name,
+        metadata_point_list
+    ):
+
+        metadata_key_list = []
+        for _, supattr_pos_attr_idx_arr_name, supattr_neg_attr_idx_arr_name in self._supattr_attr_idx_arr_name_list:
+            metadata_key_list.append(supattr_pos_attr_idx_arr_name)
+            metadata_key_list.append(supattr_neg_attr_idx_arr_name)
+
+        self.count_arrays(
+            dataset_name,
+            len(metadata_point_list),
+            _gather_metadata_arrs(metadata_point_list, metadata_key_list)
+        )
+
+
+    def count_arrays(
+        self,
+        dataset_name,
+        num_items,
+        metadata_arr_dict
+    ):
+
+        # Reset weights
+
+        self._supattr_weight_arr_ddict = None
+
+        # Accumulate attribute counts
+
+        for (
+            supattr_name,
+            supattr_pos_attr_idx_arr_name,
+            supattr_neg_attr_idx_arr_name
+        ) in self._supattr_attr_idx_arr_name_list:
+
+            for type_str, supattr_attr_idx_arr_name in [
+                ("positive", supattr_pos_attr_idx_arr_name),
+                ("negative", supattr_neg_attr_idx_arr_name)
+            ]:
+
+                supattr_attr_idx_arr = metadata_arr_dict.get(supattr_attr_idx_arr_name, None)
+                if supattr_attr_idx_arr is None: continue
+
+                supattr_idx_count_arr = self._supattr_idx_count_arr_ddict[supattr_name][type_str]
+                supattr_idx_count_arr += numpy.bincount(
+                    supattr_attr_idx_arr,
+                    minlength=supattr_idx_count_arr.shape[0]
+                ).astype(supattr_idx_count_arr.dtype)
+
+
+    def get_count_arrs(
+        self
+    ):
+
+        count_arr_list = []
+
+        for supattr_name in self._multiattr_metadata.supattr_name_list:
+            count_arr_list.append(self._supattr_idx_count_arr_ddict[supattr_name]["positive"])
+            count_arr_list.append(self._supattr_idx_count_arr_ddict[supattr_name]["negative"])
+
+        return count_arr_list
+
+
+    def get_config_str(
+        self
+    ):
+
+        return "MultiAttributeDataCounter;{:s};{:s}".format(
+            self._multiattr_subset_name,
+            ";".join(
+                "{:s}:{:d}".format(supattr_name, supattr_size)
+                for supattr_name, supattr_size in zip(
+                    self._multiattr_metadata.supattr_name_list,
+                    self._multiattr_metadata.supattr_size_list
+                )
+            )
+        )
+
+
+    def _reset_derived_data(
+        self
+    ):
+
+        self._supattr_weight_arr_ddict = None
+
+
     def save(
         self,
         dirname
@@ -27,3 +27,53 @@ class BaseDataTransform:
         """
 
         raise NotImplementedError()
+
+
+    def transform_batch(
+        self,
+        data_batch,
+        device=None
+    ):
+        """
+        Batched version of `__call__`, applied to an already collated data batch.
+        Subclasses may implement this method to process a whole batch with vectorized operations.
+
+        :param data_batch: dict of str -> any
+            The data batch to process.
+            Its entries may be read, modified, added or removed.
+        :param device: torch.device, optional
+            PyTorch device to create output tensors on (e.g. when running as a
+            `gorideep.batch_transforms.data.DataBatchTransform`).
+            If not provided, output tensors are created on the device of the input tensors, or on
+            CPU.
+        """
+
+        raise NotImplementedError()
+
+
+    def get_read_keys(
+        self
+    ):
+        """
+        Returns the data point keys that this data transform reads.
+        Used by `gorideep.data_transforms.compose.ComposeDataTransform` to schedule data transforms.
+
+        :return: list of str or None
+            The keys read, or None if unknown.
+        """
+
+        return None
+
+
+    def get_write_keys(
+        self
+    ):
+        """
+        Returns the data point keys that this data transform writes (adds, modifies or removes).
+        Used by `gorideep.data_transforms.compose.ComposeDataTransform` to schedule data transforms.
+
+        :return: list of str or None
+            The keys written, or None if unknown.
+        """
+
+        return None
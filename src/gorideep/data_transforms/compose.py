@@ -0,0 +1,302 @@
+import time
+
+import numpy
+
+from gorideep.data_transforms.base import BaseDataTransform
+
+
+
+class ComposeDataTransform(BaseDataTransform):
+    """
+    Applies multiple data transforms sequentially, as a pipeline compiled once on creation.
+
+    Data transforms may declare the keys they read and write (see `get_read_keys` and
+    `get_write_keys`). On compilation:
+
+        - Consecutive data transforms without key conflicts between them (no key written by one
+          and read or written by another) are fused into a single stage, which is executed and
+          timed as a unit. Data transforms with unknown keys always form their own stage.
+        - If `output_key_list` is provided, every key read or written by the data transforms that
+          is not an output is dropped right after the stage that last uses it.
+
+    Stage execution times can be recorded into histograms with power-of-two bins (in
+    microseconds). Note that every DataLoader worker records its own histograms.
+
+    :param data_transform_list: list of gorideep.data_transforms.base.BaseDataTransform
+        Data transforms to apply, in order.
+    :param output_key_list: list of str, optional
+        Keys that must be kept in the output data points.
+        If not provided, no keys are dropped.
+    :param record_timings: bool, default=False
+        If True, records stage execution times.
+
+    :param logger: any, optional
+        Logger object in case logging are needed.
+    """
+
+    _num_timing_bins = 32
+
+
+    def __init__(
+        self,
+        data_transform_list,
+        output_key_list=None,
+        record_timings=False,
+        logger=None
+    ):
+
+        super().__init__(
+            logger
+        )
+
+        self._data_transform_list = data_transform_list
+        self._output_key_list = output_key_list
+        self._record_timings = record_timings
+
+        # Compile pipeline
+
+        self._stage_list = self._compile()
+
+        self._stage_timing_count_arr = numpy.zeros(
+            shape=(len(self._stage_list), self._num_timing_bins),
+            dtype=numpy.int64
+        )
+
+
+    def _compile(
+        self
+    ):
+        """
+        Fuses data transforms into stages and computes the keys to drop after every stage.
+
+        :return: list of tuple
+            A list of stages, with the data transforms and the keys to drop after the stage.
+        """
+
+        # Fuse consecutive independent data transforms
+
+        stage_list = []
+
+        for data_transform in self._data_transform_list:
+
+            read_key_list = data_transform.get_read_keys()
+            write_key_list = data_transform.get_write_keys()
+
+            read_key_set = None if read_key_list is None else set(read_key_list)
+            write_key_set = None if write_key_list is None else set(write_key_list)
+
+            if len(stage_list) > 0:
+
+                stage_data_transform_list, stage_read_key_set, stage_write_key_set = stage_list[-1]
+
+                known_keys = \
+                    all(key_set is not None for key_set in [read_key_set, write_key_set, stage_read_key_set, stage_write_key_set])
+
+                if known_keys and \
+                    write_key_set.isdisjoint(stage_read_key_set | stage_write_key_set) and \
+                    read_key_set.isdisjoint(stage_write_key_set):
+
+                    stage_data_transform_list.append(data_transform)
+                    stage_read_key_set |= read_key_set
+                    stage_write_key_set |= write_key_set
+
+                    continue
+
+            stage_list.append(([data_transform], read_key_set, write_key_set))
+
+        # Compute keys to drop after every stage
+
+        drop_key_ll = [[] for _ in stage_list]
+
+        if self._output_key_list is not None:
+
+            output_key_set = set(self._output_key_list)
+            key_last_stage_idx_dict = {}
+            drop_safe = True
+
+            for stage_idx, (_, stage_read_key_set, stage_write_key_set) in enumerate(stage_list):
+
+                if stage_read_key_set is None or stage_write_key_set is None:
+                    drop_safe = False
+                    break
+
+                for key in stage_read_key_set | stage_write_key_set:
+                    key_last_stage_idx_dict[key] = stage_idx
+
+            # Keys cannot be dropped safely if some data transform reads unknown keys
+
+            if drop_safe:
+                for key, stage_idx in key_last_stage_idx_dict.items():
+                    if key not in output_key_set:
+                        drop_key_ll[stage_idx].append(key)
+
+        return [
+            (
+                tuple(stage_data_transform_list),
+                tuple(drop_key_ll[stage_idx])
+            )
+            for stage_idx, (stage_data_transform_list, _, _) in enumerate(stage_list)
+        ]
+
+
+    def __call__(
+        self,
+        data_point
+    ):
+
+        for stage_idx, (stage_data_transform_tuple, stage_drop_key_tuple) in enumerate(self._stage_list):
+
+            if self._record_timings:
+                start_time_ns = time.perf_counter_ns()
+
+            for data_transform in stage_data_transform_tuple:
+                data_point = data_transform(data_point)
+
+            for key in stage_drop_key_tuple:
+                data_point.pop(key, None)
+
+            if self._record_timings:
+                self._record_stage_timing(stage_idx, time.perf_counter_ns() - start_time_ns)
+
+        return data_point
+
+
+    def transform_batch(
+        self,
+        data_batch,
+        device=None
+    ):
+
+        for stage_idx, (stage_data_transform_tuple, stage_drop_key_tuple) in enumerate(self._stage_list):
+
+            if self._record_timings:
+                start_time_ns = time.perf_counter_ns()
+
+            for data_transform in stage_data_transform_tuple:
+                data_batch = data_transform.transform_batch(data_batch, device)
+
+            for key in stage_drop_key_tuple:
+                data_batch.pop(key, None)
+
+            if self._record_timings:
+                self._record_stage_timing(stage_idx, time.perf_counter_ns() - start_time_ns)
+
+        return data_batch
+
+
+    def get_read_keys(
+        self
+    ):
+
+        read_key_list = []
+
+        for data_transform in self._data_transform_list:
+            data_transform_read_key_list = data_transform.get_read_keys()
+            if data_transform_read_key_list is None: return None
+            read_key_list += data_transform_read_key_list
+
+        return read_key_list
+
+
+    def get_write_keys(
+        self
+    ):
+
+        write_key_list = []
+
+        for data_transform in self._data_transform_list:
+            data_transform_write_key_list = data_transform.get_write_keys()
+            if data_transform_write_key_list is None: return None
+            write_key_list += data_transform_write_key_list
+
+        return write_key_list
+
+
+    ########
+
+
+    def _record_stage_timing(
+        self,
+        stage_idx,
+        duration_ns
+    ):
+
+        # Bin b contains durations in [2^(b-1), 2^b) microseconds (bin 0 contains < 1 microsecond)
+
+        timing_bin_idx = min((duration_ns // 1000).bit_length(), self._num_timing_bins - 1)
+        self._stage_timing_count_arr[stage_idx, timing_bin_idx] += 1
+
+
+    def get_stage_names(
+        self
+    ):
+        """
+        Returns a name for every stage, built from the data transform class names.
+
+        :return: list of str
+            The stage names.
+        """
+
+        return [
+            " + ".join(type(data_transform).__name__ for data_transform in stage_data_transform_tuple)
+            for stage_data_transform_tuple, _ in self._stage_list
+        ]
+
+
+    def get_stage_timings(
+        self
+    ):
+        """
+        Returns the stage execution time histograms.
+        Bin `b` counts executions lasting [2^(b-1), 2^b) microseconds, and bin 0 counts executions
+        lasting less than 1 microsecond.
+
+        :return: numpy.ndarray
+            A copy of the histograms, with shape (<# stages>, <# bins>).
+        """
+
+        return self._stage_timing_count_arr.copy()
+
+
+    def reset_stage_timings(
+        self
+    ):
+        """
+        Resets the stage execution time histograms.
+        """
+
+        self._stage_timing_count_arr[:] = 0
+
+
+    def show_stage_timings(
+        self
+    ):
+        """
+        Prints a summary of the stage execution times (number of executions and approximate
+        median and 99th percentile times, from the histograms).
+        """
+
+        stage_name_list = self.get_stage_names()
+
+        max_stage_name_len = max([len(stage_name) for stage_name in stage_name_list] + [len("Stage")])
+        line_fmt_str = "{:" + "{:d}".format(max_stage_name_len) + "s} : {:>10s} {:>12s} {:>12s}"
+
+        print(line_fmt_str.format("Stage", "Count", "p50 (us)", "p99 (us)"))
+        print("-" * (max_stage_name_len + 40))
+
+        for stage_name, stage_timing_count_arr in zip(stage_name_list, self._stage_timing_count_arr):
+
+            num_executions = int(stage_timing_count_arr.sum())
+
+            if num_executions == 0:
+                print(line_fmt_str.format(stage_name, "0", "-", "-"))
+                continue
+
+            cum_count_arr = numpy.cumsum(stage_timing_count_arr)
+
+            percentile_str_list = [
+                "< {:d}".format(2 ** int(numpy.searchsorted(cum_count_arr, percentile * num_executions)))
+                for percentile in [0.5, 0.99]
+            ]
+
+            print(line_fmt_str.format(stage_name, str(num_executions), *percentile_str_list))
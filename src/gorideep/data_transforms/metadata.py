@@ -4,6 +4,7 @@ import numpy
 import torch
 
 from gorideep.data_transforms.base import BaseDataTransform
+from gorideep.utils.device import move_data_to_device
 from gorideep.utils.metadata import CategoryMetadata, MultiAttributeMetadata
 
 
@@ -25,6 +26,10 @@ class CategoryToProbsWeightsDataTransform(BaseDataTransform):
 
     Expects the index of the active category in the data point. If `None` is provided rather than
     the index, this means this category does not generate loss (all weights) to zero.
+
+    Collated data batches can also be processed at once with `transform_batch`, which expects a
+    sequence or tensor of category indices, where `None` or negative values mean no loss is
+    generated for that data point.
         
     :param cat_subset_name: str
         Name of the category subset to use.
@@ -59,33 +64,136 @@ class CategoryToProbsWeightsDataTransform(BaseDataTransform):
             for cat_name in cat_name_disable_list
         ]
 
+        # Pre-compute data point keys
+
+        self._cat_idx_key = "{:s}_cat_idx".format(self._cat_subset_name)
+        self._cat_prob_ten_key = "{:s}_cat_prob_ten".format(self._cat_subset_name)
+        self._cat_weight_ten_key = "{:s}_cat_weight_ten".format(self._cat_subset_name)
+
+        # Pre-compute weight mask with disabled categories
+
+        self._num_cats = self._cat_metadata.get_num_cats()
+
+        self._cat_weight_mask_ten = torch.ones(size=(self._num_cats,), dtype=torch.float)
+        self._cat_weight_mask_ten[self._cat_idx_disable_list] = 0.0
+
+        self._cat_weight_mask_ten_dict = {torch.device("cpu"): self._cat_weight_mask_ten}
+
 
     def __call__(
         self,
         data_point
     ):
 
-        original_cat_idx = data_point.get("{:s}_cat_idx".format(self._cat_subset_name), None)
+        original_cat_idx = data_point.get(self._cat_idx_key, None)
+
+        original_cat_prob_ten = torch.zeros(size=(self._num_cats,), dtype=torch.float)
 
         if original_cat_idx is None:
 
-            original_cat_prob_ten = torch.zeros(size=(self._cat_metadata.get_num_cats(),), dtype=torch.float)
-            original_cat_weight_ten = torch.zeros(size=(self._cat_metadata.get_num_cats(),), dtype=torch.float)
+            original_cat_weight_ten = torch.zeros(size=(self._num_cats,), dtype=torch.float)
 
         else:
 
-            original_cat_prob_ten = torch.zeros(size=(self._cat_metadata.get_num_cats(),), dtype=torch.float)
             original_cat_prob_ten[original_cat_idx] = 1.0
+            original_cat_weight_ten = self._cat_weight_mask_ten.clone()
 
-            original_cat_weight_ten = torch.ones(size=(self._cat_metadata.get_num_cats(),), dtype=torch.float)
-            for cat_idx in self._cat_idx_disable_list: original_cat_weight_ten[cat_idx] = 0.0
-
-        data_point["{:s}_cat_prob_ten".format(self._cat_subset_name)] = original_cat_prob_ten
-        data_point["{:s}_cat_weight_ten".format(self._cat_subset_name)] = original_cat_weight_ten
+        data_point[self._cat_prob_ten_key] = original_cat_prob_ten
+        data_point[self._cat_weight_ten_key] = original_cat_weight_ten
 
         return data_point
 
 
+    def transform_batch(
+        self,
+        data_batch,
+        device=None
+    ):
+
+        cat_prob_ten, cat_weight_ten = self.encode_cat_idxs(data_batch[self._cat_idx_key], device)
+
+        data_batch[self._cat_prob_ten_key] = cat_prob_ten
+        data_batch[self._cat_weight_ten_key] = cat_weight_ten
+
+        return data_batch
+
+
+    def encode_cat_idxs(
+        self,
+        cat_idxs,
+        device=None
+    ):
+        """
+        Converts a batch of category indices to probs and weights with a single vectorized
+        scatter.
+
+        :param cat_idxs: sequence of int or torch.Tensor
+            Indices of the active category of each data point.
+            `None` or negative values mean that the data point does not generate loss.
+        :param device: torch.device, optional
+            PyTorch device to compute on.
+            If not provided, the device of `cat_idxs` (or CPU) is used.
+
+        :return: torch.Tensor
+            Category probs tensor, with shape (<batch size>, <# cats>).
+        :return: torch.Tensor
+            Category weights tensor, with shape (<batch size>, <# cats>).
+        """
+
+        if isinstance(cat_idxs, torch.Tensor):
+            cat_idx_ten = cat_idxs.to(dtype=torch.long).flatten()
+        else:
+            cat_idx_ten = torch.as_tensor(
+                [-1 if cat_idx is None else cat_idx for cat_idx in cat_idxs],
+                dtype=torch.long
+            )
+
+        if device is None:
+            device = cat_idx_ten.device
+        else:
+            cat_idx_ten = move_data_to_device(cat_idx_ten, device)
+
+        valid_ten = (cat_idx_ten >= 0).unsqueeze(1)
+
+        cat_prob_ten = torch.zeros(size=(cat_idx_ten.shape[0], self._num_cats), dtype=torch.float, device=device)
+        cat_prob_ten.scatter_(1, cat_idx_ten.clamp(min=0).unsqueeze(1), valid_ten.to(torch.float))
+
+        cat_weight_ten = self._get_cat_weight_mask_ten(device).unsqueeze(0) * valid_ten
+
+        return cat_prob_ten, cat_weight_ten
+
+
+    def _get_cat_weight_mask_ten(
+        self,
+        device
+    ):
+        """
+        Returns the weight mask with disabled categories on a device, copying it only once per
+        device.
+        """
+
+        device = torch.device(device)
+
+        if device not in self._cat_weight_mask_ten_dict:
+            self._cat_weight_mask_ten_dict[device] = self._cat_weight_mask_ten.to(device)
+
+        return self._cat_weight_mask_ten_dict[device]
+
+
+    def get_read_keys(
+        self
+    ):
+
+        return [self._cat_idx_key]
+
+
+    def get_write_keys(
+        self
+    ):
+
+        return [self._cat_prob_ten_key, self._cat_weight_ten_key]
+
+
         
 class MultiAttributeToProbsWeightsDataTransform(BaseDataTransform):
     """
@@ -110,6 +218,14 @@ class MultiAttributeToProbsWeightsDataTransform(BaseDataTransform):
     Attribute indices must be zero-indices inside of each supattribute.
     If any of these arrays is not provided, or some indices are not either positive or negative,
     no loss is generated (zero weights).
+
+    All super-attribute probs and weights of a data point are written into one flat buffer of
+    shape (<# attrs>,), and the per-super-attribute tensors are views into it.
+
+    Collated data batches can also be processed at once with `transform_batch`, which expects
+    sequences (one entry per data point) of positive and negative attribute index arrays, where
+    `None` entries mean the arrays are not provided. Index arrays are gathered on CPU, and probs
+    and weights are filled on the requested device.
     
     :param multiattr_subset_name: str
         Name of the multi-attribute subset to use.
@@ -136,45 +252,209 @@ class MultiAttributeToProbsWeightsDataTransform(BaseDataTransform):
 
         self._multiattr_metadata = MultiAttributeMetadata(multiattr_subset_name)
 
+        # Pre-compute super-attribute plan (data point keys and flat buffer offsets)
 
-    def __call__(
-        self,
-        data_point
-    ):
+        self._num_attrs = self._multiattr_metadata.get_num_attrs()
+        self._supattr_plan_list = []
+
+        supattr_offset = 0
 
         for supattr_name, supattr_size in zip(
             self._multiattr_metadata.supattr_name_list,
             self._multiattr_metadata.supattr_size_list
         ):
 
-            supattr_prob_arr = numpy.zeros(shape=(supattr_size,), dtype=float)
-            supattr_weight_arr = numpy.zeros(shape=(supattr_size,), dtype=float)
+            self._supattr_plan_list.append((
+                "{:s}_{:s}_pos_attr_idx_arr".format(self._multiattr_subset_name, supattr_name),
+                "{:s}_{:s}_neg_attr_idx_arr".format(self._multiattr_subset_name, supattr_name),
+                "{:s}_{:s}_attr_prob_ten".format(self._multiattr_subset_name, supattr_name),
+                "{:s}_{:s}_attr_weight_ten".format(self._multiattr_subset_name, supattr_name),
+                supattr_offset,
+                supattr_offset + supattr_size
+            ))
 
-            #
+            supattr_offset += supattr_size
 
-            supattr_pos_attr_idx_arr_name = "{:s}_{:s}_pos_attr_idx_arr".format(self._multiattr_subset_name, supattr_name)
-            supattr_pos_attr_idx_arr = data_point.get(supattr_pos_attr_idx_arr_name, None)
 
-            if supattr_pos_attr_idx_arr is not None:
+    def _get_flat_attr_idx_arr(
+        self,
+        attr_idx_arr,
+        attr_idx_arr_key,
+        supattr_start,
+        supattr_end
+    ):
+        """
+        Shifts super-attribute indices into the flat attribute buffer, checking their bounds so
+        that they can not write into neighbouring super-attributes.
 
-                supattr_prob_arr[supattr_pos_attr_idx_arr] = 1.0
-                supattr_weight_arr[supattr_pos_attr_idx_arr] = 1.0
+        :param attr_idx_arr: sequence of int
+            Attribute indices within the super-attribute.
+        :param attr_idx_arr_key: str
+            Data point key of the indices, for error messages.
+        :param supattr_start: int
+            Start of the super-attribute in the flat buffer.
+        :param supattr_end: int
+            End of the super-attribute in the flat buffer.
 
-            #
+        :return: numpy.ndarray
+            Attribute indices in the flat buffer.
+        """
 
-            supattr_neg_attr_idx_arr_name = "{:s}_{:s}_neg_attr_idx_arr".format(self._multiattr_subset_name, supattr_name)
-            supattr_neg_attr_idx_arr = data_point.get(supattr_neg_attr_idx_arr_name, None)
+        attr_idx_arr = numpy.asarray(attr_idx_arr, dtype=int)
 
+        if attr_idx_arr.size > 0 and (attr_idx_arr.min() < 0 or attr_idx_arr.max() >= supattr_end - supattr_start):
+            raise IndexError("Attribute index out of range in {:s} (size {:d})".format(
+                attr_idx_arr_key, supattr_end - supattr_start
+            ))
+
+        return attr_idx_arr + supattr_start
+
+
+    def __call__(
+        self,
+        data_point
+    ):
+
+        # Gather flat positive and negative attribute indices
+
+        pos_attr_idx_arr_list = []
+        neg_attr_idx_arr_list = []
+
+        for (
+            pos_attr_idx_arr_key, neg_attr_idx_arr_key, _, _, supattr_start, supattr_end
+        ) in self._supattr_plan_list:
+
+            supattr_pos_attr_idx_arr = data_point.get(pos_attr_idx_arr_key, None)
+            if supattr_pos_attr_idx_arr is not None:
+                pos_attr_idx_arr_list.append(self._get_flat_attr_idx_arr(
+                    supattr_pos_attr_idx_arr, pos_attr_idx_arr_key, supattr_start, supattr_end
+                ))
+
+            supattr_neg_attr_idx_arr = data_point.get(neg_attr_idx_arr_key, None)
             if supattr_neg_attr_idx_arr is not None:
+                neg_attr_idx_arr_list.append(self._get_flat_attr_idx_arr(
+                    supattr_neg_attr_idx_arr, neg_attr_idx_arr_key, supattr_start, supattr_end
+                ))
 
-                supattr_prob_arr[supattr_neg_attr_idx_arr] = 0.0
-                supattr_weight_arr[supattr_neg_attr_idx_arr] = 1.0
+        # Fill flat buffer (negative indices take precedence over positive ones)
 
-            #
+        attr_prob_weight_arr = numpy.zeros(shape=(2, self._num_attrs), dtype=numpy.float32)
 
-            data_point["{:s}_{:s}_attr_prob_ten".format(self._multiattr_subset_name, supattr_name)] =\
-                torch.FloatTensor(supattr_prob_arr)
-            data_point["{:s}_{:s}_attr_weight_ten".format(self._multiattr_subset_name, supattr_name)] =\
-                torch.FloatTensor(supattr_weight_arr)
+        if len(pos_attr_idx_arr_list) > 0:
+            pos_attr_idx_arr = numpy.concatenate(pos_attr_idx_arr_list)
+            attr_prob_weight_arr[:, pos_attr_idx_arr] = 1.0
+
+        if len(neg_attr_idx_arr_list) > 0:
+            neg_attr_idx_arr = numpy.concatenate(neg_attr_idx_arr_list)
+            attr_prob_weight_arr[0, neg_attr_idx_arr] = 0.0
+            attr_prob_weight_arr[1, neg_attr_idx_arr] = 1.0
+
+        attr_prob_weight_ten = torch.from_numpy(attr_prob_weight_arr)
+
+        # Split flat buffer into super-attribute views
+
+        for (
+            _, _, attr_prob_ten_key, attr_weight_ten_key, supattr_start, supattr_end
+        ) in self._supattr_plan_list:
+
+            data_point[attr_prob_ten_key] = attr_prob_weight_ten[0, supattr_start:supattr_end]
+            data_point[attr_weight_ten_key] = attr_prob_weight_ten[1, supattr_start:supattr_end]
 
         return data_point
+
+
+    def transform_batch(
+        self,
+        data_batch,
+        device=None
+    ):
+
+        # Gather flat positive and negative (row, attribute) indices
+
+        batch_size = None
+
+        pos_row_idx_arr_list, pos_attr_idx_arr_list = [], []
+        neg_row_idx_arr_list, neg_attr_idx_arr_list = [], []
+
+        for (
+            pos_attr_idx_arr_key, neg_attr_idx_arr_key, _, _, supattr_start, supattr_end
+        ) in self._supattr_plan_list:
+
+            for attr_idx_arr_key, row_idx_arr_list, attr_idx_arr_list in [
+                (pos_attr_idx_arr_key, pos_row_idx_arr_list, pos_attr_idx_arr_list),
+                (neg_attr_idx_arr_key, neg_row_idx_arr_list, neg_attr_idx_arr_list)
+            ]:
+
+                batch_attr_idx_arr_seq = data_batch.get(attr_idx_arr_key, None)
+                if batch_attr_idx_arr_seq is None: continue
+
+                batch_size = len(batch_attr_idx_arr_seq)
+
+                for row_idx, attr_idx_arr in enumerate(batch_attr_idx_arr_seq):
+
+                    if attr_idx_arr is None: continue
+
+                    attr_idx_arr = self._get_flat_attr_idx_arr(attr_idx_arr, attr_idx_arr_key, supattr_start, supattr_end)
+                    row_idx_arr_list.append(numpy.full(shape=attr_idx_arr.shape, fill_value=row_idx, dtype=int))
+                    attr_idx_arr_list.append(attr_idx_arr)
+
+        if batch_size is None:
+            raise ValueError("No attribute index arrays found in the data batch")
+
+        # Fill flat batch buffer on device (negative indices take precedence over positive ones)
+        # Only the flat index tensors are transferred
+
+        if device is None:
+            device = torch.device("cpu")
+
+        attr_prob_weight_ten = torch.zeros(size=(2, batch_size, self._num_attrs), dtype=torch.float, device=device)
+
+        if len(pos_attr_idx_arr_list) > 0:
+            pos_row_idx_ten, pos_attr_idx_ten = move_data_to_device(
+                (torch.from_numpy(numpy.concatenate(pos_row_idx_arr_list)), torch.from_numpy(numpy.concatenate(pos_attr_idx_arr_list))),
+                device
+            )
+            attr_prob_weight_ten[:, pos_row_idx_ten, pos_attr_idx_ten] = 1.0
+
+        if len(neg_attr_idx_arr_list) > 0:
+            neg_row_idx_ten, neg_attr_idx_ten = move_data_to_device(
+                (torch.from_numpy(numpy.concatenate(neg_row_idx_arr_list)), torch.from_numpy(numpy.concatenate(neg_attr_idx_arr_list))),
+                device
+            )
+            attr_prob_weight_ten[0, neg_row_idx_ten, neg_attr_idx_ten] = 0.0
+            attr_prob_weight_ten[1, neg_row_idx_ten, neg_attr_idx_ten] = 1.0
+
+        # Split flat batch buffer into super-attribute views
+
+        for (
+            _, _, attr_prob_ten_key, attr_weight_ten_key, supattr_start, supattr_end
+        ) in self._supattr_plan_list:
+
+            data_batch[attr_prob_ten_key] = attr_prob_weight_ten[0, :, supattr_start:supattr_end]
+            data_batch[attr_weight_ten_key] = attr_prob_weight_ten[1, :, supattr_start:supattr_end]
+
+        return data_batch
+
+
+    def get_read_keys(
+        self
+    ):
+
+        read_key_list = []
+        for pos_attr_idx_arr_key, neg_attr_idx_arr_key, _, _, _, _ in self._supattr_plan_list:
+            read_key_list.append(pos_attr_idx_arr_key)
+            read_key_list.append(neg_attr_idx_arr_key)
+
+        return read_key_list
+
+
+    def get_write_keys(
+        self
+    ):
+
+        write_key_list = []
+        for _, _, attr_prob_ten_key, attr_weight_ten_key, _, _ in self._supattr_plan_list:
+            write_key_list.append(attr_prob_ten_key)
+            write_key_list.append(attr_weight_ten_key)
+
+        return write_key_list
@@ -1,9 +1,13 @@
+import hashlib
+import weakref
+
 import numpy
 import torch
 
-import goripy.memory.get
 import goripy.memory.info
 
+from gorideep.utils.memory import get_obj_num_bytes, get_obj_num_bytes_cache_key
+
 
 
 class BaseDataset(torch.utils.data.Dataset):
@@ -18,6 +22,13 @@ class BaseDataset(torch.utils.data.Dataset):
 
         self._data_transform = None
 
+        self._split_idxs_key = None
+        self._split_idxs_mask = None
+        self._split_idxs_dict = None
+        self._extra_split_idxs_dict = {}
+
+        self._num_bytes_cache_dict = {}
+
 
     def set_data_transform(
         self,
@@ -67,6 +78,24 @@ class BaseDataset(torch.utils.data.Dataset):
         raise NotImplementedError
 
 
+    def getitems_metadata(
+        self,
+        idxs
+    ):
+        """
+        Loads multiple metadata points (data points with only metadata).
+        Subclasses may override this method with a faster bulk implementation.
+
+        :param idxs: sequence of int
+            Indices of the data points in the dataset.
+
+        :return: list of dict
+            The metadata points.
+        """
+
+        return [self.getitem_metadata(idx) for idx in idxs]
+
+
     def __len__(
         self
     ):
@@ -80,13 +109,29 @@ class BaseDataset(torch.utils.data.Dataset):
         raise NotImplementedError
 
 
+    def get_num_items(
+        self
+    ):
+        """
+        Returns the number of items of the dataset index space (valid indices for metadata
+        access). Equal to the dataset length, except for datasets whose length depends on the
+        process (e.g. streaming datasets partitioned among DDP ranks).
+
+        :return: int
+            The number of items.
+        """
+
+        return len(self)
+
+
     _split_str_to_idx_dict = {
         "train": 0, "val": 1, "test": 2
     }
 
     def get_split_idxs(
         self,
-        split_str
+        split_str,
+        copy=True
     ):
         """
         Returns a subset of the dataset indices.
@@ -95,20 +140,276 @@ class BaseDataset(torch.utils.data.Dataset):
           - `_split_mask_name`
           - `_split_mask`
 
+        Index arrays of all splits are computed once, with a single sorting pass over the split
+        mask, and memoized. By default, a writable copy is returned. If the split mask is
+        modified in-place, `reset_split_idxs` must be called.
+
         :param split_str: str
             Split to which indices must belong to.
-            Accepts "train", "val" or "test.
+            Accepts "train", "val" or "test", or any split registered with `register_split`.
+        :param copy: bool, default=True
+            If False, the memoized array is returned without copying it, as a read-only view.
         
-        :return: sequence
+        :return: numpy.ndarray
             The subset of dataset indices.
         """
 
+        split_idx_arr = self._get_memo_split_idxs(split_str)
+
+        if copy:
+            return split_idx_arr.copy()
+
+        return split_idx_arr
+
+
+    def _get_memo_split_idxs(
+        self,
+        split_str
+    ):
+        """
+        Returns the memoized (read-only) index array of a split, computing the index arrays of
+        all splits if necessary.
+
+        :param split_str: str
+            Split to which indices must belong to.
+
+        :return: numpy.ndarray
+            The read-only subset of dataset indices.
+        """
+
+        if split_str in self._extra_split_idxs_dict:
+            return self._extra_split_idxs_dict[split_str]
+
         if self._split_mask_name is None:
             raise ValueError("Split mask not provided")
 
-        return numpy.flatnonzero(self._split_mask == self._split_str_to_idx_dict[split_str])
+        # The split mask is referenced, so that identities are never reused
+
+        if self._split_idxs_key != self._split_mask_name or self._split_idxs_mask is not self._split_mask:
+            self._split_idxs_dict = self._compute_split_idxs()
+            self._split_idxs_key = self._split_mask_name
+            self._split_idxs_mask = self._split_mask
+
+        return self._split_idxs_dict[split_str]
+
+
+    def _compute_split_idxs(
+        self
+    ):
+        """
+        Computes the index arrays of all splits with a single stable sort over the split mask.
+        All index arrays are read-only views of a single sorted index array.
+
+        :return: dict of str -> numpy.ndarray
+            The index arrays of all splits, indexed by split name.
+        """
+
+        split_mask = numpy.asarray(self._split_mask)
+
+        # Small integer types are sorted with radix sort
+
+        if split_mask.shape[0] > 0 and split_mask.min() >= 0 and split_mask.max() < 256:
+            split_mask = split_mask.astype(numpy.uint8)
+
+        sorted_idx_arr = numpy.argsort(split_mask, kind="stable")
+        sorted_idx_arr.setflags(write=False)
+
+        sorted_split_mask = split_mask[sorted_idx_arr]
+
+        split_idxs_dict = {}
+
+        for split_str, split_idx in self._split_str_to_idx_dict.items():
+            split_start = numpy.searchsorted(sorted_split_mask, split_idx, side="left")
+            split_end = numpy.searchsorted(sorted_split_mask, split_idx, side="right")
+            split_idxs_dict[split_str] = sorted_idx_arr[split_start:split_end]
+
+        return split_idxs_dict
+
+
+    def reset_split_idxs(
+        self
+    ):
+        """
+        Discards the memoized split index arrays, which will be re-computed on the next access.
+        Registered splits are kept.
+        """
+
+        self._split_idxs_key = None
+        self._split_idxs_mask = None
+        self._split_idxs_dict = None
+
+
+    def get_split_subset(
+        self,
+        split_str
+    ):
+        """
+        Returns a view of the dataset restricted to a split.
+
+        :param split_str: str
+            Split to which data points must belong to.
+
+        :return: torch.utils.data.Subset
+            The dataset split view.
+        """
+
+        return torch.utils.data.Subset(self, self.get_split_idxs(split_str, copy=False))
+
+
+    def register_split(
+        self,
+        split_str,
+        idxs
+    ):
+        """
+        Registers a user-defined split (e.g. a cross-validation fold), to be retrieved with
+        `get_split_idxs` and `get_split_subset`.
+
+        :param split_str: str
+            Name of the new split.
+        :param idxs: sequence of int
+            Dataset indices of the new split.
+        """
+
+        split_idx_arr = numpy.array(idxs, dtype=numpy.int64)
+        split_idx_arr.setflags(write=False)
+
+        self._extra_split_idxs_dict[split_str] = split_idx_arr
+
+
+    def register_kfold_splits(
+        self,
+        split_str,
+        num_folds,
+        seed=0
+    ):
+        """
+        Registers k-fold cross-validation splits on top of an existing split.
+        For every fold `k`, registers the splits "<split_str>_fold<k>_train" and
+        "<split_str>_fold<k>_val".
+
+        :param split_str: str
+            Split to divide into folds.
+        :param num_folds: int
+            Number of folds.
+        :param seed: int, default=0
+            Random seed for shuffling the split indices before dividing them.
+        """
+
+        split_idx_arr = numpy.random.default_rng(seed).permutation(self.get_split_idxs(split_str, copy=False))
+        fold_idx_arr_list = numpy.array_split(split_idx_arr, num_folds)
+
+        for fold_idx in range(num_folds):
+
+            self.register_split(
+                "{:s}_fold{:d}_train".format(split_str, fold_idx),
+                numpy.sort(numpy.concatenate(fold_idx_arr_list[:fold_idx] + fold_idx_arr_list[fold_idx + 1:]))
+            )
+
+            self.register_split(
+                "{:s}_fold{:d}_val".format(split_str, fold_idx),
+                numpy.sort(fold_idx_arr_list[fold_idx])
+            )
+
+
+    def register_holdout_split(
+        self,
+        split_str,
+        holdout_frac,
+        seed=0
+    ):
+        """
+        Registers a holdout split on top of an existing split.
+        Registers the splits "<split_str>_holdout" and "<split_str>_rest".
+
+        :param split_str: str
+            Split to take the holdout from.
+        :param holdout_frac: float
+            Fraction of the split indices to hold out.
+        :param seed: int, default=0
+            Random seed for selecting the holdout indices.
+        """
+
+        split_idx_arr = numpy.random.default_rng(seed).permutation(self.get_split_idxs(split_str, copy=False))
+        num_holdout = int(round(holdout_frac * split_idx_arr.shape[0]))
+
+        self.register_split("{:s}_holdout".format(split_str), numpy.sort(split_idx_arr[:num_holdout]))
+        self.register_split("{:s}_rest".format(split_str), numpy.sort(split_idx_arr[num_holdout:]))
     
 
+    def get_fingerprint(
+        self
+    ):
+        """
+        Computes a fingerprint that identifies the dataset contents.
+        It accounts for the dataset class, number of items and split mask, and for any extra attribute
+        listed in `_fingerprint_attr_name_list` (arrays, tensors and sequences are hashed by
+        content, scalars and strings by their `repr`).
+
+        Subclasses should list in `_fingerprint_attr_name_list` every attribute that identifies
+        their data (e.g. data directory, version).
+
+        :return: str
+            Hex digest of the dataset fingerprint.
+        """
+
+        fingerprint_hash = hashlib.sha256()
+
+        fingerprint_hash.update("{:s}.{:s}".format(type(self).__module__, type(self).__qualname__).encode("utf-8"))
+        fingerprint_hash.update(str(self.get_num_items()).encode("utf-8"))
+
+        attr_name_list = ["_split_mask_name", "_split_mask"] + getattr(self, "_fingerprint_attr_name_list", [])
+
+        for attr_name in attr_name_list:
+
+            attr = getattr(self, attr_name, None)
+
+            fingerprint_hash.update(attr_name.encode("utf-8"))
+            self._update_fingerprint_hash(fingerprint_hash, attr)
+
+        return fingerprint_hash.hexdigest()
+
+
+    @staticmethod
+    def _update_fingerprint_hash(
+        fingerprint_hash,
+        attr
+    ):
+        """
+        Updates a fingerprint hash with one attribute.
+        Arrays, tensors and sequences are hashed by content (their `repr` may be abbreviated),
+        scalars and strings by their `repr`.
+
+        :param fingerprint_hash: hashlib hash object
+            The hash to update.
+        :param attr: object
+            The attribute to hash.
+        """
+
+        if isinstance(attr, torch.Tensor):
+            attr = attr.detach().cpu().numpy()
+
+        if isinstance(attr, (list, tuple)):
+            try:
+                attr = numpy.asarray(attr)
+            except ValueError:
+                pass
+
+        if not isinstance(attr, numpy.ndarray):
+            fingerprint_hash.update(repr(attr).encode("utf-8"))
+            return
+
+        # Object arrays hold references, their elements are hashed by their (full) `repr`
+
+        fingerprint_hash.update(str(attr.dtype).encode("utf-8"))
+        fingerprint_hash.update(str(attr.shape).encode("utf-8"))
+
+        if attr.dtype == object:
+            fingerprint_hash.update(repr(attr.tolist()).encode("utf-8"))
+        else:
+            fingerprint_hash.update(numpy.ascontiguousarray(attr).tobytes())
+
+
     def get_num_bytes(
         self
     ):
@@ -118,6 +419,10 @@ class BaseDataset(torch.utils.data.Dataset):
         Requires assigning the following attributes:
           - `_byte_attr_name_list`
 
+        Measurements use `gorideep.utils.memory.get_obj_num_bytes`. Measurements of array and
+        tensor attributes are cached until they are replaced, resized or reallocated (see
+        `gorideep.utils.memory.get_obj_num_bytes_cache_key`).
+
         :return: int
             Memory overhead in bytes.
         """
@@ -129,7 +434,7 @@ class BaseDataset(torch.utils.data.Dataset):
             attr = getattr(self, attr_name, None)
             if attr is None: continue
 
-            total_num_bytes += goripy.memory.get.get_obj_bytes(attr)
+            total_num_bytes += self._get_attr_num_bytes(attr_name, attr)
     
         return total_num_bytes
 
@@ -156,7 +461,7 @@ class BaseDataset(torch.utils.data.Dataset):
             attr = getattr(self, attr_name, None)
             if attr is None: continue
 
-            num_bytes = goripy.memory.get.get_obj_bytes(attr)
+            num_bytes = self._get_attr_num_bytes(attr_name, attr)
             total_num_bytes += num_bytes
 
             num_bytes_str = goripy.memory.info.sprint_fancy_num_bytes(num_bytes)
@@ -168,3 +473,48 @@ class BaseDataset(torch.utils.data.Dataset):
         total_num_bytes_str = goripy.memory.info.sprint_fancy_num_bytes(total_num_bytes)
         print_str = line_fmt_str.format("Total", total_num_bytes_str)
         print(print_str)
+
+
+    def _get_attr_num_bytes(
+        self,
+        attr_name,
+        attr
+    ):
+        """
+        Computes the number of bytes of an attribute, reusing the cached measurement if the
+        attribute is cacheable and has not been replaced, resized or reallocated.
+
+        :param attr_name: str
+            Name of the attribute.
+        :param attr: any
+            The attribute.
+
+        :return: int
+            Number of bytes that the attribute weights.
+        """
+
+        cache_key = get_obj_num_bytes_cache_key(attr)
+
+        if cache_key is None:
+            self._num_bytes_cache_dict.pop(attr_name, None)
+            return get_obj_num_bytes(attr)
+
+        # Cached attributes are referenced weakly, so that identities are never reused
+
+        cache_entry = self._num_bytes_cache_dict.get(attr_name, None)
+
+        if cache_entry is None or cache_entry[0]() is not attr or cache_entry[1] != cache_key:
+            cache_entry = (weakref.ref(attr), cache_key, get_obj_num_bytes(attr))
+            self._num_bytes_cache_dict[attr_name] = cache_entry
+
+        return cache_entry[2]
+
+
+    def reset_num_bytes_cache(
+        self
+    ):
+        """
+        Discards all cached memory measurements.
+        """
+
+        self._num_bytes_cache_dict = {}
@@ -0,0 +1,337 @@
+import os
+import shutil
+import tempfile
+import collections
+import multiprocessing.util
+
+import torch
+
+import goripy.memory.get
+
+from gorideep.datasets.base import BaseDataset
+
+
+
+class LRUCachedDataset(BaseDataset):
+    """
+    Dataset wrapper that caches the data points of another dataset in a bounded in-memory LRU
+    cache, with an optional spill tier on local disk.
+
+    The data transform of the wrapped dataset must only contain deterministic operations (e.g.
+    decoding, resizing), as its outputs are cached. Random operations (e.g. augmentations) must be
+    set as the data transform of this wrapper, which is applied after every cache lookup, hit or
+    miss. Cached data points are shallow-copied before applying the data transform, so data
+    transforms must not modify tensors in-place.
+
+    Cache eviction is byte-aware, using `goripy.memory.get.get_obj_bytes` to measure data points.
+    Evicted data points are written to the spill tier (if enabled), which is also bounded and
+    evicted in LRU order.
+
+    Note that every DataLoader worker holds its own cache. Spilled data points are written into a
+    temporary subdirectory of `spill_dirname` owned by the current process, which is removed when
+    this dataset is garbage collected or the process exits. Thus, the spill tier is only useful
+    with `persistent_workers=True` in the DataLoader, since otherwise new workers (with empty
+    caches) are created every epoch.
+
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to wrap.
+    :param max_cache_bytes: int
+        Maximum number of bytes of the in-memory cache.
+    :param spill_dirname: str, optional
+        Name of the local directory to spill evicted data points into (inside per-process
+        temporary subdirectories). Created if it does not exist. If not provided, evicted data
+        points are discarded.
+    :param max_spill_bytes: int, optional
+        Maximum number of bytes of the spill tier.
+        If not provided, the spill tier is unbounded.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        max_cache_bytes,
+        spill_dirname=None,
+        max_spill_bytes=None
+    ):
+
+        super().__init__()
+
+        self._dataset = dataset
+        self._max_cache_bytes = max_cache_bytes
+        self._spill_dirname = spill_dirname
+        self._max_spill_bytes = max_spill_bytes
+
+        if self._spill_dirname is not None:
+            os.makedirs(self._spill_dirname, exist_ok=True)
+
+        # Initialize internal state
+
+        self._cache_ordict = collections.OrderedDict()
+        self._cache_num_bytes = 0
+
+        self._spill_ordict = collections.OrderedDict()
+        self._spill_num_bytes = 0
+        self._spill_subdirname = None
+        self._spill_pid = None
+
+        self._num_hits = 0
+        self._num_spill_hits = 0
+        self._num_misses = 0
+
+
+    def __getitem__(
+        self,
+        dataset_idx
+    ):
+
+        data_point = self._get_cached_data_point(dataset_idx)
+
+        if self._data_transform is not None:
+            data_point = self._data_transform(dict(data_point))
+
+        return data_point
+
+
+    def _get_cached_data_point(
+        self,
+        dataset_idx
+    ):
+        """
+        Retrieves a data point from the cache tiers, loading it from the wrapped dataset and
+        caching it on a miss.
+
+        :param dataset_idx: int
+            Index of the data point in the dataset.
+
+        :return: dict
+            The cached data point. Must not be modified.
+        """
+
+        self._reset_inherited_spill()
+
+        # In-memory cache hit
+
+        if dataset_idx in self._cache_ordict:
+
+            self._cache_ordict.move_to_end(dataset_idx)
+            self._num_hits += 1
+
+            return self._cache_ordict[dataset_idx][0]
+
+        # Spill tier hit
+
+        if dataset_idx in self._spill_ordict:
+
+            data_point = torch.load(self._get_spill_filename(dataset_idx), weights_only=False)
+            self._remove_spilled(dataset_idx)
+            self._num_spill_hits += 1
+
+        # Miss
+
+        else:
+
+            data_point = self._dataset[dataset_idx]
+            self._num_misses += 1
+
+        # Cache data point and evict least recently used data points
+
+        num_bytes = goripy.memory.get.get_obj_bytes(data_point)
+
+        if num_bytes <= self._max_cache_bytes:
+
+            self._cache_ordict[dataset_idx] = (data_point, num_bytes)
+            self._cache_num_bytes += num_bytes
+
+            while self._cache_num_bytes > self._max_cache_bytes:
+
+                evict_dataset_idx, (evict_data_point, evict_num_bytes) = self._cache_ordict.popitem(last=False)
+                self._cache_num_bytes -= evict_num_bytes
+
+                self._spill(evict_dataset_idx, evict_data_point)
+
+        return data_point
+
+
+    def _reset_inherited_spill(
+        self
+    ):
+        """
+        Discards the spill tier state inherited from a parent process (e.g. by forked DataLoader
+        workers), whose spill subdirectory belongs to the parent process.
+        """
+
+        if self._spill_pid is None or self._spill_pid == os.getpid(): return
+
+        self._spill_ordict = collections.OrderedDict()
+        self._spill_num_bytes = 0
+        self._spill_subdirname = None
+        self._spill_pid = None
+
+
+    def _get_spill_subdirname(
+        self
+    ):
+        """
+        Retrieves the spill subdirectory of the current process, creating it if necessary.
+
+        :return: str
+            Name of the spill subdirectory.
+        """
+
+        self._reset_inherited_spill()
+
+        if self._spill_pid == os.getpid(): return self._spill_subdirname
+
+        self._spill_subdirname = tempfile.mkdtemp(prefix="spill_{:d}_".format(os.getpid()), dir=self._spill_dirname)
+        self._spill_pid = os.getpid()
+
+        # Unlike weakref.finalize, multiprocessing finalizers also run when DataLoader workers exit
+
+        multiprocessing.util.Finalize(
+            self,
+            shutil.rmtree,
+            args=(self._spill_subdirname,),
+            kwargs={"ignore_errors": True},
+            exitpriority=0
+        )
+
+        return self._spill_subdirname
+
+
+    def _get_spill_filename(
+        self,
+        dataset_idx
+    ):
+
+        return os.path.join(self._get_spill_subdirname(), "{:d}.pt".format(dataset_idx))
+
+
+    def _spill(
+        self,
+        dataset_idx,
+        data_point
+    ):
+        """
+        Writes an evicted data point into the spill tier, evicting least recently used spilled
+        data points if necessary.
+        """
+
+        if self._spill_dirname is None: return
+
+        spill_filename = self._get_spill_filename(dataset_idx)
+        torch.save(data_point, spill_filename)
+
+        num_bytes = os.path.getsize(spill_filename)
+
+        self._spill_ordict[dataset_idx] = num_bytes
+        self._spill_num_bytes += num_bytes
+
+        if self._max_spill_bytes is None: return
+
+        while self._spill_num_bytes > self._max_spill_bytes:
+            self._remove_spilled(next(iter(self._spill_ordict)))
+
+
+    def _remove_spilled(
+        self,
+        dataset_idx
+    ):
+
+        self._spill_num_bytes -= self._spill_ordict.pop(dataset_idx)
+
+        spill_filename = self._get_spill_filename(dataset_idx)
+        if os.path.exists(spill_filename): os.remove(spill_filename)
+
+
+    def clear_cache(
+        self
+    ):
+        """
+        Removes all data points from the in-memory cache and the spill tier.
+        """
+
+        self._reset_inherited_spill()
+
+        for dataset_idx in list(self._spill_ordict.keys()):
+            self._remove_spilled(dataset_idx)
+
+        self._cache_ordict.clear()
+        self._cache_num_bytes = 0
+
+
+    def get_cache_stats(
+        self
+    ):
+        """
+        Returns cache usage statistics of the current process.
+
+        :return: dict
+            A dict with the number of hits, spill tier hits and misses, and the number of cached
+            items and bytes of each tier.
+        """
+
+        return {
+            "num_hits": self._num_hits,
+            "num_spill_hits": self._num_spill_hits,
+            "num_misses": self._num_misses,
+            "cache_num_items": len(self._cache_ordict),
+            "cache_num_bytes": self._cache_num_bytes,
+            "spill_num_items": len(self._spill_ordict),
+            "spill_num_bytes": self._spill_num_bytes
+        }
+
+
+    ########
+
+
+    def getitem_metadata(
+        self,
+        idx
+    ):
+
+        return self._dataset.getitem_metadata(idx)
+
+
+    def getitems_metadata(
+        self,
+        idxs
+    ):
+
+        return self._dataset.getitems_metadata(idxs)
+
+
+    def __len__(
+        self
+    ):
+
+        return len(self._dataset)
+
+
+    def get_split_idxs(
+        self,
+        split_str,
+        copy=True
+    ):
+
+        return self._dataset.get_split_idxs(split_str, copy)
+
+
+    def get_fingerprint(
+        self
+    ):
+
+        return self._dataset.get_fingerprint()
+
+
+    def get_num_bytes(
+        self
+    ):
+
+        return self._dataset.get_num_bytes() + self._cache_num_bytes
+
+
+    def show_num_bytes(
+        self
+    ):
+
+        self._dataset.show_num_bytes()
@@ -0,0 +1,375 @@
+import os
+
+import numpy
+
+import goripy.file.json
+
+from gorideep.datasets.base import BaseDataset
+
+
+
+class ColumnarMetadataStore:
+    """
+    Container class that manages dataset metadata stored in columnar format.
+
+    Metadata is stored in a directory with one set of `.npy` files per metadata key (column),
+    which are loaded with memory mapping:
+
+        - Fixed-width columns (scalar values): `<column_name>.npy`, with shape (<# items>,).
+        - Ragged columns (1D arrays of variable length): `<column_name>.values.npy` with all arrays
+          concatenated, and `<column_name>.offsets.npy` with shape (<# items> + 1,).
+        - String columns: same as ragged columns, with UTF-8 encoded bytes as values.
+        - Nullable columns (missing in some items): `<column_name>.valid.npy`, a boolean mask.
+
+    The column layout is described in a `columns.json` file. Stores can be created with the
+    `write` method.
+
+    Values read from fixed-width and ragged columns are views of the memory-mapped files (no
+    copies), so data is shared among all processes reading the same store. When pickled (e.g.
+    sent to DataLoader workers), only the directory name is serialized.
+
+    :param dirname: str
+        Name of the directory containing the columnar metadata.
+    """
+
+    def __init__(
+        self,
+        dirname
+    ):
+
+        self._dirname = dirname
+
+        self._load()
+
+
+    def _load(
+        self
+    ):
+
+        columns_dict = goripy.file.json.load_json(os.path.join(self._dirname, "columns.json"))
+
+        self._num_items = columns_dict["num_items"]
+        self._column_kind_dict = {}
+        self._column_arr_dict = {}
+
+        for column_name, column_info in columns_dict["columns"].items():
+
+            column_arr_dict = {}
+
+            if column_info["kind"] == "fixed":
+                column_arr_dict["values"] = self._load_arr("{:s}.npy".format(column_name))
+            else:
+                column_arr_dict["values"] = self._load_arr("{:s}.values.npy".format(column_name))
+                column_arr_dict["offsets"] = self._load_arr("{:s}.offsets.npy".format(column_name))
+
+            if column_info["nullable"]:
+                column_arr_dict["valid"] = self._load_arr("{:s}.valid.npy".format(column_name))
+
+            self._column_kind_dict[column_name] = column_info["kind"]
+            self._column_arr_dict[column_name] = column_arr_dict
+
+
+    def _load_arr(
+        self,
+        filename
+    ):
+
+        return numpy.load(os.path.join(self._dirname, filename), mmap_mode="r")
+
+
+    def __getstate__(
+        self
+    ):
+
+        return {"dirname": self._dirname}
+
+
+    def __setstate__(
+        self,
+        state
+    ):
+
+        self._dirname = state["dirname"]
+
+        self._load()
+
+
+    def __len__(
+        self
+    ):
+
+        return self._num_items
+
+
+    def get_item(
+        self,
+        idx
+    ):
+        """
+        Reads all column values of one item.
+        Columns with missing values for the item are not included.
+
+        :param idx: int
+            Index of the item.
+
+        :return: dict
+            The item metadata, indexed by column name.
+        """
+
+        metadata_point = {}
+
+        for column_name, column_arr_dict in self._column_arr_dict.items():
+
+            if "valid" in column_arr_dict and not column_arr_dict["valid"][idx]: continue
+
+            metadata_point[column_name] = self._get_value(column_name, column_arr_dict, idx)
+
+        return metadata_point
+
+
+    def get_column(
+        self,
+        column_name
+    ):
+        """
+        Returns the values array of a column.
+        For ragged and string columns, all values are concatenated (see `get_column_offsets`).
+
+        :param column_name: str
+            Name of the column.
+
+        :return: numpy.ndarray
+            The (memory-mapped) column values.
+        """
+
+        return self._column_arr_dict[column_name]["values"]
+
+
+    def get_column_offsets(
+        self,
+        column_name
+    ):
+        """
+        Returns the offsets array of a ragged or string column.
+
+        :param column_name: str
+            Name of the column.
+
+        :return: numpy.ndarray
+            The (memory-mapped) column offsets, with shape (<# items> + 1,).
+        """
+
+        return self._column_arr_dict[column_name]["offsets"]
+
+
+    def _get_value(
+        self,
+        column_name,
+        column_arr_dict,
+        idx
+    ):
+
+        column_kind = self._column_kind_dict[column_name]
+
+        if column_kind == "fixed":
+            return column_arr_dict["values"][idx]
+
+        value_start = column_arr_dict["offsets"][idx]
+        value_end = column_arr_dict["offsets"][idx + 1]
+        value = column_arr_dict["values"][value_start:value_end]
+
+        if column_kind == "str":
+            return bytes(value).decode("utf-8")
+
+        return value
+
+
+    @property
+    def dirname(self):
+        return self._dirname
+
+    @property
+    def column_kind_dict(self):
+        return self._column_kind_dict
+
+
+    ########
+
+
+    @staticmethod
+    def _check_mmap_dtype(
+        column_name,
+        values_arr
+    ):
+        """
+        Checks that column values can be memory-mapped when loaded (i.e. they are not stored as
+        pickled Python objects).
+
+        :param column_name: str
+            Name of the column.
+        :param values_arr: numpy.ndarray
+            The column values array.
+        """
+
+        if values_arr.dtype.hasobject:
+            raise ValueError(
+                "Column {:s} has values of mixed or unsupported types, which can not be memory-mapped".format(column_name)
+            )
+
+
+    @staticmethod
+    def write(
+        dirname,
+        metadata_point_list
+    ):
+        """
+        Writes metadata points into a directory in columnar format.
+
+        Column kinds are inferred from the values:
+
+            - `str` values: string column.
+            - Sequences and numpy arrays: ragged column.
+            - Any other value: fixed-width column.
+
+        Missing and `None` values make the column nullable. Columns without any value are
+        written as nullable fixed-width columns. Values must be memory-mappable: columns mixing
+        strings with other values, or whose values would be stored as Python objects (e.g. mixed
+        types or arbitrary objects), are rejected.
+
+        :param dirname: str
+            Name of the directory to write into.
+            The directory must exist or this method will fail.
+        :param metadata_point_list: list of dict
+            Metadata points of all dataset items.
+        """
+
+        num_items = len(metadata_point_list)
+
+        column_name_list = []
+        for metadata_point in metadata_point_list:
+            for column_name in metadata_point.keys():
+                if column_name not in column_name_list:
+                    column_name_list.append(column_name)
+
+        columns_dict = {
+            "num_items": num_items,
+            "columns": {}
+        }
+
+        for column_name in column_name_list:
+
+            value_list = [metadata_point.get(column_name, None) for metadata_point in metadata_point_list]
+            valid_arr = numpy.asarray([value is not None for value in value_list], dtype=bool)
+
+            first_value = value_list[int(numpy.argmax(valid_arr))]
+
+            if isinstance(first_value, str):
+                column_kind = "str"
+            elif isinstance(first_value, (list, tuple, numpy.ndarray)):
+                column_kind = "ragged"
+            else:
+                column_kind = "fixed"
+
+            if column_kind == "str" and not all(isinstance(value, str) for value in value_list if value is not None):
+                raise ValueError("Column {:s} mixes string and non-string values".format(column_name))
+
+            # Save column arrays
+
+            if column_kind == "fixed":
+
+                if first_value is None:
+                    values_arr = numpy.zeros(shape=(num_items,), dtype=numpy.uint8)
+                else:
+                    fill_value = numpy.zeros(shape=(), dtype=numpy.asarray(first_value).dtype)
+                    values_arr = numpy.asarray([fill_value if value is None else value for value in value_list])
+
+                ColumnarMetadataStore._check_mmap_dtype(column_name, values_arr)
+
+                numpy.save(os.path.join(dirname, "{:s}.npy".format(column_name)), values_arr)
+
+            else:
+
+                if column_kind == "str":
+                    value_arr_list = [
+                        numpy.frombuffer(("" if value is None else value).encode("utf-8"), dtype=numpy.uint8)
+                        for value in value_list
+                    ]
+                else:
+                    value_arr_list = [
+                        numpy.asarray([] if value is None else value).ravel()
+                        for value in value_list
+                    ]
+
+                offsets_arr = numpy.zeros(shape=(num_items + 1,), dtype=numpy.int64)
+                offsets_arr[1:] = numpy.cumsum([value_arr.shape[0] for value_arr in value_arr_list])
+
+                values_dtype = numpy.result_type(*[value_arr.dtype for value_arr in value_arr_list if value_arr.shape[0] > 0]) \
+                    if offsets_arr[-1] > 0 else numpy.int64
+                values_arr = numpy.concatenate(value_arr_list).astype(values_dtype) \
+                    if num_items > 0 else numpy.empty(shape=(0,), dtype=values_dtype)
+
+                ColumnarMetadataStore._check_mmap_dtype(column_name, values_arr)
+
+                numpy.save(os.path.join(dirname, "{:s}.values.npy".format(column_name)), values_arr)
+                numpy.save(os.path.join(dirname, "{:s}.offsets.npy".format(column_name)), offsets_arr)
+
+            nullable = not bool(numpy.all(valid_arr))
+
+            if nullable:
+                numpy.save(os.path.join(dirname, "{:s}.valid.npy".format(column_name)), valid_arr)
+
+            columns_dict["columns"][column_name] = {
+                "kind": column_kind,
+                "nullable": nullable
+            }
+
+        goripy.file.json.save_json(columns_dict, os.path.join(dirname, "columns.json"))
+
+
+
+class BaseColumnarDataset(BaseDataset):
+    """
+    Base class for datasets with metadata stored in a `ColumnarMetadataStore`.
+
+    Implements `getitem_metadata` and `__len__` reading from the store, and
+    uses a fixed-width store column as the split mask. Subclasses are expected to implement
+    `__getitem__`, and may use `getitem_metadata` to locate the data point.
+
+    :param metadata_dirname: str
+        Name of the directory containing the columnar metadata.
+    :param split_mask_name: str, optional
+        Name of the store column to use as split mask.
+        If not provided, no split mask is used.
+    """
+
+    def __init__(
+        self,
+        metadata_dirname,
+        split_mask_name=None
+    ):
+
+        super().__init__()
+
+        self._metadata_store = ColumnarMetadataStore(metadata_dirname)
+
+        self._split_mask_name = split_mask_name
+        self._split_mask = None if split_mask_name is None else self._metadata_store.get_column(split_mask_name)
+
+        self._byte_attr_name_list = ["_metadata_store"]
+        self._fingerprint_attr_name_list = ["_metadata_dirname"]
+        self._metadata_dirname = os.path.abspath(metadata_dirname)
+
+
+    def getitem_metadata(
+        self,
+        idx
+    ):
+
+        return self._metadata_store.get_item(idx)
+
+
+    def __len__(
+        self
+    ):
+
+        return len(self._metadata_store)
@@ -0,0 +1,512 @@
+import os
+import queue
+import pickle
+import threading
+import multiprocessing
+
+import numpy
+import torch
+
+import goripy.file.json
+
+from gorideep.datasets.base import BaseDataset
+from gorideep.datasets.columnar import ColumnarMetadataStore
+
+
+
+class ShardWriter:
+    """
+    Packs data points into large record shards, meant to be read sequentially by
+    `ShardedStreamingDataset`.
+
+    Shards are written into a directory with the following files:
+
+        - `shard_<shard_idx>.rec`: Pickled data points, concatenated.
+        - `shard_<shard_idx>.idx.npy`: Record byte offsets, with shape (<# shard items> + 1,).
+        - `shards.json`: List of shards with their number of items.
+        - `metadata/`: A `ColumnarMetadataStore` with the metadata points of all items, in the
+          same order as they were written.
+
+    Data points should contain already encoded data (e.g. image file bytes) rather than decoded
+    tensors, in order to keep shards small.
+
+    :param dirname: str
+        Name of the directory to write shards into. Created if it does not exist.
+    :param max_shard_items: int, default=1000
+        Maximum number of data points per shard.
+    :param max_shard_bytes: int, default=268435456
+        Maximum number of bytes per shard (approximately, a shard is closed after exceeding it).
+    """
+
+    def __init__(
+        self,
+        dirname,
+        max_shard_items=1000,
+        max_shard_bytes=256 * 1024 * 1024
+    ):
+
+        self._dirname = dirname
+        self._max_shard_items = max_shard_items
+        self._max_shard_bytes = max_shard_bytes
+
+        os.makedirs(self._dirname, exist_ok=True)
+
+        # Initialize internal state
+
+        self._shard_list = []
+        self._metadata_point_list = []
+
+        self._shard_file = None
+        self._shard_offset_list = None
+
+
+    def write(
+        self,
+        data_point,
+        metadata_point=None
+    ):
+        """
+        Appends one data point to the current shard.
+
+        :param data_point: dict
+            The data point to write.
+        :param metadata_point: dict, optional
+            The metadata point of the data point.
+            If not provided, an empty metadata point is stored.
+        """
+
+        if self._shard_file is None:
+            self._open_shard()
+
+        record_bytes = pickle.dumps(data_point, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._shard_file.write(record_bytes)
+        self._shard_offset_list.append(self._shard_offset_list[-1] + len(record_bytes))
+
+        self._metadata_point_list.append({} if metadata_point is None else metadata_point)
+
+        if \
+            (len(self._shard_offset_list) - 1 >= self._max_shard_items) or \
+            (self._shard_offset_list[-1] >= self._max_shard_bytes):
+
+            self._close_shard()
+
+
+    def close(
+        self
+    ):
+        """
+        Closes the current shard and writes the shard list and metadata.
+        Must be called after all data points have been written.
+        """
+
+        if self._shard_file is not None:
+            self._close_shard()
+
+        metadata_dirname = os.path.join(self._dirname, "metadata")
+        os.makedirs(metadata_dirname, exist_ok=True)
+
+        ColumnarMetadataStore.write(metadata_dirname, self._metadata_point_list)
+
+        goripy.file.json.save_json(
+            {"shards": self._shard_list},
+            os.path.join(self._dirname, "shards.json")
+        )
+
+
+    def __enter__(
+        self
+    ):
+
+        return self
+
+
+    def __exit__(
+        self,
+        exc_type,
+        exc_value,
+        traceback
+    ):
+
+        if exc_type is None:
+            self.close()
+        elif self._shard_file is not None:
+            self._shard_file.close()
+
+
+    def _open_shard(
+        self
+    ):
+
+        shard_name = "shard_{:06d}".format(len(self._shard_list))
+
+        self._shard_file = open(os.path.join(self._dirname, "{:s}.rec".format(shard_name)), "wb")
+        self._shard_offset_list = [0]
+
+
+    def _close_shard(
+        self
+    ):
+
+        shard_name = "shard_{:06d}".format(len(self._shard_list))
+
+        self._shard_file.close()
+        self._shard_file = None
+
+        numpy.save(
+            os.path.join(self._dirname, "{:s}.idx.npy".format(shard_name)),
+            numpy.asarray(self._shard_offset_list, dtype=numpy.int64)
+        )
+
+        self._shard_list.append({
+            "name": shard_name,
+            "num_items": len(self._shard_offset_list) - 1
+        })
+
+
+
+class ShardedStreamingDataset(BaseDataset, torch.utils.data.IterableDataset):
+    """
+    Streaming dataset that reads record shards written by `ShardWriter` sequentially.
+
+    Shards are assigned to every DDP rank and DataLoader worker in a round-robin fashion (shuffled
+    every epoch if `shuffle` is True), read whole with read-ahead in a background thread, and data
+    points are shuffled within a buffer. The data transform is applied to every data point.
+
+    Metadata points can be accessed randomly with `getitem_metadata`, using item indices in the
+    order they were written.
+
+    In a distributed setting, ranks may be assigned different numbers of data points. Shards
+    should be numerous and of similar size so that all ranks run similar numbers of steps.
+    The dataset length (and thus the DataLoader length) is the number of data points assigned
+    to the current rank in the current epoch (see `set_epoch`), while `get_num_items` returns
+    the total number of data points, which metadata indices range over.
+
+    The epoch number is kept in shared memory, so that DataLoader workers (including persistent
+    workers) follow `set_epoch` calls made in the main process.
+
+    If `split_str` is provided, only data points of that split are streamed (records of other
+    splits are skipped without being unpickled), and the dataset length counts only them.
+
+    :param dirname: str
+        Name of the directory containing the shards.
+    :param shuffle: bool, default=True
+        If True, shards are assigned in a different order every epoch, and data points are
+        shuffled within a buffer.
+    :param shuffle_buffer_size: int, default=1000
+        Number of data points in the shuffle buffer.
+    :param num_read_ahead_shards: int, default=1
+        Number of shards to read ahead in a background thread.
+    :param seed: int, default=0
+        Random seed for shuffling. Must be the same in all DDP ranks.
+    :param split_mask_name: str, optional
+        Name of the metadata column to use as split mask.
+        If not provided, no split mask is used.
+    :param split_str: str, optional
+        Split to stream ("train", "val" or "test"). Requires `split_mask_name`.
+        If not provided, data points of all splits are streamed.
+    """
+
+    def __init__(
+        self,
+        dirname,
+        shuffle=True,
+        shuffle_buffer_size=1000,
+        num_read_ahead_shards=1,
+        seed=0,
+        split_mask_name=None,
+        split_str=None
+    ):
+
+        super().__init__()
+
+        self._dirname = dirname
+        self._shuffle = shuffle
+        self._shuffle_buffer_size = shuffle_buffer_size
+        self._num_read_ahead_shards = num_read_ahead_shards
+        self._seed = seed
+
+        self._shard_list = goripy.file.json.load_json(os.path.join(dirname, "shards.json"))["shards"]
+        self._metadata_store = ColumnarMetadataStore(os.path.join(dirname, "metadata"))
+
+        self._split_mask_name = split_mask_name
+        self._split_mask = None if split_mask_name is None else self._metadata_store.get_column(split_mask_name)
+
+        if split_str is not None:
+            if split_mask_name is None:
+                raise ValueError("Split mask not provided")
+            if split_str not in self._split_str_to_idx_dict:
+                raise ValueError("Invalid split: {:s}".format(split_str))
+
+        self._split_str = split_str
+
+        # Compute shard start indices and (split) numbers of items
+
+        shard_total_num_items_arr = numpy.asarray(
+            [shard_dict["num_items"] for shard_dict in self._shard_list],
+            dtype=numpy.int64
+        )
+
+        self._shard_start_arr = numpy.cumsum(shard_total_num_items_arr) - shard_total_num_items_arr
+
+        if split_str is None:
+            self._shard_num_items_arr = shard_total_num_items_arr
+        else:
+            split_item_cumsum_arr = numpy.concatenate([
+                [0], numpy.cumsum(numpy.asarray(self._split_mask) == self._split_str_to_idx_dict[split_str])
+            ])
+            self._shard_num_items_arr = \
+                split_item_cumsum_arr[self._shard_start_arr + shard_total_num_items_arr] - \
+                split_item_cumsum_arr[self._shard_start_arr]
+
+        self._byte_attr_name_list = ["_shard_list", "_metadata_store"]
+        self._fingerprint_attr_name_list = ["_shard_list", "_split_str"]
+
+        # Shared with DataLoader workers, which keep their own copy of the dataset
+
+        self._epoch_value = multiprocessing.RawValue("q", 0)
+
+        self._rank, self._world_size = 0, 1
+        self._update_rank()
+
+
+    def _update_rank(
+        self
+    ):
+        """
+        Registers the current DDP rank and world size.
+        DataLoader worker processes can not query them, so they are registered in the main
+        process (on creation, on `set_epoch`, and whenever shards are assigned outside workers).
+        """
+
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            self._rank, self._world_size = torch.distributed.get_rank(), torch.distributed.get_world_size()
+
+
+    def set_epoch(
+        self,
+        epoch
+    ):
+        """
+        Sets the epoch number, used to shuffle shards and data points differently every epoch.
+        Must be called at the beginning of every epoch, with the same value in all DDP ranks.
+        Persistent DataLoader workers see the new epoch number through shared memory.
+
+        :param epoch: int
+            The epoch number.
+        """
+
+        self._epoch_value.value = epoch
+
+        self._update_rank()
+
+
+    def _get_rank_shard_idx_arr(
+        self,
+        epoch
+    ):
+        """
+        Assigns shards to the current rank, for an epoch.
+
+        :param epoch: int
+            The epoch number.
+
+        :return: int
+            The current rank.
+        :return: numpy.ndarray
+            Indices of the shards assigned to the current rank, in order.
+        """
+
+        rng = numpy.random.default_rng((self._seed, epoch))
+
+        shard_idx_arr = numpy.arange(len(self._shard_list))
+        if self._shuffle: rng.shuffle(shard_idx_arr)
+
+        if torch.utils.data.get_worker_info() is None:
+            self._update_rank()
+
+        return self._rank, shard_idx_arr[self._rank::self._world_size]
+
+
+    def __iter__(
+        self
+    ):
+
+        # Assign shards to the current rank and worker
+
+        epoch = self._epoch_value.value
+        rank, shard_idx_arr = self._get_rank_shard_idx_arr(epoch)
+
+        worker_id, num_workers = 0, 1
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+
+        shard_idx_arr = shard_idx_arr[worker_id::num_workers]
+
+        # Each worker shuffles its buffer with its own random stream
+
+        rng = numpy.random.default_rng((self._seed, epoch, rank, worker_id))
+
+        # Stream data points through the shuffle buffer
+
+        shuffle_buffer = []
+
+        for data_point in self._iter_shard_data_points(shard_idx_arr):
+
+            if not self._shuffle or self._shuffle_buffer_size <= 1:
+                yield self._apply_data_transform(data_point)
+                continue
+
+            if len(shuffle_buffer) < self._shuffle_buffer_size:
+                shuffle_buffer.append(data_point)
+                continue
+
+            buffer_idx = rng.integers(len(shuffle_buffer))
+            shuffle_buffer[buffer_idx], data_point = data_point, shuffle_buffer[buffer_idx]
+
+            yield self._apply_data_transform(data_point)
+
+        rng.shuffle(shuffle_buffer)
+
+        for data_point in shuffle_buffer:
+            yield self._apply_data_transform(data_point)
+
+
+    def _iter_shard_data_points(
+        self,
+        shard_idx_arr
+    ):
+        """
+        Iterates over the data points of multiple shards, reading whole shards ahead in a
+        background thread. If a split is selected, records of other splits are skipped.
+
+        :param shard_idx_arr: numpy.ndarray
+            Indices of the shards to read, in order.
+        """
+
+        shard_queue = queue.Queue(maxsize=max(self._num_read_ahead_shards, 1))
+        stop_event = threading.Event()
+
+        def put_shard_item(shard_item):
+
+            # Give up if the consumer stopped iterating
+
+            while not stop_event.is_set():
+                try:
+                    shard_queue.put(shard_item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def read_shards():
+
+            try:
+
+                for shard_idx in shard_idx_arr:
+
+                    shard_name = self._shard_list[shard_idx]["name"]
+
+                    with open(os.path.join(self._dirname, "{:s}.rec".format(shard_name)), "rb") as shard_file:
+                        shard_bytes = shard_file.read()
+
+                    shard_offset_arr = numpy.load(os.path.join(self._dirname, "{:s}.idx.npy".format(shard_name)))
+                    shard_record_idx_arr = self._get_shard_record_idxs(shard_idx, shard_offset_arr.shape[0] - 1)
+
+                    if not put_shard_item((shard_bytes, shard_offset_arr, shard_record_idx_arr)): return
+
+                put_shard_item(None)
+
+            except Exception as exception:
+
+                put_shard_item(exception)
+
+        read_thread = threading.Thread(target=read_shards, daemon=True)
+        read_thread.start()
+
+        try:
+
+            while True:
+
+                shard_item = shard_queue.get()
+
+                if shard_item is None: break
+                if isinstance(shard_item, Exception): raise shard_item
+
+                shard_bytes, shard_offset_arr, shard_record_idx_arr = shard_item
+                shard_view = memoryview(shard_bytes)
+
+                record_start_list = shard_offset_arr[shard_record_idx_arr].tolist()
+                record_end_list = shard_offset_arr[shard_record_idx_arr + 1].tolist()
+
+                for record_start, record_end in zip(record_start_list, record_end_list):
+                    yield pickle.loads(shard_view[record_start:record_end])
+
+        finally:
+
+            stop_event.set()
+
+
+    def _get_shard_record_idxs(
+        self,
+        shard_idx,
+        shard_num_items
+    ):
+        """
+        Selects the records of a shard that belong to the selected split.
+
+        :param shard_idx: int
+            Index of the shard.
+        :param shard_num_items: int
+            Number of records in the shard.
+
+        :return: numpy.ndarray
+            Indices of the selected records within the shard, in order.
+        """
+
+        if self._split_str is None:
+            return numpy.arange(shard_num_items)
+
+        shard_start = int(self._shard_start_arr[shard_idx])
+        shard_split_mask = numpy.asarray(self._split_mask[shard_start:shard_start + shard_num_items])
+
+        return numpy.flatnonzero(shard_split_mask == self._split_str_to_idx_dict[self._split_str])
+
+
+    def _apply_data_transform(
+        self,
+        data_point
+    ):
+
+        if self._data_transform is not None:
+            data_point = self._data_transform(data_point)
+
+        return data_point
+
+
+    def getitem_metadata(
+        self,
+        idx
+    ):
+
+        return self._metadata_store.get_item(idx)
+
+
+    def __len__(
+        self
+    ):
+
+        # Data points assigned to the current rank in the current epoch
+
+        _, shard_idx_arr = self._get_rank_shard_idx_arr(self._epoch_value.value)
+
+        return int(self._shard_num_items_arr[shard_idx_arr].sum())
+
+
+    def get_num_items(
+        self
+    ):
+
+        return len(self._metadata_store)
@@ -0,0 +1,518 @@
+import os
+import mmap
+import fcntl
+import errno
+import pickle
+import struct
+import hashlib
+import warnings
+
+import numpy
+import torch
+
+from gorideep.datasets.base import BaseDataset
+
+
+
+class SharedMemoryCachedDataset(BaseDataset):
+    """
+    Dataset wrapper that caches the data points of another dataset in node-local shared memory,
+    so that all DataLoader workers of all ranks in a node share a single cache.
+
+    The cache is backed by two memory-mapped files in `cache_dirname` (by default `/dev/shm`):
+
+        - A data file with one fixed-size slot of `slot_bytes` bytes per dataset item.
+          Since the file is sparse, memory is only used by the slots that were written.
+        - An index file with a header and one state byte per dataset item (0 means empty, 1
+          means ready).
+
+    The header identifies the cache contents (format version, number of items, slot size and a
+    fingerprint of the wrapped dataset, its data transform class and `cache_tag`). If existing
+    cache files do not match, they are reset. Data transform parameters are not part of the
+    fingerprint, so `cache_tag` must be changed whenever they change.
+
+    Every process holds a shared lock of the index file while the cache files are mapped, and
+    cache files are only reset if no other process holds it. Otherwise (e.g. another job uses the
+    same `cache_name` with different contents), a `RuntimeError` is raised. Opening is serialized
+    through a third lock file.
+
+    The index is lock-free: every dataset item owns its slot, and a slot is only marked as ready
+    after its data has been written and flushed (which also orders the writes before the ready
+    byte on weakly-ordered CPUs). If two processes load the same data point simultaneously,
+    both write the same bytes into the slot. Slot memory is allocated before writing into it, so
+    that a full shared memory filesystem makes data points not be cached (instead of crashing
+    the process).
+
+    Tensors are stored as raw buffers. By default, they are read back as copies. With `zero_copy`,
+    they are read back as tensors sharing memory with the cache through a read-only memory map,
+    so modifying them in-place crashes the process instead of corrupting the cache for all
+    processes. Other data point values are pickled. Data points that do not fit in a slot are not
+    cached.
+
+    The data transform of the wrapped dataset must only contain deterministic operations, as its
+    outputs are cached. Random operations must be set as the data transform of this wrapper,
+    which is applied after every cache lookup.
+
+    Cache files are not removed automatically, since they are shared by multiple processes.
+    Call `unlink` once all processes are done (e.g. from rank 0 at the end of training).
+
+    :param dataset: gorideep.datasets.base.BaseDataset
+        Dataset to wrap.
+    :param cache_name: str
+        Name of the cache. All processes using the same name share the cache.
+    :param slot_bytes: int
+        Number of bytes of each data point slot.
+    :param cache_dirname: str, default="/dev/shm"
+        Name of the directory where the cache files are created.
+    :param cache_tag: str, default=""
+        Extra string identifying the cache contents (e.g. a data transform configuration).
+    :param zero_copy: bool, default=False
+        If True, cached tensors are returned as read-only views of the cache, without copies.
+    """
+
+    _slot_alignment = 64
+
+    _header_magic = b"GDSHMC\0\0"
+    _header_format_version = 1
+    _header_struct = struct.Struct("<8sQQQ32s")
+    _header_bytes = 64
+
+
+    def __init__(
+        self,
+        dataset,
+        cache_name,
+        slot_bytes,
+        cache_dirname="/dev/shm",
+        cache_tag="",
+        zero_copy=False
+    ):
+
+        super().__init__()
+
+        self._dataset = dataset
+        self._cache_name = cache_name
+        self._slot_bytes = slot_bytes
+        self._cache_dirname = cache_dirname
+        self._cache_tag = cache_tag
+        self._zero_copy = zero_copy
+
+        self._data_filename = os.path.join(cache_dirname, "{:s}.data".format(cache_name))
+        self._index_filename = os.path.join(cache_dirname, "{:s}.index".format(cache_name))
+        self._lock_filename = os.path.join(cache_dirname, "{:s}.lock".format(cache_name))
+
+        self._index_fd = None
+        self._data_fd = None
+        self._data_mmap = None
+        self._data_read_mmap = None
+        self._index_arr = None
+
+
+    def __getstate__(
+        self
+    ):
+
+        # Files and memory maps are re-opened in every process
+
+        state = self.__dict__.copy()
+        state["_index_fd"] = None
+        state["_data_fd"] = None
+        state["_data_mmap"] = None
+        state["_data_read_mmap"] = None
+        state["_index_arr"] = None
+
+        return state
+
+
+    def _get_header(
+        self
+    ):
+        """
+        Builds the index file header identifying the cache contents.
+
+        :return: bytes
+            The header, padded to `_header_bytes` bytes.
+        """
+
+        data_transform = getattr(self._dataset, "_data_transform", None)
+
+        if data_transform is None:
+            data_transform_name = "None"
+        elif hasattr(data_transform, "get_stage_names"):
+            data_transform_name = " | ".join(data_transform.get_stage_names())
+        else:
+            data_transform_name = "{:s}.{:s}".format(type(data_transform).__module__, type(data_transform).__qualname__)
+
+        fingerprint_hash = hashlib.sha256()
+        fingerprint_hash.update(self._dataset.get_fingerprint().encode("utf-8"))
+        fingerprint_hash.update(data_transform_name.encode("utf-8"))
+        fingerprint_hash.update(self._cache_tag.encode("utf-8"))
+
+        header_bytes = self._header_struct.pack(
+            self._header_magic,
+            self._header_format_version,
+            len(self._dataset),
+            self._slot_bytes,
+            fingerprint_hash.digest()
+        )
+
+        return header_bytes.ljust(self._header_bytes, b"\0")
+
+
+    def _open(
+        self
+    ):
+        """
+        Opens (and creates or resets, if necessary) the cache files.
+        Cache files are validated while holding the exclusive lock file, and reset if their header
+        does not match the expected one and no other process has them mapped. A shared lock of the
+        index file is held for as long as the cache files are mapped.
+        """
+
+        num_items = len(self._dataset)
+        header_bytes = self._get_header()
+
+        lock_fd = os.open(self._lock_filename, os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+
+            index_fd = os.open(self._index_filename, os.O_RDWR | os.O_CREAT, 0o600)
+
+            try:
+
+                if os.pread(index_fd, self._header_bytes, 0) == header_bytes:
+                    fcntl.flock(index_fd, fcntl.LOCK_SH)
+                else:
+                    self._reset(index_fd, header_bytes, num_items)
+
+                index_mmap = mmap.mmap(index_fd, self._header_bytes + num_items)
+
+            except BaseException:
+
+                os.close(index_fd)
+                raise
+
+        finally:
+
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
+        self._index_fd = index_fd
+        self._index_arr = numpy.frombuffer(index_mmap, dtype=numpy.uint8, offset=self._header_bytes)
+
+        # The data file is sparse, and slots are allocated before being written
+
+        self._data_fd = os.open(self._data_filename, os.O_RDWR)
+
+        if os.fstat(self._data_fd).st_size < num_items * self._slot_bytes:
+            os.ftruncate(self._data_fd, num_items * self._slot_bytes)
+
+        self._data_mmap = mmap.mmap(self._data_fd, num_items * self._slot_bytes)
+
+        if self._zero_copy:
+            self._data_read_mmap = mmap.mmap(self._data_fd, num_items * self._slot_bytes, prot=mmap.PROT_READ)
+
+
+    def _reset(
+        self,
+        index_fd,
+        header_bytes,
+        num_items
+    ):
+        """
+        Resets both cache files, writing the header last, and leaves a shared lock of the index
+        file. Must be called while holding the exclusive lock file.
+
+        :raise RuntimeError:
+            If other processes have the cache files mapped.
+        """
+
+        try:
+            fcntl.flock(index_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(
+                "Cache {:s} is in use by other processes with different contents".format(self._cache_name)
+            )
+
+        data_fd = os.open(self._data_filename, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.ftruncate(data_fd, 0)
+        finally:
+            os.close(data_fd)
+
+        os.ftruncate(index_fd, 0)
+        os.ftruncate(index_fd, self._header_bytes + num_items)
+        os.pwrite(index_fd, header_bytes, 0)
+
+        fcntl.flock(index_fd, fcntl.LOCK_SH)
+
+
+    def _allocate(
+        self,
+        start,
+        num_bytes
+    ):
+        """
+        Allocates memory for a range of the data file, so that writing into it can not fail
+        with a bus error when the filesystem is full.
+
+        :return: bool
+            True iff the memory was allocated.
+        """
+
+        try:
+
+            os.posix_fallocate(self._data_fd, start, num_bytes)
+            return True
+
+        except OSError as exception:
+
+            if exception.errno not in [errno.EOPNOTSUPP, errno.EINVAL]: return False
+
+        # Fall back to checking free space, if allocation is not supported
+
+        fs_stat = os.statvfs(self._data_filename)
+        return fs_stat.f_bavail * fs_stat.f_frsize >= num_bytes
+
+
+    def __getitem__(
+        self,
+        dataset_idx
+    ):
+
+        if self._data_mmap is None:
+            self._open()
+
+        if self._index_arr[dataset_idx] == 1:
+            data_point = self._read_slot(dataset_idx)
+        else:
+            data_point = self._dataset[dataset_idx]
+            # The slot is only marked as ready after all of its data has been written and flushed
+            if self._write_slot(dataset_idx, data_point):
+                self._flush_slot(dataset_idx)
+                self._index_arr[dataset_idx] = 1
+
+        if self._data_transform is not None:
+            data_point = self._data_transform(dict(data_point))
+
+        return data_point
+
+
+    def _write_slot(
+        self,
+        dataset_idx,
+        data_point
+    ):
+        """
+        Writes a data point into its slot.
+
+        Slot layout: header length (8 bytes), pickled header, and tensor buffers (aligned).
+        The header contains non-tensor values, and the key, dtype, shape and slot offset of every
+        tensor.
+
+        :return: bool
+            True iff the data point fit in the slot.
+        """
+
+        tensor_key_list = [key for key, value in data_point.items() if isinstance(value, torch.Tensor)]
+        tensor_list = [data_point[key].detach().cpu().contiguous() for key in tensor_key_list]
+
+        tensor_info_list = []
+        tensor_offset = 0
+
+        for tensor_key, tensor in zip(tensor_key_list, tensor_list):
+            tensor_info_list.append((tensor_key, tensor.dtype, tuple(tensor.shape), tensor_offset))
+            tensor_offset += self._align(tensor.numel() * tensor.element_size())
+
+        header_bytes = pickle.dumps(
+            {
+                "value_dict": {key: value for key, value in data_point.items() if key not in tensor_key_list},
+                "tensor_info_list": tensor_info_list
+            },
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+        tensor_start = self._align(8 + len(header_bytes))
+        if tensor_start + tensor_offset > self._slot_bytes: return False
+
+        slot_start = dataset_idx * self._slot_bytes
+        if not self._allocate(slot_start, tensor_start + tensor_offset): return False
+
+        self._data_mmap[slot_start:slot_start + 8] = struct.pack("<Q", len(header_bytes))
+        self._data_mmap[slot_start + 8:slot_start + 8 + len(header_bytes)] = header_bytes
+
+        for (_, _, _, tensor_offset), tensor in zip(tensor_info_list, tensor_list):
+            tensor_bytes = tensor.view(-1).view(torch.uint8).numpy()
+            buffer_start = slot_start + tensor_start + tensor_offset
+            self._data_mmap[buffer_start:buffer_start + tensor_bytes.shape[0]] = tensor_bytes
+
+        return True
+
+
+    def _flush_slot(
+        self,
+        dataset_idx
+    ):
+        """
+        Flushes a slot of the data file. Besides syncing the memory map, the system call acts as
+        a memory barrier, so that the slot data is visible to other processes before its ready
+        byte.
+        """
+
+        slot_start = dataset_idx * self._slot_bytes
+        flush_start = slot_start - slot_start % mmap.PAGESIZE
+
+        self._data_mmap.flush(flush_start, slot_start + self._slot_bytes - flush_start)
+
+
+    def _read_slot(
+        self,
+        dataset_idx
+    ):
+        """
+        Reads a data point from its slot. Tensors are copied, or share memory with the cache
+        through a read-only memory map if `zero_copy` is set.
+        """
+
+        slot_start = dataset_idx * self._slot_bytes
+
+        header_len = struct.unpack("<Q", self._data_mmap[slot_start:slot_start + 8])[0]
+        header = pickle.loads(self._data_mmap[slot_start + 8:slot_start + 8 + header_len])
+
+        tensor_start = self._align(8 + header_len)
+
+        data_point = header["value_dict"]
+
+        for tensor_key, tensor_dtype, tensor_shape, tensor_offset in header["tensor_info_list"]:
+
+            tensor_numel = 1
+            for dim_size in tensor_shape: tensor_numel *= dim_size
+
+            if tensor_numel == 0:
+                data_point[tensor_key] = torch.empty(size=tensor_shape, dtype=tensor_dtype)
+                continue
+
+            if not self._zero_copy:
+                data_point[tensor_key] = torch.frombuffer(
+                    self._data_mmap,
+                    dtype=tensor_dtype,
+                    count=tensor_numel,
+                    offset=slot_start + tensor_start + tensor_offset
+                ).view(tensor_shape).clone()
+                continue
+
+            # PyTorch warns about non-writable buffers, which is intended here
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                data_point[tensor_key] = torch.frombuffer(
+                    self._data_read_mmap,
+                    dtype=tensor_dtype,
+                    count=tensor_numel,
+                    offset=slot_start + tensor_start + tensor_offset
+                ).view(tensor_shape)
+
+        return data_point
+
+
+    @classmethod
+    def _align(
+        cls,
+        num_bytes
+    ):
+
+        return -(-num_bytes // cls._slot_alignment) * cls._slot_alignment
+
+
+    def get_num_cached(
+        self
+    ):
+        """
+        Returns the number of data points currently cached (by any process).
+
+        :return: int
+            Number of cached data points.
+        """
+
+        if self._data_mmap is None:
+            self._open()
+
+        return int(numpy.count_nonzero(self._index_arr))
+
+
+    def unlink(
+        self
+    ):
+        """
+        Removes the cache files. Other processes must not use the cache afterwards.
+        """
+
+        for fd in [self._data_fd, self._index_fd]:
+            if fd is not None: os.close(fd)
+
+        self._index_fd = None
+        self._data_fd = None
+        self._data_mmap = None
+        self._data_read_mmap = None
+        self._index_arr = None
+
+        for filename in [self._data_filename, self._index_filename, self._lock_filename]:
+            if os.path.exists(filename): os.remove(filename)
+
+
+    ########
+
+
+    def getitem_metadata(
+        self,
+        idx
+    ):
+
+        return self._dataset.getitem_metadata(idx)
+
+
+    def getitems_metadata(
+        self,
+        idxs
+    ):
+
+        return self._dataset.getitems_metadata(idxs)
+
+
+    def __len__(
+        self
+    ):
+
+        return len(self._dataset)
+
+
+    def get_split_idxs(
+        self,
+        split_str,
+        copy=True
+    ):
+
+        return self._dataset.get_split_idxs(split_str, copy)
+
+
+    def get_fingerprint(
+        self
+    ):
+
+        return self._dataset.get_fingerprint()
+
+
+    def get_num_bytes(
+        self
+    ):
+
+        return self._dataset.get_num_bytes()
+
+
+    def show_num_bytes(
+        self
+    ):
+
+        self._dataset.show_num_bytes()
@@ -1,6 +1,8 @@
 import numpy
 import torch
 
+import gorideep.loss_registers.sync
+
 
 
 class EpochWiseLossRegister():
@@ -14,6 +16,11 @@ class EpochWiseLossRegister():
 
     In a distributed setting, accumulation of epoch data occurs locally in every subprocess.
     Synchronization must be done via the `synchronize` method.
+
+    Batch losses can be provided as device tensors, in which case they are accumulated on the
+    device (and NaN losses are detected there), without any host-device synchronization. Device
+    data is transferred to the host in one copy on `synchronize_epoch_data` (or
+    `flush_device_data`).
     """
 
     def __init__(
@@ -24,6 +31,8 @@ class EpochWiseLossRegister():
         self._epoch_total_items_list = []
         self._epoch_total_nan_batches_list = []
 
+        self._pending_sync_list = []
+
 
     def initialize_epoch_data(
         self
@@ -33,6 +42,8 @@ class EpochWiseLossRegister():
         Must be called at the beginning of every epoch.
         """
 
+        self.wait_sync_data()
+
         self._sync_curr_epoch_total_loss = 0.0
         self._sync_curr_epoch_total_items = 0
         self._sync_curr_epoch_total_nan_batches = 0
@@ -43,6 +54,10 @@ class EpochWiseLossRegister():
         self._curr_epoch_total_items = 0
         self._curr_epoch_total_nan_batches = 0
 
+        # Device buffer: [total loss, total items, total NaN batches]
+
+        self._curr_epoch_dev_ten = None
+
 
     def accumulate_batch(
         self,
@@ -53,17 +68,61 @@ class EpochWiseLossRegister():
         Accumulates one batch worth of loss into the epoch data buffers.
         Must be called after every ModuleTransform forward pass.
 
-        :param batch_loss: float
+        :param batch_loss: float or torch.Tensor
             Total loss generated by the batch.
-        :param batch_items: int
+            If a tensor is provided, it is accumulated on its device, and NaN losses are counted
+            as NaN batches (no need to call `accumulate_nan_batch`).
+        :param batch_items: int or torch.Tensor
             Number of training examples in the batch. 
         """
 
-        self._curr_epoch_total_loss += batch_loss
-        self._curr_epoch_total_items += batch_items
-
         self._sync_required = True
 
+        if not isinstance(batch_loss, torch.Tensor):
+            self._curr_epoch_total_loss += batch_loss
+            self._curr_epoch_total_items += batch_items
+            return
+
+        with torch.no_grad():
+
+            batch_loss_ten = batch_loss.detach().to(torch.float64).reshape(())
+
+            if self._curr_epoch_dev_ten is None:
+                self._curr_epoch_dev_ten = torch.zeros(size=(3,), dtype=torch.float64, device=batch_loss_ten.device)
+
+            # Python scalars are filled on the device, avoiding host-to-device copies
+
+            if isinstance(batch_items, torch.Tensor):
+                batch_items_ten = batch_items.detach().to(device=batch_loss_ten.device, dtype=torch.float64).reshape(())
+            else:
+                batch_items_ten = torch.full_like(batch_loss_ten, batch_items)
+
+            batch_nan_ten = torch.isnan(batch_loss_ten)
+
+            self._curr_epoch_dev_ten += torch.stack([
+                torch.where(batch_nan_ten, 0.0, batch_loss_ten),
+                torch.where(batch_nan_ten, 0.0, batch_items_ten),
+                batch_nan_ten.to(torch.float64)
+            ])
+
+
+    def flush_device_data(
+        self
+    ):
+        """
+        Transfers the epoch data accumulated on the device into the host epoch data buffers, in
+        one copy. Called automatically by `synchronize_epoch_data`.
+        """
+
+        if self._curr_epoch_dev_ten is None: return
+
+        dev_total_loss, dev_total_items, dev_total_nan_batches = self._curr_epoch_dev_ten.tolist()
+        self._curr_epoch_dev_ten.zero_()
+
+        self._curr_epoch_total_loss += dev_total_loss
+        self._curr_epoch_total_items += int(dev_total_items)
+        self._curr_epoch_total_nan_batches += int(dev_total_nan_batches)
+
 
     def accumulate_nan_batch(
         self
@@ -79,33 +138,75 @@ class EpochWiseLossRegister():
 
 
     def synchronize_epoch_data(
-        self
+        self,
+        async_op=False
     ):
         """
         Synchronizes epoch data buffers among all subprocesses.
         Must be called at the end of every epoch, immediately before `store_curr_epoch_data`.
         Can also be called at any point of the epoch if necessary, and sequential calls are
         idempotent, but calling this method often can incur heavy slowdowns.
+
+        Multiple loss registers can be synchronized at once with
+        `gorideep.loss_registers.sync.synchronize_loss_register_pool`.
+
+        :param async_op: bool, default=False
+            If True, the collectives are launched without waiting for them, and synchronized values
+            are unpacked on the next blocking synchronization, `wait_sync_data`, `poll_sync_data`
+            or `store_curr_epoch_data` call.
         """
 
-        if not self._sync_required: return
+        if not self._sync_required:
+            if not async_op: self.wait_sync_data()
+            return
 
-        rank = torch.distributed.get_rank()
-        device = torch.device(rank)
+        gorideep.loss_registers.sync.synchronize_loss_registers([self], async_op=async_op)
 
-        with torch.no_grad():
 
-            sync_curr_epoch_total_loss_ten = torch.FloatTensor([self._curr_epoch_total_loss]).to(device)
-            sync_curr_epoch_total_items_ten = torch.FloatTensor([self._curr_epoch_total_items]).to(device)
-            sync_curr_epoch_total_nan_batches_ten = torch.FloatTensor([self._curr_epoch_total_nan_batches]).to(device)
+    def wait_sync_data(
+        self
+    ):
+        """
+        Waits for all pending asynchronous synchronizations of this loss register, and unpacks
+        their synchronized values.
+        """
+
+        while len(self._pending_sync_list) > 0:
+            self._pending_sync_list[0].wait()
+
+
+    def poll_sync_data(
+        self
+    ):
+        """
+        Unpacks the synchronized values of the pending asynchronous synchronizations of this
+        loss register that have already finished, without blocking.
+        """
+
+        while len(self._pending_sync_list) > 0 and self._pending_sync_list[0].is_completed():
+            self._pending_sync_list[0].wait()
+
+
+    def pack_sync_data(
+        self
+    ):
+        """
+        Packs the epoch data buffers pending synchronization into flat arrays, all of whose
+        values must be reduced with a sum. Pending values are considered synchronizing until
+        `unpack_sync_data` is called.
+
+        Loss values are packed in float64, and counts in int64 (exact for any count).
+
+        :return: numpy.ndarray
+            Flat float64 array with the pending loss values, with shape (1,).
+        :return: numpy.ndarray
+            Flat int64 array with the pending counts, with shape (2,).
+        """
 
-            torch.distributed.all_reduce(sync_curr_epoch_total_loss_ten, torch.distributed.ReduceOp.SUM)
-            torch.distributed.all_reduce(sync_curr_epoch_total_items_ten, torch.distributed.ReduceOp.SUM)
-            torch.distributed.all_reduce(sync_curr_epoch_total_nan_batches_ten, torch.distributed.ReduceOp.SUM)
+        self.flush_device_data()
 
-            self._sync_curr_epoch_total_loss += float(sync_curr_epoch_total_loss_ten.cpu().item())
-            self._sync_curr_epoch_total_items += int(sync_curr_epoch_total_items_ten.cpu().item())
-            self._sync_curr_epoch_total_nan_batches += int(sync_curr_epoch_total_nan_batches_ten.cpu().item())
+        sync_float_arr = numpy.asarray([self._curr_epoch_total_loss], dtype=numpy.float64)
+        sync_int_arr = numpy.asarray([self._curr_epoch_total_items, self._curr_epoch_total_nan_batches], dtype=numpy.int64)
 
         self._sync_required = False
 
@@ -113,6 +214,28 @@ class EpochWiseLossRegister():
         self._curr_epoch_total_items = 0
         self._curr_epoch_total_nan_batches = 0
 
+        return sync_float_arr, sync_int_arr
+
+
+    def unpack_sync_data(
+        self,
+        sync_float_arr,
+        sync_int_arr
+    ):
+        """
+        Unpacks flat arrays of synchronized values, as packed by `pack_sync_data` and reduced
+        among all subprocesses, into the synchronized epoch data buffers.
+
+        :param sync_float_arr: numpy.ndarray
+            Flat float64 array with the synchronized loss values.
+        :param sync_int_arr: numpy.ndarray
+            Flat int64 array with the synchronized counts.
+        """
+
+        self._sync_curr_epoch_total_loss += float(sync_float_arr[0])
+        self._sync_curr_epoch_total_items += int(sync_int_arr[0])
+        self._sync_curr_epoch_total_nan_batches += int(sync_int_arr[1])
+
 
     def store_curr_epoch_data(
         self
@@ -122,6 +245,8 @@ class EpochWiseLossRegister():
         Must be called at the end of every epoch, immediately after `synchronize_epoch_data`.
         """
 
+        self.wait_sync_data()
+
         self._epoch_total_loss_list.append(self._sync_curr_epoch_total_loss)
         self._epoch_total_items_list.append(self._sync_curr_epoch_total_items)
         self._epoch_total_nan_batches_list.append(self._sync_curr_epoch_total_nan_batches)
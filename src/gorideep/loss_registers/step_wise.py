@@ -1,6 +1,9 @@
 import numpy
 import torch
 
+import gorideep.loss_registers.sync
+from gorideep.utils.buffers import GrowableArray
+
 
 
 class StepWiseLossRegister():
@@ -21,33 +24,54 @@ class StepWiseLossRegister():
     Synchronization must be done via the `synchronize` method.
 
     Only step data buffers from the current epoch are stored in memory, which are reset at the
-    beginning of every epoch, but it is possible to save them into files.
+    beginning of every epoch, but it is possible to save them into files. Step data buffers grow
+    as steps are stored, so the number of steps of an epoch does not need to be known in advance
+    (e.g. with iterable datasets), and only stored steps are ever reduced or saved.
+
+    Batch losses can be provided as device tensors, in which case step data is accumulated on the
+    device (and NaN losses are detected there), without any host-device synchronization. Device
+    step data is transferred to the host in one copy every `flush_num_steps` steps, and on
+    `synchronize_epoch_data` (or `flush_device_data`).
+
+    :param flush_num_steps: int, default=1024
+        Maximum number of steps of step data kept on the device before transferring it to the
+        host.
     """
 
     def __init__(
-        self
+        self,
+        flush_num_steps=1024
     ):
 
+        self._flush_num_steps = flush_num_steps
+
         self._epoch_total_loss_list = []
         self._epoch_total_items_list = []
         self._epoch_total_nan_steps_list = []
 
+        self._pending_sync_list = []
+
 
     def initialize_step_data(
         self,
-        epoch_num_steps
+        epoch_num_steps=None
     ):
         """
         Initializes step and epoch data buffers.
         Must be called at the beginning of every epoch.
-        
-        :param epoch_num_steps: int
-            Number of steps expected in this epoch.
+
+        :param epoch_num_steps: int, optional
+            Number of steps expected in this epoch, used to pre-allocate step data buffers.
+            If not provided (e.g. unknown), step data buffers are grown as needed.
         """
 
-        self._curr_epoch_step_total_loss_arr = numpy.empty(shape=(epoch_num_steps), dtype=float)
-        self._curr_epoch_step_total_items_arr = numpy.empty(shape=(epoch_num_steps), dtype=int)
-        self._curr_epoch_step_nan_flag_arr = numpy.empty(shape=(epoch_num_steps), dtype=bool)
+        self.wait_sync_data()
+
+        buffer_capacity = 1024 if epoch_num_steps is None else epoch_num_steps
+
+        self._curr_epoch_step_total_loss_buf = GrowableArray(dtype=float, capacity=buffer_capacity)
+        self._curr_epoch_step_total_items_buf = GrowableArray(dtype=int, capacity=buffer_capacity)
+        self._curr_epoch_step_nan_flag_buf = GrowableArray(dtype=bool, capacity=buffer_capacity)
 
         self._curr_step_total_loss = 0.0
         self._curr_step_total_items = 0
@@ -56,6 +80,14 @@ class StepWiseLossRegister():
         self._sync_step_num = 0
         self._curr_step_num = 0
 
+        self._pack_step_range_list = []
+
+        # Device buffers: current step [total loss, total items, NaN flag], and pending steps
+
+        self._curr_step_dev_ten = None
+        self._step_dev_ten = None
+        self._step_dev_num_steps = 0
+
 
     def accumulate_batch(
         self,
@@ -66,15 +98,52 @@ class StepWiseLossRegister():
         Accumulates one batch worth of loss into the step data buffers.
         Must be called after every ModuleTransform forward pass.
 
-        :param batch_loss: float
+        :param batch_loss: float or torch.Tensor
             Total loss generated by the batch.
-        :param batch_items: int
+            If a tensor is provided, it is accumulated on its device, and NaN losses mark the
+            step as a NaN step (no need to call `mark_nan_step`). Once a tensor has been provided,
+            step data is accumulated on the device until the end of the epoch.
+        :param batch_items: int or torch.Tensor
             Number of training examples in the batch. 
         """
 
-        if not self._curr_step_nan_flag:
-            self._curr_step_total_loss += batch_loss
-            self._curr_step_total_items += batch_items
+        if not isinstance(batch_loss, torch.Tensor) and self._curr_step_dev_ten is None:
+            if not self._curr_step_nan_flag:
+                self._curr_step_total_loss += batch_loss
+                self._curr_step_total_items += batch_items
+            return
+
+        with torch.no_grad():
+
+            if self._curr_step_dev_ten is None:
+                self._curr_step_dev_ten = torch.zeros(size=(3,), dtype=torch.float64, device=batch_loss.device)
+                self._step_dev_ten = torch.zeros(size=(self._flush_num_steps, 3), dtype=torch.float64, device=batch_loss.device)
+
+                # Host step data accumulated so far in this step is moved to the device
+
+                self._curr_step_dev_ten[0] = self._curr_step_total_loss
+                self._curr_step_dev_ten[1] = self._curr_step_total_items
+                self._curr_step_dev_ten[2] = float(self._curr_step_nan_flag)
+
+            # Python scalars are filled on the device, avoiding host-to-device copies
+
+            if isinstance(batch_loss, torch.Tensor):
+                batch_loss_ten = batch_loss.detach().to(torch.float64).reshape(())
+            else:
+                batch_loss_ten = torch.full_like(self._curr_step_dev_ten[0], batch_loss)
+
+            if isinstance(batch_items, torch.Tensor):
+                batch_items_ten = batch_items.detach().to(device=batch_loss_ten.device, dtype=torch.float64).reshape(())
+            else:
+                batch_items_ten = torch.full_like(batch_loss_ten, batch_items)
+
+            step_nan_ten = torch.maximum(self._curr_step_dev_ten[2], torch.isnan(batch_loss_ten).to(torch.float64))
+
+            self._curr_step_dev_ten.copy_(torch.stack([
+                torch.where(step_nan_ten > 0, 0.0, self._curr_step_dev_ten[0] + batch_loss_ten),
+                torch.where(step_nan_ten > 0, 0.0, self._curr_step_dev_ten[1] + batch_items_ten),
+                step_nan_ten
+            ]))
 
 
     def mark_nan_step(
@@ -89,6 +158,10 @@ class StepWiseLossRegister():
         self._curr_step_total_items = 0
         self._curr_step_nan_flag = True
 
+        if self._curr_step_dev_ten is not None:
+            self._curr_step_dev_ten[0:2] = 0.0
+            self._curr_step_dev_ten[2] = 1.0
+
 
     def store_curr_step_data(
         self
@@ -97,10 +170,30 @@ class StepWiseLossRegister():
         Stores the current step data from the step data buffers into the epoch data buffers.
         Must be called at the end of every step.
         """
-        
-        self._curr_epoch_step_total_loss_arr[self._curr_step_num] = self._curr_step_total_loss
-        self._curr_epoch_step_total_items_arr[self._curr_step_num] = self._curr_step_total_items
-        self._curr_epoch_step_nan_flag_arr[self._curr_step_num] = self._curr_step_nan_flag
+
+        # Device step data is stored into the pending device steps
+
+        if self._curr_step_dev_ten is not None:
+
+            self._step_dev_ten[self._step_dev_num_steps] = self._curr_step_dev_ten
+            self._step_dev_num_steps += 1
+
+            self._curr_step_dev_ten.zero_()
+
+            self._curr_step_total_loss = 0.0
+            self._curr_step_total_items = 0
+            self._curr_step_nan_flag = False
+
+            self._curr_step_num += 1
+
+            if self._step_dev_num_steps == self._flush_num_steps:
+                self.flush_device_data()
+
+            return
+
+        self._curr_epoch_step_total_loss_buf.append(self._curr_step_total_loss)
+        self._curr_epoch_step_total_items_buf.append(self._curr_step_total_items)
+        self._curr_epoch_step_nan_flag_buf.append(self._curr_step_nan_flag)
 
         self._curr_step_total_loss = 0.0
         self._curr_step_total_items = 0
@@ -109,36 +202,133 @@ class StepWiseLossRegister():
         self._curr_step_num += 1
 
 
-    def synchronize_epoch_data(
+    def flush_device_data(
         self
+    ):
+        """
+        Transfers the pending step data accumulated on the device into the host epoch data
+        buffers, in one copy. Called automatically every `flush_num_steps` steps and by
+        `synchronize_epoch_data`.
+        """
+
+        if self._step_dev_num_steps == 0: return
+
+        step_dev_arr = self._step_dev_ten[:self._step_dev_num_steps].cpu().numpy()
+
+        # Pending device steps always follow the steps stored in the host buffers
+
+        self._curr_epoch_step_total_loss_buf.extend(step_dev_arr[:, 0])
+        self._curr_epoch_step_total_items_buf.extend(step_dev_arr[:, 1])
+        self._curr_epoch_step_nan_flag_buf.extend(step_dev_arr[:, 2] > 0)
+
+        self._step_dev_num_steps = 0
+
+
+    def synchronize_epoch_data(
+        self,
+        async_op=False
     ):
         """
         Synchronizes epoch data buffers among all subprocesses.
         Must be called at the end of every epoch, immediately before `store_curr_epoch_data`.
         Can also be called at any point of the epoch if necessary, and sequential calls are
         idempotent, but calling this method often can incur heavy slowdowns.
+
+        Multiple loss registers can be synchronized at once with
+        `gorideep.loss_registers.sync.synchronize_loss_register_pool`.
+
+        :param async_op: bool, default=False
+            If True, the collectives are launched without waiting for them, and synchronized values
+            are unpacked on the next blocking synchronization, `wait_sync_data`, `poll_sync_data`
+            or `store_curr_epoch_data` call.
         """
         
-        if self._sync_step_num == self._curr_step_num: return
+        if self._sync_step_num == self._curr_step_num:
+            if not async_op: self.wait_sync_data()
+            return
 
-        rank = torch.distributed.get_rank()
-        device = torch.device(rank)
+        gorideep.loss_registers.sync.synchronize_loss_registers([self], async_op=async_op)
 
-        with torch.no_grad():
 
-            sync_curr_step_total_loss_ten = torch.FloatTensor(self._curr_epoch_step_total_loss_arr[self._sync_step_num:self._curr_step_num]).to(device)
-            sync_curr_step_total_items_ten = torch.FloatTensor(self._curr_epoch_step_total_items_arr[self._sync_step_num:self._curr_step_num]).to(device)
-            sync_curr_step_nan_flag_ten = torch.FloatTensor(self._curr_epoch_step_nan_flag_arr[self._sync_step_num:self._curr_step_num]).to(device)
+    def wait_sync_data(
+        self
+    ):
+        """
+        Waits for all pending asynchronous synchronizations of this loss register, and unpacks
+        their synchronized values.
+        """
+
+        while len(self._pending_sync_list) > 0:
+            self._pending_sync_list[0].wait()
 
-            torch.distributed.all_reduce(sync_curr_step_total_loss_ten, torch.distributed.ReduceOp.SUM)
-            torch.distributed.all_reduce(sync_curr_step_total_items_ten, torch.distributed.ReduceOp.SUM)
-            torch.distributed.all_reduce(sync_curr_step_nan_flag_ten, torch.distributed.ReduceOp.MAX)
 
-            self._curr_epoch_step_total_loss_arr[self._sync_step_num:self._curr_step_num] = sync_curr_step_total_loss_ten.cpu().numpy().astype(float)
-            self._curr_epoch_step_total_items_arr[self._sync_step_num:self._curr_step_num] = sync_curr_step_total_items_ten.cpu().numpy().astype(int)
-            self._curr_epoch_step_nan_flag_arr[self._sync_step_num:self._curr_step_num] = sync_curr_step_nan_flag_ten.cpu().numpy().astype(bool)
+    def poll_sync_data(
+        self
+    ):
+        """
+        Unpacks the synchronized values of the pending asynchronous synchronizations of this
+        loss register that have already finished, without blocking.
+        """
+
+        while len(self._pending_sync_list) > 0 and self._pending_sync_list[0].is_completed():
+            self._pending_sync_list[0].wait()
 
-        self._sync_step_num = self._curr_step_num
+
+    def pack_sync_data(
+        self
+    ):
+        """
+        Packs the step data pending synchronization into flat arrays, all of whose values must
+        be reduced with a sum (NaN flags are reduced with a sum and thresholded, emulating a max).
+        Pending steps are considered synchronizing until `unpack_sync_data` is called.
+
+        Loss values are packed in float64, and counts and flags in int64 (exact for any count).
+
+        :return: numpy.ndarray
+            Flat float64 array with the pending loss values, with shape (<# pending steps>,).
+        :return: numpy.ndarray
+            Flat int64 array with the pending counts and flags, with shape
+            (2 * <# pending steps>,).
+        """
+
+        self.flush_device_data()
+
+        sync_step_start_num, sync_step_end_num = self._sync_step_num, self._curr_step_num
+
+        sync_float_arr = self._curr_epoch_step_total_loss_buf.arr[sync_step_start_num:sync_step_end_num].astype(numpy.float64)
+
+        sync_int_arr = numpy.concatenate([
+            self._curr_epoch_step_total_items_buf.arr[sync_step_start_num:sync_step_end_num],
+            self._curr_epoch_step_nan_flag_buf.arr[sync_step_start_num:sync_step_end_num]
+        ]).astype(numpy.int64)
+
+        self._pack_step_range_list.append((sync_step_start_num, sync_step_end_num))
+        self._sync_step_num = sync_step_end_num
+
+        return sync_float_arr, sync_int_arr
+
+
+    def unpack_sync_data(
+        self,
+        sync_float_arr,
+        sync_int_arr
+    ):
+        """
+        Unpacks flat arrays of synchronized values, as packed by the oldest pending call to
+        `pack_sync_data` and reduced among all subprocesses, into the step data buffers.
+
+        :param sync_float_arr: numpy.ndarray
+            Flat float64 array with the synchronized loss values.
+        :param sync_int_arr: numpy.ndarray
+            Flat int64 array with the synchronized counts and flags.
+        """
+
+        sync_step_start_num, sync_step_end_num = self._pack_step_range_list.pop(0)
+        sync_num_steps = sync_step_end_num - sync_step_start_num
+
+        self._curr_epoch_step_total_loss_buf.arr[sync_step_start_num:sync_step_end_num] = sync_float_arr
+        self._curr_epoch_step_total_items_buf.arr[sync_step_start_num:sync_step_end_num] = sync_int_arr[:sync_num_steps]
+        self._curr_epoch_step_nan_flag_buf.arr[sync_step_start_num:sync_step_end_num] = sync_int_arr[sync_num_steps:] > 0
 
 
     def store_curr_epoch_data(
@@ -149,9 +339,13 @@ class StepWiseLossRegister():
         Must be called at the end of every epoch, immediately after `synchronize_epoch_data`.
         """
 
-        self._epoch_total_loss_list.append(numpy.sum(self._curr_epoch_step_total_loss_arr))
-        self._epoch_total_items_list.append(numpy.sum(self._curr_epoch_step_total_items_arr))
-        self._epoch_total_nan_steps_list.append(numpy.sum(self._curr_epoch_step_nan_flag_arr))
+        self.wait_sync_data()
+
+        self.flush_device_data()
+
+        self._epoch_total_loss_list.append(numpy.sum(self._curr_epoch_step_total_loss_buf.arr))
+        self._epoch_total_items_list.append(numpy.sum(self._curr_epoch_step_total_items_buf.arr))
+        self._epoch_total_nan_steps_list.append(numpy.sum(self._curr_epoch_step_nan_flag_buf.arr))
        
 
     def save_step_data(
@@ -167,11 +361,13 @@ class StepWiseLossRegister():
             Must have `.npz` extension.
         """
 
+        self.flush_device_data()
+
         numpy.savez(
             filename,
-            step_total_loss_arr=self._curr_epoch_step_total_loss_arr,
-            step_total_items_arr=self._curr_epoch_step_total_items_arr,
-            step_nan_flag_arr=self._curr_epoch_step_nan_flag_arr
+            step_total_loss_arr=self._curr_epoch_step_total_loss_buf.arr,
+            step_total_items_arr=self._curr_epoch_step_total_items_buf.arr,
+            step_nan_flag_arr=self._curr_epoch_step_nan_flag_buf.arr
         )
 
 
@@ -217,17 +413,26 @@ class StepWiseLossRegister():
     ########
 
 
+    @property
+    def curr_epoch_num_sync_steps(self):
+        # Steps whose synchronized values have already been unpacked
+        if len(self._pack_step_range_list) > 0: return self._pack_step_range_list[0][0]
+        return self._sync_step_num
+
     @property
     def curr_epoch_step_total_loss_arr(self):
-        return self._curr_epoch_step_total_loss_arr
+        self.flush_device_data()
+        return self._curr_epoch_step_total_loss_buf.arr
 
     @property
     def curr_epoch_step_total_items_arr(self):
-        return self._curr_epoch_step_total_items_arr
+        self.flush_device_data()
+        return self._curr_epoch_step_total_items_buf.arr
 
     @property
     def curr_epoch_step_nan_flag_arr(self):
-        return self._curr_epoch_step_nan_flag_arr
+        self.flush_device_data()
+        return self._curr_epoch_step_nan_flag_buf.arr
     
     @property
     def epoch_total_loss_list(self):
@@ -0,0 +1,232 @@
+import numpy
+import torch
+
+from gorideep.utils.device import get_collective_device
+
+
+
+def get_loss_register_list(
+    loss_reg_pool
+):
+    """
+    Flattens a (possibly nested) pool of loss registers into a list, in a deterministic order
+    (sorted keys), so that all subprocesses list loss registers in the same order.
+
+    :param loss_reg_pool: dict
+        Dict with loss registers, or nested dicts of loss registers.
+
+    :return: list
+        The loss registers.
+    """
+
+    loss_reg_list = []
+
+    for loss_reg_key in sorted(loss_reg_pool.keys()):
+
+        loss_reg = loss_reg_pool[loss_reg_key]
+
+        if isinstance(loss_reg, dict):
+            loss_reg_list += get_loss_register_list(loss_reg)
+        else:
+            loss_reg_list.append(loss_reg)
+
+    return loss_reg_list
+
+
+def synchronize_loss_register_pool(
+    loss_reg_pool,
+    async_op=False
+):
+    """
+    Synchronizes the epoch data buffers of all loss registers of a pool among all subprocesses,
+    with a fixed number of collectives.
+    Replaces calling `synchronize_epoch_data` on every loss register, which issues collectives
+    per loss register.
+
+    Must be called by all subprocesses, with pools with the same structure.
+
+    :param loss_reg_pool: dict
+        Dict with loss registers, or nested dicts of loss registers.
+    :param async_op: bool, default=False
+        If True, the collectives are launched without waiting for them (see
+        `synchronize_loss_registers`).
+
+    :return: PendingLossRegisterSync or None
+        The pending synchronization if `async_op` is True, otherwise None.
+    """
+
+    return synchronize_loss_registers(
+        get_loss_register_list(loss_reg_pool),
+        async_op=async_op
+    )
+
+
+def synchronize_loss_registers(
+    loss_reg_list,
+    async_op=False
+):
+    """
+    Synchronizes the epoch data buffers of multiple loss registers among all subprocesses, with
+    a fixed number of collectives.
+
+    Pending values of all loss registers are packed into two flat buffers (see `pack_sync_data`),
+    one with float64 loss values and one with int64 counts, so that reductions are exact for
+    long epochs and large counts. Both buffers are reduced with sum all-reduces, launched
+    back-to-back (max reductions are emulated with thresholded sums), and scattered back (see
+    `unpack_sync_data`). The number of collectives does not depend on the number of loss
+    registers.
+
+    Collectives run on the local GPU under the NCCL backend, and on CPU otherwise (see
+    `gorideep.utils.device.get_collective_device`).
+
+    If `async_op` is True, the all-reduces are launched asynchronously and training can continue
+    while they run. Synchronized values are unpacked when the returned pending synchronization is
+    waited for, which loss registers do automatically on their next blocking synchronization,
+    `wait_sync_data` or `store_curr_epoch_data` call. Values that finished synchronizing can also
+    be unpacked without blocking with `poll_sync_data`.
+
+    Must be called by all subprocesses, with the same loss registers in the same order.
+
+    :param loss_reg_list: list
+        The loss registers to synchronize.
+    :param async_op: bool, default=False
+        If True, the collectives are launched without waiting for them.
+
+    :return: PendingLossRegisterSync or None
+        The pending synchronization if `async_op` is True, otherwise None.
+    """
+
+    if len(loss_reg_list) == 0: return None
+
+    # Pack pending values of all loss registers
+
+    sync_float_arr_list, sync_int_arr_list = zip(*[loss_reg.pack_sync_data() for loss_reg in loss_reg_list])
+
+    sync_float_arr = numpy.concatenate(sync_float_arr_list)
+    sync_int_arr = numpy.concatenate(sync_int_arr_list)
+
+    # Launch collectives
+
+    device = get_collective_device()
+
+    with torch.no_grad():
+
+        sync_float_ten = torch.from_numpy(sync_float_arr).to(device)
+        sync_int_ten = torch.from_numpy(sync_int_arr).to(device)
+
+        work_list = [
+            torch.distributed.all_reduce(sync_float_ten, torch.distributed.ReduceOp.SUM, async_op=True),
+            torch.distributed.all_reduce(sync_int_ten, torch.distributed.ReduceOp.SUM, async_op=True)
+        ]
+
+    pending_sync = PendingLossRegisterSync(
+        loss_reg_list,
+        [(arr_1.shape[0], arr_2.shape[0]) for arr_1, arr_2 in zip(sync_float_arr_list, sync_int_arr_list)],
+        sync_float_ten,
+        sync_int_ten,
+        work_list
+    )
+
+    if async_op:
+        return pending_sync
+
+    pending_sync.wait()
+
+    return None
+
+
+
+class PendingLossRegisterSync:
+    """
+    A launched loss register synchronization, whose synchronized values have not been unpacked
+    into the loss registers yet.
+
+    Pending synchronizations are registered in every involved loss register, and always unpacked
+    in the order they were launched.
+
+    :param loss_reg_list: list
+        The loss registers being synchronized.
+    :param sync_size_list: list of tuple
+        Sizes of the packed float64 and int64 values of every loss register.
+    :param sync_float_ten: torch.Tensor
+        Flat float64 tensor being reduced.
+    :param sync_int_ten: torch.Tensor
+        Flat int64 tensor being reduced.
+    :param work_list: list of torch.distributed.Work
+        Work handles of the collectives.
+    """
+
+    def __init__(
+        self,
+        loss_reg_list,
+        sync_size_list,
+        sync_float_ten,
+        sync_int_ten,
+        work_list
+    ):
+
+        self._loss_reg_list = loss_reg_list
+        self._sync_size_list = sync_size_list
+        self._sync_float_ten = sync_float_ten
+        self._sync_int_ten = sync_int_ten
+        self._work_list = work_list
+
+        self._completed = False
+
+        for loss_reg in self._loss_reg_list:
+            loss_reg._pending_sync_list.append(self)
+
+
+    def is_completed(
+        self
+    ):
+        """
+        Checks, without blocking, whether the collectives have finished.
+
+        :return: bool
+            True iff the collectives have finished.
+        """
+
+        return self._completed or all(work.is_completed() for work in self._work_list)
+
+
+    def wait(
+        self
+    ):
+        """
+        Waits for the collectives to finish, and unpacks the synchronized values into the loss
+        registers. Earlier pending synchronizations of the same loss registers are waited for
+        first. Sequential calls are idempotent.
+        """
+
+        if self._completed: return
+
+        for loss_reg in self._loss_reg_list:
+            while loss_reg._pending_sync_list[0] is not self:
+                loss_reg._pending_sync_list[0].wait()
+
+        for work in self._work_list:
+            work.wait()
+
+        with torch.no_grad():
+            sync_float_arr = self._sync_float_ten.cpu().numpy()
+            sync_int_arr = self._sync_int_ten.cpu().numpy()
+
+        # Scatter synchronized values back
+
+        float_offset, int_offset = 0, 0
+
+        for loss_reg, (float_sync_size, int_sync_size) in zip(self._loss_reg_list, self._sync_size_list):
+
+            loss_reg.unpack_sync_data(
+                sync_float_arr[float_offset:float_offset + float_sync_size],
+                sync_int_arr[int_offset:int_offset + int_sync_size]
+            )
+            loss_reg._pending_sync_list.pop(0)
+
+            float_offset += float_sync_size
+            int_offset += int_sync_size
+
+        self._completed = True
+        self._sync_float_ten = None
+        self._sync_int_ten = None
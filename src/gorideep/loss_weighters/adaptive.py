@@ -0,0 +1,174 @@
+import os
+
+import numpy
+import torch
+
+from gorideep.loss_weighters.base import BaseLossWeighter
+from gorideep.utils.device import get_collective_device
+
+
+
+class BaseAdaptiveLossWeighter(BaseLossWeighter):
+    """
+    Base class for loss weighters that adapt loss weights to loss values during training.
+
+    Loss weights and all other internal state data are kept in float64 numpy arrays, indexed by
+    loss (see `_get_state_arr_dict`), so that:
+
+        - Synchronization broadcasts all internal state data from rank 0 with a single collective.
+        - Saving and loading use a single npz file.
+
+    Weights are normalized so that they add up to the number of managed losses. Losses not
+    managed by this loss weighter have weight 1.
+
+    :param loss_reg_key_list: list of str
+        Keys of the losses to manage.
+    :param loss_reg_pool_key: str, default="train"
+        Key of the loss register pool (e.g. "train" or "val") whose loss registers drive
+        loss weight updates.
+    """
+
+    def __init__(
+        self,
+        loss_reg_key_list,
+        loss_reg_pool_key="train"
+    ):
+
+        self._loss_reg_key_list = list(loss_reg_key_list)
+        self._loss_reg_key_idx_dict = {
+            loss_reg_key: loss_reg_idx
+            for loss_reg_idx, loss_reg_key in enumerate(self._loss_reg_key_list)
+        }
+
+        self._loss_reg_pool_key = loss_reg_pool_key
+
+        # Initialize internal state
+
+        self._loss_weight_arr = numpy.ones(shape=(len(self._loss_reg_key_list),), dtype=numpy.float64)
+
+
+    def _get_state_arr_dict(
+        self
+    ):
+        """
+        Collects references to the internal state arrays, which are synchronized, saved and
+        loaded in place.
+        Subclasses with additional internal state must extend this method.
+
+        :return: dict of str -> numpy.ndarray
+            The float64 internal state arrays, indexed by name.
+        """
+
+        return {
+            "loss_weight_arr": self._loss_weight_arr
+        }
+
+
+    def _get_epoch_loss_arr(
+        self,
+        loss_reg_pool
+    ):
+        """
+        Computes the last epoch mean loss values (total loss divided by total items) of the
+        managed losses.
+
+        :param loss_reg_pool: dict
+            Dict with all loss registers.
+
+        :return: numpy.ndarray
+            Mean loss values, with shape (<# losses>,). NaN if a loss has no items.
+        """
+
+        loss_arr = numpy.full(shape=(len(self._loss_reg_key_list),), fill_value=numpy.nan, dtype=numpy.float64)
+
+        for loss_reg_idx, loss_reg_key in enumerate(self._loss_reg_key_list):
+
+            loss_reg = loss_reg_pool[self._loss_reg_pool_key][loss_reg_key]
+
+            if len(loss_reg.epoch_total_items_list) > 0 and loss_reg.epoch_total_items_list[-1] > 0:
+                loss_arr[loss_reg_idx] = loss_reg.epoch_total_loss_list[-1] / loss_reg.epoch_total_items_list[-1]
+
+        return loss_arr
+
+
+    def _set_loss_weights(
+        self,
+        loss_weight_arr
+    ):
+        """
+        Normalizes and sets new loss weights, in place.
+        Loss weights are kept if any new loss weight is not finite.
+
+        :param loss_weight_arr: numpy.ndarray
+            New (unnormalized) loss weights, with shape (<# losses>,).
+        """
+
+        if not numpy.all(numpy.isfinite(loss_weight_arr)): return
+
+        loss_weight_sum = numpy.sum(loss_weight_arr)
+        if loss_weight_sum <= 0.0: return
+
+        self._loss_weight_arr[:] = loss_weight_arr * (len(self._loss_weight_arr) / loss_weight_sum)
+
+
+    ########
+
+
+    def synchronize(
+        self
+    ):
+
+        state_arr_list = list(self._get_state_arr_dict().values())
+
+        # Broadcast all internal state arrays packed into one flat buffer
+
+        sync_arr = numpy.concatenate([state_arr.reshape(-1) for state_arr in state_arr_list])
+
+        with torch.no_grad():
+
+            sync_ten = torch.from_numpy(sync_arr).to(get_collective_device())
+            torch.distributed.broadcast(sync_ten, src=0)
+
+            sync_arr = sync_ten.cpu().numpy()
+
+        # Scatter synchronized values back
+
+        offset = 0
+
+        for state_arr in state_arr_list:
+
+            state_arr[...] = sync_arr[offset:offset + state_arr.size].reshape(state_arr.shape)
+            offset += state_arr.size
+
+
+    def get_loss_weight(
+        self,
+        loss_reg_key
+    ):
+
+        loss_reg_idx = self._loss_reg_key_idx_dict.get(loss_reg_key, None)
+        if loss_reg_idx is None: return 1.0
+
+        return float(self._loss_weight_arr[loss_reg_idx])
+
+
+    def save(
+        self,
+        dirname
+    ):
+
+        numpy.savez(
+            os.path.join(dirname, "state.npz"),
+            loss_reg_key_arr=numpy.asarray(self._loss_reg_key_list, dtype=str),
+            **self._get_state_arr_dict()
+        )
+
+
+    def load(
+        self,
+        dirname
+    ):
+
+        with numpy.load(os.path.join(dirname, "state.npz"), allow_pickle=False) as state_npz:
+            for state_arr_name, state_arr in self._get_state_arr_dict().items():
+                state_arr[...] = state_npz[state_arr_name]
@@ -0,0 +1,71 @@
+import numpy
+
+from gorideep.loss_weighters.adaptive import BaseAdaptiveLossWeighter
+
+
+
+class DynamicWeightAveragingLossWeighter(BaseAdaptiveLossWeighter):
+    """
+    Implements Dynamic Weight Averaging (DWA): after every train epoch, loss weights are set
+    proportionally to a softmax of the rates of change of the losses over the last two epochs,
+    so that losses decreasing slower get higher weights.
+
+    Loss weights are uniform until two epochs of loss values are available.
+
+    :param loss_reg_key_list: list of str
+        Keys of the losses to manage.
+    :param temperature: float, default=2.0
+        Softmax temperature. Higher temperatures lead to more uniform loss weights.
+    :param loss_reg_pool_key: str, default="train"
+        Key of the loss register pool whose loss registers drive loss weight updates.
+    """
+
+    def __init__(
+        self,
+        loss_reg_key_list,
+        temperature=2.0,
+        loss_reg_pool_key="train"
+    ):
+
+        super().__init__(
+            loss_reg_key_list,
+            loss_reg_pool_key
+        )
+
+        self._temperature = temperature
+
+        # Initialize internal state
+
+        self._prev_loss_arr = numpy.full(shape=(len(self._loss_reg_key_list),), fill_value=numpy.nan, dtype=numpy.float64)
+
+
+    def _get_state_arr_dict(
+        self
+    ):
+
+        state_arr_dict = super()._get_state_arr_dict()
+        state_arr_dict["prev_loss_arr"] = self._prev_loss_arr
+
+        return state_arr_dict
+
+
+    ########
+
+
+    def event_after_train_epoch(
+        self,
+        loss_reg_pool
+    ):
+
+        loss_arr = self._get_epoch_loss_arr(loss_reg_pool)
+
+        # Softmax of loss rates of change
+
+        loss_rate_arr = loss_arr / self._prev_loss_arr
+        loss_rate_arr = (loss_rate_arr - numpy.max(loss_rate_arr)) / self._temperature
+
+        self._set_loss_weights(numpy.exp(loss_rate_arr))
+
+        # Internal state update
+
+        self._prev_loss_arr[:] = loss_arr
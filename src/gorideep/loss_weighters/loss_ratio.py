@@ -0,0 +1,136 @@
+import numpy
+
+from gorideep.loss_weighters.adaptive import BaseAdaptiveLossWeighter
+
+
+
+class LossRatioLossWeighter(BaseAdaptiveLossWeighter):
+    """
+    Implements loss-ratio balancing: loss weights are set proportionally to the ratios between
+    current and initial loss values (relative inverse training rates, as in GradNorm, but without
+    gradient computations), raised to a power, so that losses decreasing slower get higher
+    weights.
+
+    Loss weights are updated:
+
+        - After every train epoch, with the epoch mean loss values.
+        - If `update_num_steps` is provided, also every `update_num_steps` train steps, with the
+          mean loss values of those steps. Requires step-wise loss registers
+          (see `gorideep.loss_registers.step_wise.StepWiseLossRegister`), whose step data
+          must have been stored before this loss weighter is called.
+
+    Initial loss values are the first available mean loss values.
+
+    :param loss_reg_key_list: list of str
+        Keys of the losses to manage.
+    :param alpha: float, default=1.0
+        Power of the loss ratios. Higher values lead to stronger balancing, and 0 leads to
+        uniform loss weights.
+    :param update_num_steps: int, optional
+        Number of train steps between step-level loss weight updates.
+        If not provided, loss weights are only updated at epoch level.
+    :param loss_reg_pool_key: str, default="train"
+        Key of the loss register pool whose loss registers drive loss weight updates.
+    """
+
+    def __init__(
+        self,
+        loss_reg_key_list,
+        alpha=1.0,
+        update_num_steps=None,
+        loss_reg_pool_key="train"
+    ):
+
+        super().__init__(
+            loss_reg_key_list,
+            loss_reg_pool_key
+        )
+
+        self._alpha = alpha
+        self._update_num_steps = update_num_steps
+
+        # Initialize internal state
+
+        self._init_loss_arr = numpy.full(shape=(len(self._loss_reg_key_list),), fill_value=numpy.nan, dtype=numpy.float64)
+
+        self._epoch_step_num = 0
+
+
+    def _get_state_arr_dict(
+        self
+    ):
+
+        state_arr_dict = super()._get_state_arr_dict()
+        state_arr_dict["init_loss_arr"] = self._init_loss_arr
+
+        return state_arr_dict
+
+
+    def _update_loss_weights(
+        self,
+        loss_arr
+    ):
+        """
+        Updates loss weights from mean loss values.
+
+        :param loss_arr: numpy.ndarray
+            Mean loss values, with shape (<# losses>,).
+        """
+
+        # Register initial loss values
+
+        init_mask_arr = numpy.isnan(self._init_loss_arr) & numpy.isfinite(loss_arr) & (loss_arr > 0.0)
+        self._init_loss_arr[init_mask_arr] = loss_arr[init_mask_arr]
+
+        # Loss weight update
+
+        self._set_loss_weights((loss_arr / self._init_loss_arr) ** self._alpha)
+
+
+    ########
+
+
+    def event_before_train_epoch(
+        self,
+        loss_reg_pool
+    ):
+
+        self._epoch_step_num = 0
+
+
+    def event_after_train_step(
+        self,
+        loss_reg_pool
+    ):
+
+        self._epoch_step_num += 1
+
+        if self._update_num_steps is None: return
+        if self._epoch_step_num % self._update_num_steps != 0: return
+
+        # Mean loss values of the last steps
+
+        loss_arr = numpy.full(shape=(len(self._loss_reg_key_list),), fill_value=numpy.nan, dtype=numpy.float64)
+
+        for loss_reg_idx, loss_reg_key in enumerate(self._loss_reg_key_list):
+
+            loss_reg = loss_reg_pool[self._loss_reg_pool_key][loss_reg_key]
+
+            step_total_loss_arr = loss_reg.curr_epoch_step_total_loss_arr[-self._update_num_steps:]
+            step_total_items_arr = loss_reg.curr_epoch_step_total_items_arr[-self._update_num_steps:]
+            step_nan_flag_arr = loss_reg.curr_epoch_step_nan_flag_arr[-self._update_num_steps:]
+
+            total_items = numpy.sum(step_total_items_arr[~step_nan_flag_arr])
+
+            if total_items > 0:
+                loss_arr[loss_reg_idx] = numpy.sum(step_total_loss_arr[~step_nan_flag_arr]) / total_items
+
+        self._update_loss_weights(loss_arr)
+
+
+    def event_after_train_epoch(
+        self,
+        loss_reg_pool
+    ):
+
+        self._update_loss_weights(self._get_epoch_loss_arr(loss_reg_pool))
@@ -1,7 +1,8 @@
 class BaseModuleTransform:
     """
     Base module transform class for evaluating modules with tensors and computing losses.
-    Subclasses of this class are expected to implement the `__call__` method.
+    Subclasses of this class are expected to implement the `__call__` method, which should call
+    `_apply_batch_transforms` on the data batch before using it.
 
     :param data_counter_pool: dict of str -> gorideep.data_counters.base.BaseDataCounter
         The pool of data counters filled with the datasets.
@@ -10,6 +11,10 @@ class BaseModuleTransform:
         PyTorch device to send tensors to.
     :param logger: any, optional
         Logger object in case logging are needed.
+    :param batch_transform_list: list of gorideep.batch_transforms.base.BaseBatchTransform, optional
+        Batch transforms to apply to every data batch, in order (e.g. device transfers and
+        batched label encoding).
+        If not provided, no batch transforms are applied.
     """
 
 
@@ -17,11 +22,14 @@ class BaseModuleTransform:
         self,
         data_counter_pool,
         device,
-        logger=None
+        logger=None,
+        batch_transform_list=None
     ):
         
         self._device = device
         self._logger = logger
+
+        self._batch_transform_list = [] if batch_transform_list is None else batch_transform_list
         
 
     def __call__(
@@ -39,3 +47,23 @@ class BaseModuleTransform:
         """
 
         raise NotImplementedError()
+
+
+    def _apply_batch_transforms(
+        self,
+        data_batch
+    ):
+        """
+        Applies the batch transforms to a data batch.
+
+        :param data_batch: dict of str -> any
+            The data batch to process.
+
+        :return: dict of str -> any
+            The processed data batch.
+        """
+
+        for batch_transform in self._batch_transform_list:
+            data_batch = batch_transform(data_batch)
+
+        return data_batch
@@ -1,3 +1,4 @@
+import io
 import os
 
 import numpy
@@ -5,6 +6,8 @@ import torch
 
 import goripy.file.json
 
+from gorideep.utils.buffers import GrowableArray
+
 
 
 class BaseLRScheduler:
@@ -16,6 +19,16 @@ class BaseLRScheduler:
         - During the training loop.
         - At step and / or epoch level.
 
+    If all optimizer parameter group LRs are tensors (e.g. with capturable or fused optimizers),
+    a tensor LR mode is used, which avoids host-device synchronizations during the training loop:
+    parameter group LRs are re-bound as views of a single LR tensor, which is updated in place
+    every step from a device copy of the epoch LR table.
+
+    Schedules are defined in closed form, as LR factors (relative to the base LRs) of any step of
+    any epoch (see `lr_factor_at` and `lr_at`), so that resuming at any epoch costs O(1), and
+    schedules can be evaluated without updating the optimizer. The internal state is a single
+    compact binary blob (see `get_state_bytes`).
+
     :param optimizer: torch.optim.Optimizer
         Optimizer to manage with this scheduler.
     """
@@ -26,8 +39,14 @@ class BaseLRScheduler:
     ):
 
         self._optimizer = optimizer
+
+        self._lr_ten = None
         self._base_lr_dict = self._get_optimizer_lrs()
 
+        # Initialize internal state
+
+        self._curr_epoch = 1
+
 
     def initialize(
         self,
@@ -36,40 +55,264 @@ class BaseLRScheduler:
         """
         Initializes internal state according to a starting epoch.
         Called after the optimizer and scheduler data have been loaded.
+        Schedules are defined in closed form, so this costs O(1) for any starting epoch.
 
         :param start_epoch: int, default=1
             Used to advance the behaviour of this scheduler.
             The first epoch is 1 (default value), meaning standard behaviour.
         """
 
-        raise NotImplementedError
+        if start_epoch > self._curr_epoch:
+
+            self._curr_epoch = start_epoch
+
+
+    def set_base_lrs(
+        self,
+        base_lr_dict
+    ):
+        """
+        Sets the base LRs, which LR factors are relative to.
+        By default, the base LRs are the optimizer LRs when this scheduler is created.
+
+        :param base_lr_dict: dict
+            A dict containing all optimizer parameter group base LRs, indexed by
+            parameter group name.
+        """
+
+        self._base_lr_dict = dict(base_lr_dict)
+
+
+    def set_curr_epoch(
+        self,
+        curr_epoch
+    ):
+        """
+        Sets the current epoch (the next epoch to be scheduled), in O(1).
+        Unlike `initialize`, the current epoch may also be moved backwards.
+
+        :param curr_epoch: int
+            The current epoch. The first epoch is 1.
+        """
+
+        self._curr_epoch = curr_epoch
 
 
     ########
 
 
-    def event_before_train_epoch(
+    def lr_factor_at(
+        self,
+        epoch,
+        step=None,
+        epoch_num_steps=None
+    ):
+        """
+        Computes the LR factors (relative to the base LRs) of one or more steps of an epoch,
+        without side effects.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+        :param step: int or numpy.ndarray, optional
+            Step index (or indices) in the epoch.
+            If not provided, the LR factor of the last step of the epoch is computed.
+        :param epoch_num_steps: int, optional
+            Number of steps in the epoch.
+            If not provided (e.g. unknown), the epoch is regarded as a single step, as done during
+            the training loop.
+
+        :return: float or numpy.ndarray
+            The LR factor, or an array of LR factors if multiple step indices are provided.
+        """
+
+        if epoch_num_steps is None: epoch_num_steps, step = 1, 0
+        if step is None: step = epoch_num_steps - 1
+
+        step_arr = numpy.asarray(step, dtype=numpy.int64)
+
+        lr_factor_arr = self._get_lr_factor_arr(
+            epoch,
+            step_arr.reshape(-1),
+            epoch_num_steps
+        )
+
+        if step_arr.ndim == 0: return float(lr_factor_arr[0])
+        return lr_factor_arr.reshape(step_arr.shape)
+
+
+    def lr_at(
+        self,
+        epoch,
+        step=None,
+        epoch_num_steps=None
+    ):
+        """
+        Computes the LRs of one or more steps of an epoch, without side effects (see
+        `lr_factor_at`).
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+        :param step: int or numpy.ndarray, optional
+            Step index (or indices) in the epoch.
+            If not provided, the LRs of the last step of the epoch are computed.
+        :param epoch_num_steps: int, optional
+            Number of steps in the epoch.
+            If not provided (e.g. unknown), the epoch is regarded as a single step.
+
+        :return: dict
+            A dict containing all optimizer parameter group LRs (or arrays of LRs if multiple step
+            indices are provided), indexed by parameter group name.
+        """
+
+        lr_factor = self.lr_factor_at(epoch, step, epoch_num_steps)
+
+        return {
+            param_group_name: base_lr * lr_factor
+            for param_group_name, base_lr in self._base_lr_dict.items()
+        }
+
+
+    def _get_lr_factor_arr(
         self,
+        epoch,
+        step_arr,
         epoch_num_steps
+    ):
+        """
+        Computes the LR factors (relative to the base LRs) of multiple steps of an epoch, in
+        closed form. Must not have side effects.
+        Subclasses may implement this method to schedule LRs. By default, the base LRs are kept.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+        :param step_arr: numpy.ndarray
+            Step indices in the epoch, with shape (<# steps>,).
+        :param epoch_num_steps: int
+            Number of steps in the epoch.
+
+        :return: numpy.ndarray
+            The LR factors, with shape (<# steps>,).
+        """
+
+        return numpy.ones(shape=step_arr.shape, dtype=float)
+
+
+    def _get_epoch_progress_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+        """
+        Computes the training progress at the end of multiple steps of an epoch, in (fractional)
+        epochs. The end of the last step of an epoch always matches the epoch number, regardless
+        of the number of steps.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+        :param step_arr: numpy.ndarray
+            Step indices in the epoch, with shape (<# steps>,).
+        :param epoch_num_steps: int
+            Number of steps in the epoch.
+
+        :return: numpy.ndarray
+            The training progress, with shape (<# steps>,).
+        """
+
+        return (epoch - 1.0) + ((step_arr + 1.0) / epoch_num_steps)
+
+
+    def _apply_warmup(
+        self,
+        lr_factor_arr,
+        epoch_progress_arr,
+        num_warmup_epochs,
+        warmup_start_factor
+    ):
+        """
+        Applies a linear warmup to LR factors.
+
+        :param lr_factor_arr: numpy.ndarray
+            LR factors after the warmup.
+        :param epoch_progress_arr: numpy.ndarray
+            Training progress of every LR factor, in (fractional) epochs.
+        :param num_warmup_epochs: float
+            Number of warmup epochs. If 0, no warmup is applied.
+        :param warmup_start_factor: float
+            LR factor at the start of the warmup, linearly increasing up to 1.
+
+        :return: numpy.ndarray
+            The LR factors, with the warmup applied.
+        """
+
+        if num_warmup_epochs <= 0: return lr_factor_arr
+
+        warmup_ratio_arr = epoch_progress_arr / num_warmup_epochs
+        warmup_lr_factor_arr = ((1.0 - warmup_ratio_arr) * warmup_start_factor) + warmup_ratio_arr
+
+        return numpy.where(warmup_ratio_arr < 1.0, warmup_lr_factor_arr, lr_factor_arr)
+
+
+    ########
+
+
+    def event_before_train_epoch(
+        self,
+        epoch_num_steps=None,
+        global_batch_size=None
     ):
         """
         Called before the train loop of each epoch.
         Updates internal state and LRs.
+
+        Compiles the LRs of every step of the epoch into an LR table (see
+        `_compile_epoch_lr_table`), so that every step only needs one indexed write into the
+        optimizer parameter groups, and the table itself is the step LR log.
         
-        :param epoch_num_steps: int
+        :param epoch_num_steps: int, optional
             Number of expected steps in the following epoch.
+            If not provided (e.g. unknown), per-step schedules are not applied within the epoch.
+        :param global_batch_size: int, optional
+            Global batch size of the following epoch (among all subprocesses and gradient
+            accumulation steps). Ignored by schedulers that do not depend on it.
         """
 
-        # Register initial LRs
+        # Compile epoch LR table
 
-        self._init_lr_dict = self._get_optimizer_lrs()
+        self._param_group_name_list = [param_group["name"] for param_group in self._optimizer.param_groups]
 
-        # Prepare step LR arrays
+        epoch_lr_table_arr = numpy.asarray(self._compile_epoch_lr_table(epoch_num_steps), dtype=float)
 
-        self._step_lr_arr_dict = {
-            param_group_name: numpy.empty(shape=(epoch_num_steps), dtype=float)
-            for param_group_name in self._init_lr_dict.keys()
-        }
+        # The step LR buffer starts with the LR table, and grows if the epoch has more steps
+
+        self._step_lr_buf = GrowableArray(
+            item_shape=(len(self._param_group_name_list),),
+            dtype=float,
+            capacity=max(epoch_lr_table_arr.shape[0], 1 if epoch_num_steps is None else epoch_num_steps)
+        )
+        self._step_lr_buf.extend(epoch_lr_table_arr)
+
+        self._epoch_lr_table_num_steps = epoch_lr_table_arr.shape[0]
+        self._epoch_step_num = 0
+
+        # In tensor LR mode, the LR table is copied to the device once per epoch
+
+        self._epoch_lr_table_ten = None
+
+        if self._bind_lr_ten():
+            self._epoch_lr_table_ten = torch.from_numpy(epoch_lr_table_arr).to(
+                device=self._lr_ten.device,
+                dtype=self._lr_ten.dtype
+            )
+
+        # Set and register initial LRs
+
+        if self._epoch_lr_table_ten is None:
+            self._set_optimizer_lr_arr(epoch_lr_table_arr[0])
+        else:
+            self._lr_ten.copy_(self._epoch_lr_table_ten[0])
+
+        self._init_lr_dict = dict(zip(self._param_group_name_list, epoch_lr_table_arr[0].tolist()))
 
 
     def event_after_train_step(
@@ -84,12 +327,20 @@ class BaseLRScheduler:
             Current step index in the current epoch.
         """
 
-        # Update step LR arrays
+        # Steps beyond the LR table keep its last LRs
+
+        if epoch_step_idx >= len(self._step_lr_buf):
+            self._step_lr_buf.append(self._step_lr_buf.arr[-1].copy())
 
-        curr_lr_dict = self._get_optimizer_lrs()
+        self._epoch_step_num = epoch_step_idx + 1
 
-        for param_group_name, lr in curr_lr_dict.items():
-            self._step_lr_arr_dict[param_group_name][epoch_step_idx] = lr
+        # LR update (in tensor LR mode, a device-to-device copy)
+
+        if self._epoch_step_num < self._epoch_lr_table_num_steps:
+            if self._epoch_lr_table_ten is None:
+                self._set_optimizer_lr_arr(self._step_lr_buf.arr[self._epoch_step_num])
+            else:
+                self._lr_ten.copy_(self._epoch_lr_table_ten[self._epoch_step_num])
 
 
     def event_after_train_epoch(
@@ -100,14 +351,109 @@ class BaseLRScheduler:
         Updates internal state and LRs.
         """
 
+        # Internal state update
+
+        self._curr_epoch += 1
+
         # Register final LRs
 
         self._final_lr_dict = self._get_optimizer_lrs()
 
 
+    def _compile_epoch_lr_table(
+        self,
+        epoch_num_steps
+    ):
+        """
+        Computes the LRs of every step of the following epoch, from the closed form LR factors
+        (see `_get_lr_factor_arr`).
+
+        :param epoch_num_steps: int or None
+            Number of expected steps in the following epoch, or None if unknown.
+
+        :return: numpy.ndarray
+            LR table, with shape (<# steps>, <# param groups>), in optimizer parameter group
+            order. May contain a single row (e.g. for epoch-level schedules, or if the number of
+            steps is unknown), in which case the LRs are kept during the whole epoch.
+        """
+
+        table_num_steps = 1 if epoch_num_steps is None else epoch_num_steps
+
+        step_lr_factor_arr = self._get_lr_factor_arr(
+            self._curr_epoch,
+            numpy.arange(table_num_steps, dtype=numpy.int64),
+            table_num_steps
+        )
+
+        return step_lr_factor_arr[:, None] * self._get_param_group_lr_arr(self._base_lr_dict)[None, :]
+
+
     ########
 
 
+    def _bind_lr_ten(
+        self
+    ):
+        """
+        Re-binds the optimizer parameter group LRs as views of a single LR tensor, if all of
+        them are tensors. LRs already bound by another scheduler of the same optimizer (e.g.
+        sub-schedulers of a sequential scheduler) are reused, so their memory does not change.
+
+        :return: bool
+            True iff tensor LR mode is used.
+        """
+
+        lr_list = [param_group["lr"] for param_group in self._optimizer.param_groups]
+
+        if not all(isinstance(lr, torch.Tensor) for lr in lr_list):
+            self._lr_ten = None
+            return False
+
+        # Reuse a previously bound LR tensor
+
+        lr_base_ten = lr_list[0]._base
+
+        if \
+            (lr_base_ten is not None) and \
+            (tuple(lr_base_ten.shape) == (len(lr_list),)) and \
+            all(
+                (lr._base is lr_base_ten) and (lr.data_ptr() == lr_base_ten[lr_idx].data_ptr())
+                for lr_idx, lr in enumerate(lr_list)
+            ):
+
+            self._lr_ten = lr_base_ten
+            return True
+
+        # Bind a new LR tensor
+
+        with torch.no_grad():
+            self._lr_ten = torch.stack([lr.detach().reshape(()) for lr in lr_list])
+
+        for lr_idx, param_group in enumerate(self._optimizer.param_groups):
+            param_group["lr"] = self._lr_ten[lr_idx]
+
+        return True
+
+
+    def _is_lr_ten_bound(
+        self
+    ):
+        """
+        Checks whether the optimizer parameter group LRs are still views of the LR tensor (they
+        may have been replaced, e.g. when loading an optimizer state dict).
+
+        :return: bool
+            True iff tensor LR mode is used and the LR tensor is bound.
+        """
+
+        if self._lr_ten is None: return False
+
+        return all(
+            isinstance(param_group["lr"], torch.Tensor) and (param_group["lr"]._base is self._lr_ten)
+            for param_group in self._optimizer.param_groups
+        )
+
+
     def _get_optimizer_lrs(
         self
     ):
@@ -119,6 +465,12 @@ class BaseLRScheduler:
             parameter group name.
         """
         
+        if self._is_lr_ten_bound():
+            return dict(zip(
+                [param_group["name"] for param_group in self._optimizer.param_groups],
+                self._lr_ten.tolist()
+            ))
+
         lrs_dict = {}
 
         for param_group in self._optimizer.param_groups:
@@ -154,37 +506,93 @@ class BaseLRScheduler:
                 param_group["lr"] = new_lr
 
 
-    ########
+    def _get_optimizer_lr_arr(
+        self
+    ):
+        """
+        Extracts the optimizer parameter group LRs into an array.
 
+        :return: numpy.ndarray
+            Current LRs, with shape (<# param groups>,), in optimizer parameter group order.
+        """
 
-    def save_epoch_lr_data(
+        if self._is_lr_ten_bound():
+            return self._lr_ten.cpu().numpy().astype(float)
+
+        return numpy.asarray(
+            [
+                param_group["lr"].item() if isinstance(param_group["lr"], torch.Tensor) else param_group["lr"]
+                for param_group in self._optimizer.param_groups
+            ],
+            dtype=float
+        )
+
+
+    def _set_optimizer_lr_arr(
         self,
-        dirname
+        new_lr_arr
     ):
         """
-        Saves internal state data into a directory.
+        Updates the optimizer parameter group LRs from an array, without parameter group name
+        lookups.
 
-        :param dirname: str
-            Name of the directory to save internal state data into.
-            The directory must exist or this method will fail.
+        :param new_lr_arr: numpy.ndarray
+            New LRs, with shape (<# param groups>,), in optimizer parameter group order.
         """
 
-        goripy.file.json.save_json(
-            self._init_lr_dict,
-            os.path.join(dirname, "init_lr_dict.json")
-        )
+        if self._is_lr_ten_bound():
+            self._lr_ten.copy_(torch.from_numpy(numpy.asarray(new_lr_arr)))
+            return
 
-        numpy.savez(
-            os.path.join(dirname, "step_lr_arr_dict.npz"),
-            **(self._step_lr_arr_dict)
-        )
+        for param_group, new_lr in zip(self._optimizer.param_groups, new_lr_arr.tolist()):
 
-        goripy.file.json.save_json(
-            self._final_lr_dict,
-            os.path.join(dirname, "final_lr_dict.json")
+            if isinstance(param_group["lr"], torch.Tensor):
+                param_group["lr"].fill_(new_lr)
+            else:
+                param_group["lr"] = new_lr
+
+
+    def _get_param_group_lr_arr(
+        self,
+        lr_dict
+    ):
+        """
+        Converts a dict of LRs indexed by parameter group name into an array.
+
+        :param lr_dict: dict
+            A dict containing LRs, indexed by parameter group name.
+
+        :return: numpy.ndarray
+            LRs, with shape (<# param groups>,), in optimizer parameter group order.
+        """
+
+        return numpy.asarray(
+            [lr_dict[param_group["name"]] for param_group in self._optimizer.param_groups],
+            dtype=float
         )
 
 
+    ########
+
+
+    def get_step_lr_arr_dict(
+        self
+    ):
+        """
+        Returns the LRs of every step of the current (or last) epoch.
+
+        :return: dict of str -> numpy.ndarray
+            A dict containing the LR of every step, indexed by parameter group name.
+        """
+
+        step_lr_arr = self._step_lr_buf.arr[:self._epoch_step_num]
+
+        return {
+            param_group_name: step_lr_arr[:, param_group_idx]
+            for param_group_idx, param_group_name in enumerate(self._param_group_name_list)
+        }
+
+
     def save_epoch_lr_data(
         self,
         dirname
@@ -208,24 +616,94 @@ class BaseLRScheduler:
         )
 
         numpy.savez(
-            os.path.join(dirname, "step_lr_arr_dict.npz")
-            **self._step_lr_arr_dict
+            os.path.join(dirname, "step_lr_arr_dict.npz"),
+            **self.get_step_lr_arr_dict()
         )
 
 
+    def _get_state_arr_dict(
+        self
+    ):
+        """
+        Collects the internal state into arrays.
+        Subclasses with additional internal state may extend this method.
+
+        :return: dict of str -> numpy.ndarray
+            The internal state arrays, indexed by name.
+        """
+
+        return {
+            "curr_epoch": numpy.asarray(self._curr_epoch, dtype=numpy.int64),
+            "base_lr_name_arr": numpy.asarray(list(self._base_lr_dict.keys()), dtype=str),
+            "base_lr_arr": numpy.asarray(list(self._base_lr_dict.values()), dtype=float)
+        }
+
+
+    def _set_state_arr_dict(
+        self,
+        state_arr_dict
+    ):
+        """
+        Restores the internal state from arrays (see `_get_state_arr_dict`).
+
+        :param state_arr_dict: dict of str -> numpy.ndarray
+            The internal state arrays, indexed by name.
+        """
+
+        self._curr_epoch = int(state_arr_dict["curr_epoch"])
+        self._base_lr_dict = dict(zip(
+            state_arr_dict["base_lr_name_arr"].tolist(),
+            state_arr_dict["base_lr_arr"].tolist()
+        ))
+
+
+    def get_state_bytes(
+        self
+    ):
+        """
+        Serializes the internal state into a single compact binary blob (an uncompressed npz
+        archive, without pickled objects).
+
+        :return: bytes
+            The internal state blob.
+        """
+
+        state_bytes_io = io.BytesIO()
+        numpy.savez(state_bytes_io, **self._get_state_arr_dict())
+
+        return state_bytes_io.getvalue()
+
+
+    def set_state_bytes(
+        self,
+        state_bytes
+    ):
+        """
+        Restores the internal state from a binary blob (see `get_state_bytes`).
+
+        :param state_bytes: bytes
+            The internal state blob.
+        """
+
+        with numpy.load(io.BytesIO(state_bytes), allow_pickle=False) as state_npz:
+            self._set_state_arr_dict({key: state_npz[key] for key in state_npz.files})
+
+
     def save(
         self,
         dirname
     ):
         """
-        Saves internal state data into a directory.
+        Saves internal state data into a directory, as a single binary file (see
+        `get_state_bytes`).
 
         :param dirname: str
             Name of the directory to save internal state data into.
             The directory must exist or this method will fail.
         """
 
-        pass
+        with open(os.path.join(dirname, "state.npz"), "wb") as state_file:
+            state_file.write(self.get_state_bytes())
 
 
     def load(
@@ -233,11 +711,43 @@ class BaseLRScheduler:
         dirname
     ):
         """
-        Loads internal state data from a directory.
+        Loads internal state data from a directory (see `save`).
+
+        Directories saved with the legacy layout (`internal_state_dict.json` files, and
+        `sched_<i>` subdirectories for sequential schedulers) are also accepted: only the
+        current epoch is restored from them, since schedules are now defined in closed form.
+        Base LRs are kept as the optimizer LRs when this scheduler was created, so they must be
+        the initial LRs (i.e. the scheduler must be created before loading the optimizer state).
 
         :param dirname: str
             Name of the directory to load internal state data from.
             The directory must exist or this method will fail.
         """
 
-        pass
+        state_filename = os.path.join(dirname, "state.npz")
+
+        if not os.path.exists(state_filename):
+            self._load_legacy(dirname)
+            return
+
+        with open(state_filename, "rb") as state_file:
+            self.set_state_bytes(state_file.read())
+
+
+    def _load_legacy(
+        self,
+        dirname
+    ):
+        """
+        Loads the current epoch from a directory saved with the legacy layout, if any.
+
+        :param dirname: str
+            Name of the directory to load internal state data from.
+        """
+
+        internal_state_filename = os.path.join(dirname, "internal_state_dict.json")
+        if not os.path.exists(internal_state_filename): return
+
+        internal_state_dict = goripy.file.json.load_json(internal_state_filename)
+
+        self._curr_epoch = internal_state_dict["curr_epoch"]
@@ -0,0 +1,278 @@
+import math
+
+import numpy
+
+from gorideep.schedulers.base import BaseLRScheduler
+
+
+
+class BatchSizeScaledLRScheduler(BaseLRScheduler):
+    """
+    Scales the LRs of another LR scheduler according to the global batch size (among all
+    subprocesses and gradient accumulation steps), so that changing the effective batch size
+    (e.g. with elastic world sizes, gradient accumulation or batch size ramps) does not require
+    changing the LR schedule.
+
+    The wrapped scheduler only provides LR factors (see `lr_factor_at`), which are multiplied by
+    an LR scale, applied on top of the base LRs:
+
+        - Linear scaling rule: `global_batch_size / ref_batch_size`.
+        - Square root scaling rule: `sqrt(global_batch_size / ref_batch_size)`.
+
+    The LR scale can be warmed up linearly (per step) from 1 during the first epochs, to avoid
+    early instabilities of large batch sizes.
+
+    The global batch size of every epoch is taken from a batch size ramp if provided, otherwise
+    from the last value provided to `event_before_train_epoch`, otherwise the reference batch
+    size is assumed.
+
+    :param optimizer: torch.optim.Optimizer
+        Optimizer to manage with this scheduler.
+    :param scheduler: BaseLRScheduler
+        LR scheduler whose LR factors to scale. Its events are not called, and its internal
+        state is not used.
+
+    :param ref_batch_size: int
+        Reference global batch size, which the base LRs were tuned for.
+    :param scaling_rule: str, default="linear"
+        LR scaling rule. Either "linear" or "sqrt".
+    :param num_warmup_epochs: float, default=0
+        Number of (possibly fractional) warmup epochs of the LR scale. If 0, no warmup is applied.
+
+    :param batch_size_ramp: BatchSizeRamp, optional
+        Batch size ramp providing the global batch size of every epoch.
+    """
+
+    _scaling_rule_list = ["linear", "sqrt"]
+
+
+    def __init__(
+        self,
+        optimizer,
+        scheduler,
+        ref_batch_size,
+        scaling_rule="linear",
+        num_warmup_epochs=0,
+        batch_size_ramp=None
+    ):
+
+        super().__init__(optimizer)
+
+        if scaling_rule not in self._scaling_rule_list:
+            raise ValueError("Unknown scaling rule {:s}".format(scaling_rule))
+
+        self._scheduler = scheduler
+
+        self._ref_batch_size = ref_batch_size
+        self._scaling_rule = scaling_rule
+        self._num_warmup_epochs = num_warmup_epochs
+
+        self._batch_size_ramp = batch_size_ramp
+
+        # Initialize internal state
+
+        self._global_batch_size = None
+
+
+    ########
+
+
+    def get_global_batch_size(
+        self,
+        epoch
+    ):
+        """
+        Retrieves the global batch size of an epoch.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+
+        :return: int
+            The global batch size.
+        """
+
+        if self._batch_size_ramp is not None:
+            return self._batch_size_ramp.batch_size_at(epoch)
+
+        if self._global_batch_size is not None:
+            return self._global_batch_size
+
+        return self._ref_batch_size
+
+
+    def get_lr_scale(
+        self,
+        global_batch_size
+    ):
+        """
+        Computes the LR scale (without warmup) of a global batch size.
+
+        :param global_batch_size: int
+            The global batch size.
+
+        :return: float
+            The LR scale.
+        """
+
+        batch_size_ratio = global_batch_size / self._ref_batch_size
+
+        if self._scaling_rule == "sqrt":
+            return math.sqrt(batch_size_ratio)
+
+        return batch_size_ratio
+
+
+    def _get_lr_factor_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+
+        # Warm up the LR scale from 1
+
+        lr_scale = self.get_lr_scale(self.get_global_batch_size(epoch))
+
+        lr_scale_arr = lr_scale * self._apply_warmup(
+            numpy.ones(shape=step_arr.shape, dtype=float),
+            self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps),
+            self._num_warmup_epochs,
+            1.0 / lr_scale
+        )
+
+        return lr_scale_arr * self._scheduler.lr_factor_at(epoch, step_arr, epoch_num_steps)
+
+
+    ########
+
+
+    def event_before_train_epoch(
+        self,
+        epoch_num_steps=None,
+        global_batch_size=None
+    ):
+
+        # Update internal state
+
+        if global_batch_size is not None:
+            self._global_batch_size = global_batch_size
+
+        # Call super event
+
+        super().event_before_train_epoch(
+            epoch_num_steps,
+            global_batch_size
+        )
+
+
+    ########
+
+
+    def _get_state_arr_dict(
+        self
+    ):
+
+        state_arr_dict = super()._get_state_arr_dict()
+
+        state_arr_dict["global_batch_size"] = numpy.asarray(
+            -1 if self._global_batch_size is None else self._global_batch_size,
+            dtype=numpy.int64
+        )
+
+        return state_arr_dict
+
+
+    def _set_state_arr_dict(
+        self,
+        state_arr_dict
+    ):
+
+        super()._set_state_arr_dict(state_arr_dict)
+
+        global_batch_size = int(state_arr_dict["global_batch_size"])
+        self._global_batch_size = None if global_batch_size < 0 else global_batch_size
+
+
+
+class BatchSizeRamp:
+    """
+    Implements a batch size ramp, linearly growing the global batch size (among all subprocesses
+    and gradient accumulation steps) over epochs, to raise device utilization in later epochs.
+    The batch size is constant during every epoch.
+
+    Can be provided to `BatchSizeScaledLRScheduler`, so that LRs follow the batch size.
+
+    :param start_batch_size: int
+        Global batch size of the first epoch.
+    :param end_batch_size: int
+        Global batch size at the end of the ramp.
+    :param num_epochs: int
+        Number of epochs that the ramp should last for.
+        Afterwards, the batch size will stay at its ending value.
+    :param batch_size_multiple: int, default=1
+        Batch sizes are rounded down to multiples of this value (e.g. the world size times the
+        number of gradient accumulation steps).
+    """
+
+    def __init__(
+        self,
+        start_batch_size,
+        end_batch_size,
+        num_epochs,
+        batch_size_multiple=1
+    ):
+
+        self._start_batch_size = start_batch_size
+        self._end_batch_size = end_batch_size
+        self._num_epochs = num_epochs
+        self._batch_size_multiple = batch_size_multiple
+
+
+    def batch_size_at(
+        self,
+        epoch
+    ):
+        """
+        Computes the global batch size of an epoch.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+
+        :return: int
+            The global batch size.
+        """
+
+        epoch_ratio = min(max((epoch - 1.0) / max(self._num_epochs - 1, 1), 0.0), 1.0)
+
+        batch_size = self._start_batch_size + ((self._end_batch_size - self._start_batch_size) * epoch_ratio)
+        batch_size = int(batch_size) // self._batch_size_multiple * self._batch_size_multiple
+
+        return max(batch_size, self._batch_size_multiple)
+
+
+    def get_epoch_num_steps(
+        self,
+        epoch,
+        num_samples,
+        drop_last=False
+    ):
+        """
+        Computes the number of steps of an epoch.
+
+        :param epoch: int
+            Epoch number. The first epoch is 1.
+        :param num_samples: int
+            Number of samples in the epoch.
+        :param drop_last: bool, default=False
+            If True, the last incomplete batch is not counted.
+
+        :return: int
+            The number of steps.
+        """
+
+        batch_size = self.batch_size_at(epoch)
+
+        if drop_last:
+            return num_samples // batch_size
+
+        return -(-num_samples // batch_size)
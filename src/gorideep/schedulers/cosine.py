@@ -0,0 +1,74 @@
+import numpy
+
+from gorideep.schedulers.base import BaseLRScheduler
+
+
+
+class CosineLRScheduler(BaseLRScheduler):
+    """
+    Implements a cosine annealing LR scheduling policy, with an optional linear warmup.
+    LRs are updated every step (or every epoch, if the number of steps is unknown).
+
+    :param optimizer: torch.optim.Optimizer
+        Optimizer to manage with this scheduler.
+
+    :param num_epochs: float
+        Number of epochs that the scheduling (including the warmup) should last for.
+        Afterwards, the LR will stay at its minimum.
+    :param min_factor: float, default=0.0
+        Minimum factor for the LR, reached at the end of the annealing.
+
+    :param num_warmup_epochs: float, default=0
+        Number of (possibly fractional) warmup epochs. If 0, no warmup is applied.
+    :param warmup_start_factor: float, default=0.0
+        Starting factor for the LR during the warmup.
+    """
+
+    def __init__(
+        self,
+        optimizer,
+        num_epochs,
+        min_factor=0.0,
+        num_warmup_epochs=0,
+        warmup_start_factor=0.0
+    ):
+
+        super().__init__(optimizer)
+
+        self._num_epochs = num_epochs
+        self._min_factor = min_factor
+
+        self._num_warmup_epochs = num_warmup_epochs
+        self._warmup_start_factor = warmup_start_factor
+
+
+    ########
+
+
+    def _get_lr_factor_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+
+        epoch_progress_arr = self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps)
+
+        # Cosine annealing after the warmup
+
+        anneal_ratio_arr = numpy.clip(
+            (epoch_progress_arr - self._num_warmup_epochs) / max(self._num_epochs - self._num_warmup_epochs, 1e-12),
+            0.0,
+            1.0
+        )
+
+        lr_factor_arr = \
+            self._min_factor + \
+            ((1.0 - self._min_factor) * 0.5 * (1.0 + numpy.cos(numpy.pi * anneal_ratio_arr)))
+
+        return self._apply_warmup(
+            lr_factor_arr,
+            epoch_progress_arr,
+            self._num_warmup_epochs,
+            self._warmup_start_factor
+        )
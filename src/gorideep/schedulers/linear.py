@@ -1,7 +1,3 @@
-import os
-
-import goripy.file.json
-
 from gorideep.schedulers.base import BaseLRScheduler
 
 
@@ -21,6 +17,9 @@ class LinearStepLRScheduler(BaseLRScheduler):
     :param num_epochs: int
         Number of epochs that the linear scheduling should last for.
         Afterwards, the LR will continue with its update trend.
+
+    :param start_epoch: int, default=1
+        Epoch to start the linear scheduling on.
     """
 
     def __init__(
@@ -44,129 +43,20 @@ class LinearStepLRScheduler(BaseLRScheduler):
         self._curr_epoch = start_epoch
 
 
-    def initialize(
-        self,
-        start_epoch=1
-    ):
-        
-        if start_epoch > self._curr_epoch:
-                
-            self._curr_epoch = start_epoch
-
-
     ########
 
 
-    def event_before_train_epoch(
+    def _get_lr_factor_arr(
         self,
+        epoch,
+        step_arr,
         epoch_num_steps
     ):
 
-        # Pre-compute LR ratios
-
-        start_epoch_ratio = (self._curr_epoch - 1.0) / self._num_epochs
-        end_epoch_ratio = self._curr_epoch / self._num_epochs
-
-        self._start_epoch_lr_ratio = \
-            ((1.0 - start_epoch_ratio) * + self._start_factor) + \
-            (start_epoch_ratio * self._end_factor)
-        
-        self._end_epoch_lr_ratio = \
-            ((1.0 - end_epoch_ratio) * + self._start_factor) + \
-            (end_epoch_ratio * self._end_factor)
-
-        self._epoch_num_steps = epoch_num_steps
-        
-        # LR update
-
-        base_lr_dict = self._base_lr_dict.copy()
-    
-        epoch_step_idx = -1
-        curr_step_ratio = (epoch_step_idx + 2.0) / self._epoch_num_steps
-
-        lr_factor = \
-            ((1.0 - curr_step_ratio) * + self._start_epoch_lr_ratio) + \
-            (curr_step_ratio * self._end_epoch_lr_ratio)
-        
-        for param_group_name in base_lr_dict.keys():
-            base_lr_dict[param_group_name] *= lr_factor
-
-        self._set_optimizer_lrs(base_lr_dict)
-
-        # Call super event
-        
-        super().event_before_train_epoch(
-            epoch_num_steps
-        )
-
-
-    def event_after_train_step(
-        self,
-        epoch_step_idx
-    ):
-
-        # LR update
-
-        if epoch_step_idx < self._epoch_num_steps - 1:
-
-            base_lr_dict = self._base_lr_dict.copy()
-        
-            curr_step_ratio = (epoch_step_idx + 2.0) / self._epoch_num_steps
-
-            lr_factor = \
-                ((1.0 - curr_step_ratio) * + self._start_epoch_lr_ratio) + \
-                (curr_step_ratio * self._end_epoch_lr_ratio)
-            
-            for param_group_name in base_lr_dict.keys():
-                base_lr_dict[param_group_name] *= lr_factor
-
-            self._set_optimizer_lrs(base_lr_dict)
-
-        # Call super event
-
-        super().event_after_train_step(
-            epoch_step_idx
-        )
-
-
-    def event_after_train_epoch(
-        self
-    ):
-
-        # Internal state update
-
-        self._curr_epoch += 1
-
-        # Call super event
-
-        super().event_after_train_epoch()
-
-
-    ########
-
-
-    def save(
-        self,
-        dirname
-    ):
-        
-        internal_state_dict = {
-            "curr_epoch": self._curr_epoch,
-        }
-
-        goripy.file.json.save_json(
-            internal_state_dict,
-            os.path.join(dirname, "internal_state_dict.json")
-        )
+        # Interpolate LR factors along fractional epochs (the epoch ends at its last step)
 
+        epoch_ratio_arr = self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps) / self._num_epochs
 
-    def load(
-        self,
-        dirname
-    ):
-        
-        internal_state_dict = goripy.file.json.load_json(
-            os.path.join(dirname, "internal_state_dict.json")
-        )
-        
-        self._curr_epoch = internal_state_dict["curr_epoch"]
+        return \
+            ((1.0 - epoch_ratio_arr) * self._start_factor) + \
+            (epoch_ratio_arr * self._end_factor)
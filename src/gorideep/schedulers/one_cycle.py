@@ -0,0 +1,70 @@
+import numpy
+
+from gorideep.schedulers.base import BaseLRScheduler
+
+
+
+class OneCycleLRScheduler(BaseLRScheduler):
+    """
+    Implements a one-cycle LR scheduling policy: the LR is annealed (with cosine annealing) from
+    a starting value up to the base LR, and then down to an ending value.
+    LRs are updated every step (or every epoch, if the number of steps is unknown).
+
+    The base LRs (the optimizer LRs) are the maximum LRs of the cycle.
+
+    :param optimizer: torch.optim.Optimizer
+        Optimizer to manage with this scheduler.
+
+    :param num_epochs: float
+        Number of epochs that the cycle should last for.
+        Afterwards, the LR will stay at its ending value.
+    :param pct_start: float, default=0.3
+        Fraction of the cycle spent increasing the LR.
+    :param start_factor: float, default=0.04
+        Starting factor for the LR.
+    :param end_factor: float, default=4e-6
+        Ending factor for the LR.
+    """
+
+    def __init__(
+        self,
+        optimizer,
+        num_epochs,
+        pct_start=0.3,
+        start_factor=0.04,
+        end_factor=4e-6
+    ):
+
+        super().__init__(optimizer)
+
+        self._num_epochs = num_epochs
+        self._pct_start = pct_start
+        self._start_factor = start_factor
+        self._end_factor = end_factor
+
+
+    ########
+
+
+    def _get_lr_factor_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+
+        cycle_ratio_arr = numpy.clip(
+            self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps) / self._num_epochs,
+            0.0,
+            1.0
+        )
+
+        # Cosine annealing from the starting factor up to 1, and then down to the ending factor
+
+        up_ratio_arr = numpy.clip(cycle_ratio_arr / max(self._pct_start, 1e-12), 0.0, 1.0)
+        down_ratio_arr = numpy.clip((cycle_ratio_arr - self._pct_start) / max(1.0 - self._pct_start, 1e-12), 0.0, 1.0)
+
+        up_lr_factor_arr = 1.0 + ((self._start_factor - 1.0) * 0.5 * (1.0 + numpy.cos(numpy.pi * up_ratio_arr)))
+        down_lr_factor_arr = self._end_factor + ((1.0 - self._end_factor) * 0.5 * (1.0 + numpy.cos(numpy.pi * down_ratio_arr)))
+
+        return numpy.where(cycle_ratio_arr < self._pct_start, up_lr_factor_arr, down_lr_factor_arr)
@@ -0,0 +1,78 @@
+import numpy
+
+from gorideep.schedulers.base import BaseLRScheduler
+
+
+
+class PolynomialLRScheduler(BaseLRScheduler):
+    """
+    Implements a polynomial decay LR scheduling policy, with an optional linear warmup.
+    LRs are updated every step (or every epoch, if the number of steps is unknown).
+
+    :param optimizer: torch.optim.Optimizer
+        Optimizer to manage with this scheduler.
+
+    :param num_epochs: float
+        Number of epochs that the scheduling (including the warmup) should last for.
+        Afterwards, the LR will stay at its ending value.
+    :param power: float, default=1.0
+        Power of the polynomial decay (1.0 for linear decay).
+    :param end_factor: float, default=0.0
+        Ending factor for the LR.
+
+    :param num_warmup_epochs: float, default=0
+        Number of (possibly fractional) warmup epochs. If 0, no warmup is applied.
+    :param warmup_start_factor: float, default=0.0
+        Starting factor for the LR during the warmup.
+    """
+
+    def __init__(
+        self,
+        optimizer,
+        num_epochs,
+        power=1.0,
+        end_factor=0.0,
+        num_warmup_epochs=0,
+        warmup_start_factor=0.0
+    ):
+
+        super().__init__(optimizer)
+
+        self._num_epochs = num_epochs
+        self._power = power
+        self._end_factor = end_factor
+
+        self._num_warmup_epochs = num_warmup_epochs
+        self._warmup_start_factor = warmup_start_factor
+
+
+    ########
+
+
+    def _get_lr_factor_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+
+        epoch_progress_arr = self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps)
+
+        # Polynomial decay after the warmup
+
+        decay_ratio_arr = numpy.clip(
+            (epoch_progress_arr - self._num_warmup_epochs) / max(self._num_epochs - self._num_warmup_epochs, 1e-12),
+            0.0,
+            1.0
+        )
+
+        lr_factor_arr = \
+            self._end_factor + \
+            ((1.0 - self._end_factor) * ((1.0 - decay_ratio_arr) ** self._power))
+
+        return self._apply_warmup(
+            lr_factor_arr,
+            epoch_progress_arr,
+            self._num_warmup_epochs,
+            self._warmup_start_factor
+        )
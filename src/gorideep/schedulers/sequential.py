@@ -1,9 +1,4 @@
-import os
-import shutil
-
-import numpy
-
-import goripy.file.json
+import bisect
 
 from gorideep.schedulers.base import BaseLRScheduler
 
@@ -13,6 +8,11 @@ class SequentialLRScheduler(BaseLRScheduler):
     """
     Applies multiple LR schedulers sequentially.
 
+    Every sub-scheduler starts from the LRs at the end of the previous one, which are computed in
+    closed form from the LR factors of all previous sub-schedulers (see `lr_factor_at`). Thus, the
+    sub-scheduler and epoch of any epoch are known without replaying previous epochs, and only the
+    internal state of this scheduler needs to be saved.
+
     :param optimizer: torch.optim.Optimizer
         Optimizer to manage with this scheduler.
     
@@ -46,62 +46,100 @@ class SequentialLRScheduler(BaseLRScheduler):
 
         # Initialize internal state
 
-        self._curr_epoch = 1
-
         self._curr_sched_idx = 0
-        self._curr_sched_base_lr_dict = None
 
-        self._init_next_sched = True
+
+    ########
 
 
-    def initialize(
+    def _get_sched_epoch(
         self,
-        start_epoch=1
+        epoch
     ):
+        """
+        Maps an epoch to a sub-scheduler and an epoch of that sub-scheduler.
 
-        # Apply start_epoch
+        :param epoch: int
+            Epoch number. The first epoch is 1.
 
-        if start_epoch > self._curr_epoch:
+        :return: tuple of int
+            The sub-scheduler index and the sub-scheduler epoch number.
+        """
 
-            self._curr_epoch = start_epoch
+        sched_idx = bisect.bisect_left(self._milestones, epoch)
 
+        last_milestone_epoch = 0 if sched_idx == 0 else self._milestones[sched_idx - 1]
+        sched_epoch = self._start_epochs[sched_idx] + epoch - last_milestone_epoch - 1
 
-    ########
+        return sched_idx, sched_epoch
 
 
-    def event_before_train_epoch(
+    def _get_sched_base_lr_factor(
+        self,
+        sched_idx
+    ):
+        """
+        Computes the base LR factor of a sub-scheduler: the product of the LR factors at the end of
+        all previous sub-schedulers.
+
+        :param sched_idx: int
+            The sub-scheduler index.
+
+        :return: float
+            The base LR factor.
+        """
+
+        base_lr_factor = 1.0
+
+        for prev_sched_idx in range(sched_idx):
+
+            _, prev_sched_end_epoch = self._get_sched_epoch(self._milestones[prev_sched_idx])
+            base_lr_factor *= self._schedulers[prev_sched_idx].lr_factor_at(prev_sched_end_epoch)
+
+        return base_lr_factor
+
+
+    def _get_lr_factor_arr(
         self,
+        epoch,
+        step_arr,
         epoch_num_steps
     ):
 
-        # Advance sub-scheduler
+        sched_idx, sched_epoch = self._get_sched_epoch(epoch)
+
+        return self._get_sched_base_lr_factor(sched_idx) * self._schedulers[sched_idx].lr_factor_at(
+            sched_epoch,
+            step_arr,
+            epoch_num_steps
+        )
 
-        while \
-            (self._curr_sched_idx < len(self._milestones)) and \
-            (self._curr_epoch > self._milestones[self._curr_sched_idx]):
 
-            self._curr_sched_idx += 1
-            self._init_next_sched = True
+    ########
 
-        # Initialize next sub-scheduler
 
-        if self._init_next_sched:
+    def event_before_train_epoch(
+        self,
+        epoch_num_steps=None,
+        global_batch_size=None
+    ):
 
-            subsched_start_epoch = self._start_epochs[self._curr_sched_idx]
-            
-            last_milestone_epoch = 0 if self._curr_sched_idx == 0 else self._milestones[self._curr_sched_idx - 1]
-            subsched_start_epoch += self._curr_epoch - last_milestone_epoch - 1
+        # Select and position sub-scheduler
 
-            self._curr_sched_base_lr_dict = self._get_optimizer_lrs()
-            self._schedulers[self._curr_sched_idx]._base_lr_dict = self._curr_sched_base_lr_dict
+        self._curr_sched_idx, sched_epoch = self._get_sched_epoch(self._curr_epoch)
+        sched = self._schedulers[self._curr_sched_idx]
 
-            self._schedulers[self._curr_sched_idx].initialize(subsched_start_epoch)
+        base_lr_factor = self._get_sched_base_lr_factor(self._curr_sched_idx)
 
-            self._init_next_sched = False
+        sched.set_base_lrs({
+            param_group_name: base_lr * base_lr_factor
+            for param_group_name, base_lr in self._base_lr_dict.items()
+        })
+        sched.set_curr_epoch(sched_epoch)
 
         # Call sub-scheduler update method
 
-        self._schedulers[self._curr_sched_idx].event_before_train_epoch(epoch_num_steps)
+        sched.event_before_train_epoch(epoch_num_steps, global_batch_size)
 
 
     def event_after_train_step(
@@ -130,82 +168,16 @@ class SequentialLRScheduler(BaseLRScheduler):
     ########
 
 
-    def save_epoch_lr_data(
-        self,
-        dirname
+    def get_step_lr_arr_dict(
+        self
     ):
 
-        goripy.file.json.save_json(
-            self._schedulers[self._curr_sched_idx]._init_lr_dict,
-            os.path.join(dirname, "init_lr_dict.json")
-        )
-
-        numpy.savez(
-            os.path.join(dirname, "step_lr_arr_dict.npz"),
-            **(self._schedulers[self._curr_sched_idx]._step_lr_arr_dict)
-        )
-
-        goripy.file.json.save_json(
-            self._schedulers[self._curr_sched_idx]._final_lr_dict,
-            os.path.join(dirname, "final_lr_dict.json")
-        )
+        return self._schedulers[self._curr_sched_idx].get_step_lr_arr_dict()
 
 
-    def save(
-        self,
-        dirname
-    ):
-        
-        # Save internal state of sub-schedulers
-
-        for sched_idx, sched in enumerate(self._schedulers):
-            
-            sched_subdirname = os.path.join(dirname, "sched_{:d}".format(sched_idx))
-            
-            if os.path.exists(sched_subdirname): shutil.rmtree(sched_subdirname)
-            os.mkdir(sched_subdirname)
-
-            sched.save(sched_subdirname)
-
-        # Save internal state
-        
-        internal_state_dict = {
-            "curr_epoch": self._curr_epoch,
-            "curr_sched_idx": self._curr_sched_idx,
-            "init_next_sched": self._init_next_sched,
-            "curr_sched_base_lr_dict": self._curr_sched_base_lr_dict
-        }
-
-        goripy.file.json.save_json(
-            internal_state_dict,
-            os.path.join(dirname, "internal_state_dict.json")
-        )
-
-
-    def load(
+    def save_epoch_lr_data(
         self,
         dirname
     ):
 
-        # Load internal state of sub-schedulers
-
-        for sched_idx, sched in enumerate(self._schedulers):
-            
-            sched_subdirname = os.path.join(dirname, "sched_{:d}".format(sched_idx))
-
-            sched.load(sched_subdirname)
-
-        # Load internal state
-
-        internal_state_dict = goripy.file.json.load_json(
-            os.path.join(dirname, "internal_state_dict.json")
-        )
-        
-        self._curr_epoch = internal_state_dict["curr_epoch"]
-        self._curr_sched_idx = internal_state_dict["curr_sched_idx"]
-        self._init_next_sched = internal_state_dict["init_next_sched"]
-        self._curr_sched_base_lr_dict = internal_state_dict["curr_sched_base_lr_dict"]
-
-        # Restore sub-scheduler base LRs
-
-        self._schedulers[self._curr_sched_idx]._base_lr_dict = self._curr_sched_base_lr_dict
+        self._schedulers[self._curr_sched_idx].save_epoch_lr_data(dirname)
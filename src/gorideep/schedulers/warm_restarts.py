@@ -0,0 +1,86 @@
+import numpy
+
+from gorideep.schedulers.base import BaseLRScheduler
+
+
+
+class CosineWarmRestartsLRScheduler(BaseLRScheduler):
+    """
+    Implements a cosine annealing LR scheduling policy with warm restarts (SGDR): the LR is
+    annealed down to a minimum value during a cycle, and restarted at the beginning of the next
+    one, with cycles that may grow longer and restart values that may decay.
+    LRs are updated every step (or every epoch, if the number of steps is unknown).
+
+    :param optimizer: torch.optim.Optimizer
+        Optimizer to manage with this scheduler.
+
+    :param cycle_num_epochs: float
+        Number of epochs that the first cycle should last for.
+    :param cycle_mult: float, default=1.0
+        Factor to lengthen every cycle with respect to the previous one.
+    :param cycle_decay: float, default=1.0
+        Factor to decay the LR at the beginning of every cycle with respect to the previous one.
+    :param min_factor: float, default=0.0
+        Minimum factor for the LR, reached at the end of every cycle.
+    """
+
+    def __init__(
+        self,
+        optimizer,
+        cycle_num_epochs,
+        cycle_mult=1.0,
+        cycle_decay=1.0,
+        min_factor=0.0
+    ):
+
+        super().__init__(optimizer)
+
+        self._cycle_num_epochs = cycle_num_epochs
+        self._cycle_mult = cycle_mult
+        self._cycle_decay = cycle_decay
+        self._min_factor = min_factor
+
+
+    ########
+
+
+    def _get_lr_factor_arr(
+        self,
+        epoch,
+        step_arr,
+        epoch_num_steps
+    ):
+
+        epoch_progress_arr = self._get_epoch_progress_arr(epoch, step_arr, epoch_num_steps)
+
+        # Find cycles in closed form (every cycle includes its ending point, and not its starting point)
+
+        if self._cycle_mult == 1.0:
+
+            cycle_idx_arr = numpy.ceil(epoch_progress_arr / self._cycle_num_epochs - 1e-9) - 1.0
+            cycle_idx_arr = numpy.maximum(cycle_idx_arr, 0.0)
+
+            cycle_start_arr = cycle_idx_arr * self._cycle_num_epochs
+            cycle_len_arr = numpy.full(shape=cycle_idx_arr.shape, fill_value=float(self._cycle_num_epochs))
+
+        else:
+
+            cycle_idx_arr = numpy.ceil(
+                numpy.log1p(epoch_progress_arr * (self._cycle_mult - 1.0) / self._cycle_num_epochs) /
+                numpy.log(self._cycle_mult) -
+                1e-9
+            ) - 1.0
+            cycle_idx_arr = numpy.maximum(cycle_idx_arr, 0.0)
+
+            cycle_start_arr = \
+                self._cycle_num_epochs * ((self._cycle_mult ** cycle_idx_arr) - 1.0) / (self._cycle_mult - 1.0)
+            cycle_len_arr = self._cycle_num_epochs * (self._cycle_mult ** cycle_idx_arr)
+
+        # Cosine annealing within cycles
+
+        cycle_ratio_arr = numpy.clip((epoch_progress_arr - cycle_start_arr) / cycle_len_arr, 0.0, 1.0)
+        max_factor_arr = self._cycle_decay ** cycle_idx_arr
+
+        return \
+            self._min_factor + \
+            ((max_factor_arr - self._min_factor) * 0.5 * (1.0 + numpy.cos(numpy.pi * cycle_ratio_arr)))
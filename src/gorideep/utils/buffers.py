@@ -0,0 +1,111 @@
+import numpy
+
+
+
+class GrowableArray:
+    """
+    Append-only numpy array with amortized O(1) appends, for buffers of unknown final length.
+
+    Items are stored in a contiguous backing array whose capacity doubles whenever it fills up
+    (like an array list), so that the filled prefix can always be accessed as a numpy view,
+    without copies. Unwritten backing array entries are never exposed.
+
+    :param item_shape: tuple of int, default=()
+        Shape of every item.
+    :param dtype: numpy.dtype, default=float
+        Data type of the items.
+    :param capacity: int, default=1024
+        Initial number of items that fit in the backing array.
+    """
+
+    def __init__(
+        self,
+        item_shape=(),
+        dtype=float,
+        capacity=1024
+    ):
+
+        self._arr = numpy.empty(shape=(max(capacity, 1), *item_shape), dtype=dtype)
+        self._size = 0
+
+
+    def __len__(
+        self
+    ):
+
+        return self._size
+
+
+    @property
+    def arr(self):
+        # View of the filled prefix
+        return self._arr[:self._size]
+
+
+    def reserve(
+        self,
+        capacity
+    ):
+        """
+        Grows the backing array, if necessary, so that at least `capacity` items fit.
+
+        :param capacity: int
+            Number of items that must fit.
+        """
+
+        if capacity <= self._arr.shape[0]: return
+
+        new_arr = numpy.empty(
+            shape=(max(capacity, 2 * self._arr.shape[0]), *self._arr.shape[1:]),
+            dtype=self._arr.dtype
+        )
+        new_arr[:self._size] = self._arr[:self._size]
+
+        self._arr = new_arr
+
+
+    def append(
+        self,
+        item
+    ):
+        """
+        Appends one item.
+
+        :param item: any
+            The item to append. Must be convertible to the item shape and data type.
+        """
+
+        if self._size == self._arr.shape[0]:
+            self.reserve(self._size + 1)
+
+        self._arr[self._size] = item
+        self._size += 1
+
+
+    def extend(
+        self,
+        item_arr
+    ):
+        """
+        Appends multiple items.
+
+        :param item_arr: numpy.ndarray
+            The items to append, stacked along the first dimension.
+        """
+
+        num_items = len(item_arr)
+
+        self.reserve(self._size + num_items)
+
+        self._arr[self._size:self._size + num_items] = item_arr
+        self._size += num_items
+
+
+    def clear(
+        self
+    ):
+        """
+        Removes all items, keeping the backing array.
+        """
+
+        self._size = 0
@@ -0,0 +1,287 @@
+import queue
+import threading
+import collections
+
+import torch
+
+
+
+# Sentinel marking the end of prefetched data batches
+
+_end_item = object()
+
+
+
+def _rebuild_sequence(
+    data,
+    value_list
+):
+
+    # Namedtuples take their fields as positional arguments (as in default collation)
+
+    if isinstance(data, tuple) and hasattr(data, "_fields"):
+        return type(data)(*value_list)
+
+    try:
+        return type(data)(value_list)
+    except TypeError:
+        # Sequence subclasses with custom constructors fall back to their base type
+        return list(value_list) if isinstance(data, list) else tuple(value_list)
+
+
+def pin_data(
+    data
+):
+    """
+    Copies the CPU tensors of a (possibly nested) data structure into pinned (page-locked)
+    memory, so that they can be transferred to CUDA devices asynchronously.
+
+    Dicts, lists and tuples are traversed recursively. Tensors that are already pinned (e.g.
+    batches produced by a DataLoader with `pin_memory=True`) are not copied. Any other value is
+    returned as is.
+
+    :param data: any
+        The data to pin.
+
+    :return: any
+        The data, with pinned tensors.
+    """
+
+    if isinstance(data, torch.Tensor):
+        if data.device.type != "cpu" or data.is_pinned(): return data
+        return data.pin_memory()
+
+    if isinstance(data, dict):
+        return {key: pin_data(value) for key, value in data.items()}
+
+    if isinstance(data, (list, tuple)):
+        return _rebuild_sequence(data, [pin_data(value) for value in data])
+
+    return data
+
+
+def move_data_to_device(
+    data,
+    device,
+    non_blocking=True
+):
+    """
+    Moves the tensors of a (possibly nested) data structure to a device.
+
+    Dicts, lists and tuples are traversed recursively. Any other value is returned as is.
+    When moving to a CUDA device with `non_blocking` set to True, CPU tensors are pinned first
+    (see `pin_data`), so that transfers are asynchronous with respect to the host.
+
+    :param data: any
+        The data to move.
+    :param device: torch.device
+        PyTorch device to send tensors to.
+    :param non_blocking: bool, default=True
+        If True, transfers are asynchronous when possible.
+
+    :return: any
+        The data, with tensors on the device.
+    """
+
+    device = torch.device(device)
+    pin = non_blocking and device.type == "cuda"
+
+    return _move_data_to_device(data, device, non_blocking, pin)
+
+
+def _move_data_to_device(
+    data,
+    device,
+    non_blocking,
+    pin
+):
+
+    if isinstance(data, torch.Tensor):
+        if pin and data.device.type == "cpu" and not data.is_pinned():
+            data = data.pin_memory()
+        return data.to(device=device, non_blocking=non_blocking)
+
+    if isinstance(data, dict):
+        return {key: _move_data_to_device(value, device, non_blocking, pin) for key, value in data.items()}
+
+    if isinstance(data, (list, tuple)):
+        return _rebuild_sequence(data, [_move_data_to_device(value, device, non_blocking, pin) for value in data])
+
+    return data
+
+
+def _record_data_stream(
+    data,
+    stream
+):
+
+    if isinstance(data, torch.Tensor):
+        if data.device.type == "cuda": data.record_stream(stream)
+        return
+
+    if isinstance(data, dict):
+        for value in data.values(): _record_data_stream(value, stream)
+        return
+
+    if isinstance(data, (list, tuple)):
+        for value in data: _record_data_stream(value, stream)
+
+
+
+class DevicePrefetcher:
+    """
+    Iterable wrapper that moves data batches to a device ahead of time, so that transfers overlap
+    with the computation of the current step.
+
+    Placed between a DataLoader and the module transforms:
+
+        - On CUDA devices, batches are pinned and copied on a side CUDA stream, and the current
+          stream waits for the copy only when the batch is consumed.
+        - On other devices, batches are fetched and moved in a background thread.
+
+    Tensors are moved recursively through dicts, lists and tuples (see `move_data_to_device`).
+    Using a DataLoader with `pin_memory=True` avoids extra pinned copies.
+
+    :param data_loader: iterable
+        Iterable of data batches (e.g. a torch.utils.data.DataLoader).
+    :param device: torch.device
+        PyTorch device to send tensors to.
+    :param num_prefetch_batches: int, default=1
+        Number of data batches to move ahead of time.
+    """
+
+    def __init__(
+        self,
+        data_loader,
+        device,
+        num_prefetch_batches=1
+    ):
+
+        self._data_loader = data_loader
+        self._device = torch.device(device)
+        self._num_prefetch_batches = max(num_prefetch_batches, 1)
+
+
+    def __len__(
+        self
+    ):
+
+        return len(self._data_loader)
+
+
+    def __iter__(
+        self
+    ):
+
+        if self._device.type == "cuda":
+            return self._iter_cuda()
+
+        return self._iter_thread()
+
+
+    def _iter_cuda(
+        self
+    ):
+
+        copy_stream = torch.cuda.Stream(device=self._device)
+        prefetch_queue = collections.deque()
+
+        data_batch_iter = iter(self._data_loader)
+
+        def prefetch():
+
+            data_batch = next(data_batch_iter, _end_item)
+            if data_batch is _end_item: return False
+
+            with torch.cuda.stream(copy_stream):
+                prefetch_queue.append(move_data_to_device(data_batch, self._device, True))
+
+            return True
+
+        for _ in range(self._num_prefetch_batches):
+            if not prefetch(): break
+
+        while len(prefetch_queue) > 0:
+
+            data_batch = prefetch_queue.popleft()
+
+            # Wait for the copy, and keep memory alive while the current stream uses it
+
+            current_stream = torch.cuda.current_stream(self._device)
+            current_stream.wait_stream(copy_stream)
+            _record_data_stream(data_batch, current_stream)
+
+            prefetch()
+
+            yield data_batch
+
+
+    def _iter_thread(
+        self
+    ):
+
+        prefetch_queue = queue.Queue(maxsize=self._num_prefetch_batches)
+        stop_event = threading.Event()
+
+        def put_item(item):
+
+            # Give up if the consumer stopped iterating
+
+            while not stop_event.is_set():
+                try:
+                    prefetch_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def prefetch():
+
+            try:
+
+                for data_batch in self._data_loader:
+                    if not put_item(move_data_to_device(data_batch, self._device, False)): return
+
+                put_item(_end_item)
+
+            except Exception as exception:
+
+                put_item(exception)
+
+        prefetch_thread = threading.Thread(target=prefetch, daemon=True)
+        prefetch_thread.start()
+
+        try:
+
+            while True:
+
+                item = prefetch_queue.get()
+
+                if item is _end_item: break
+                if isinstance(item, Exception): raise item
+
+                yield item
+
+        finally:
+
+            stop_event.set()
+
+
+def get_collective_device():
+    """
+    Returns the device where tensors must be placed for collectives of the default process
+    group: the local GPU under the NCCL backend, and CPU otherwise (e.g. under the gloo backend).
+
+    The local GPU is the current CUDA device, which must be set to the local rank of the
+    subprocess (e.g. `torch.cuda.set_device(local_rank)`). Note that the global rank does not
+    match the local GPU index in multi-node settings.
+
+    :return: torch.device
+        The collective device.
+    """
+
+    if torch.distributed.get_backend() == torch.distributed.Backend.NCCL:
+        return torch.device("cuda", torch.cuda.current_device())
+
+    return torch.device("cpu")
@@ -0,0 +1,266 @@
+import os
+import sys
+import mmap
+import random
+
+import numpy
+import torch
+
+import goripy.memory.get
+import goripy.memory.info
+
+
+
+def get_obj_num_bytes(
+    obj,
+    sample_threshold=1024,
+    sample_size=64,
+    seed=0
+):
+    """
+    Computes (or estimates) the number of bytes that an object weights.
+
+    Uses fast paths for common types:
+
+        - numpy arrays and torch tensors: O(1), using the sizes of the buffers they are backed by
+          (for array views, the buffer of the array that owns the memory). Buffers shared by
+          multiple arrays or tensors of the object are counted once. Memory-mapped buffers are
+          not counted, so only headers of memory-mapped arrays are counted.
+        - Scalars, strings and bytes: O(1), using `sys.getsizeof`.
+        - Lists, tuples, sets and dicts: exact recursion if small, or sampled estimation if they
+          have more than `sample_threshold` elements (assuming homogeneous elements).
+
+    Any other object is measured with `goripy.memory.get.get_obj_bytes`.
+
+    :param obj: any
+        Object to measure.
+    :param sample_threshold: int, default=1024
+        Minimum number of container elements to use sampled estimation.
+    :param sample_size: int, default=64
+        Number of container elements to measure when using sampled estimation.
+    :param seed: int, default=0
+        Random seed for sampling container elements.
+
+    :return: int
+        Number of bytes that the object weights.
+    """
+
+    return _get_obj_num_bytes(obj, sample_threshold, sample_size, random.Random(seed), set())
+
+
+def _get_array_buffer_info(
+    arr
+):
+    """
+    Finds the buffer backing a numpy array, walking the `base` chain of array views.
+
+    :param arr: numpy.ndarray
+        The array.
+
+    :return: tuple
+        The buffer key (unique among live buffers), number of bytes, and whether the buffer is
+        memory-mapped.
+    """
+
+    owner = arr
+
+    while True:
+
+        if isinstance(owner, (numpy.memmap, mmap.mmap)):
+            return None, 0, True
+
+        base = owner.base if isinstance(owner, numpy.ndarray) else None
+        if base is None: break
+
+        owner = base
+
+    # Owner arrays are identified by their data address, and other buffer objects (e.g. bytes)
+    # by their identity, which is unique while the array keeps them alive
+
+    if isinstance(owner, numpy.ndarray):
+        return ("array", owner.__array_interface__["data"][0]), owner.nbytes, False
+
+    try:
+        owner_num_bytes = memoryview(owner).nbytes
+    except TypeError:
+        owner_num_bytes = arr.nbytes
+
+    return ("object", id(owner)), owner_num_bytes, False
+
+
+def _get_obj_num_bytes(
+    obj,
+    sample_threshold,
+    sample_size,
+    rng,
+    seen_buffer_key_set
+):
+
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        return sys.getsizeof(obj)
+
+    if isinstance(obj, numpy.ndarray):
+
+        buffer_key, buffer_num_bytes, buffer_mapped = _get_array_buffer_info(obj)
+        if buffer_mapped or buffer_key in seen_buffer_key_set: return sys.getsizeof(obj)
+
+        seen_buffer_key_set.add(buffer_key)
+        return sys.getsizeof(obj) + buffer_num_bytes
+
+    if isinstance(obj, torch.Tensor):
+
+        storage = obj.untyped_storage()
+
+        buffer_key = ("tensor", obj.device.type, storage.data_ptr())
+        if buffer_key in seen_buffer_key_set: return sys.getsizeof(obj)
+
+        seen_buffer_key_set.add(buffer_key)
+        return sys.getsizeof(obj) + storage.nbytes()
+
+    if isinstance(obj, dict):
+
+        if len(obj) > sample_threshold:
+            sample_key_list = rng.sample(list(obj.keys()), sample_size)
+            sample_num_bytes = sum(
+                _get_obj_num_bytes(key, sample_threshold, sample_size, rng, seen_buffer_key_set) +
+                _get_obj_num_bytes(obj[key], sample_threshold, sample_size, rng, seen_buffer_key_set)
+                for key in sample_key_list
+            )
+            return sys.getsizeof(obj) + (sample_num_bytes * len(obj)) // sample_size
+
+        return sys.getsizeof(obj) + sum(
+            _get_obj_num_bytes(key, sample_threshold, sample_size, rng, seen_buffer_key_set) +
+            _get_obj_num_bytes(value, sample_threshold, sample_size, rng, seen_buffer_key_set)
+            for key, value in obj.items()
+        )
+
+    if isinstance(obj, (list, tuple, set, frozenset)):
+
+        if len(obj) > sample_threshold:
+            obj_seq = obj if isinstance(obj, (list, tuple)) else list(obj)
+            sample_idx_list = rng.sample(range(len(obj_seq)), sample_size)
+            sample_num_bytes = sum(
+                _get_obj_num_bytes(obj_seq[sample_idx], sample_threshold, sample_size, rng, seen_buffer_key_set)
+                for sample_idx in sample_idx_list
+            )
+            return sys.getsizeof(obj) + (sample_num_bytes * len(obj)) // sample_size
+
+        return sys.getsizeof(obj) + sum(
+            _get_obj_num_bytes(elem, sample_threshold, sample_size, rng, seen_buffer_key_set)
+            for elem in obj
+        )
+
+    return goripy.memory.get.get_obj_bytes(obj)
+
+
+def get_obj_num_bytes_cache_key(
+    obj
+):
+    """
+    Computes a cheap key that changes when the memory measurement of an object may change.
+    Used to invalidate cached memory measurements, together with the object identity.
+
+    Only numpy arrays and torch tensors are cacheable, since their measurements depend only on
+    their buffers. Other objects (e.g. containers) may be mutated in place without any cheap
+    way to notice it.
+
+    :param obj: any
+        Object to compute the key for.
+
+    :return: tuple or None
+        The cache key, or None if measurements of the object must not be cached.
+    """
+
+    if isinstance(obj, numpy.ndarray):
+        return (tuple(obj.shape), str(obj.dtype), obj.__array_interface__["data"][0])
+
+    if isinstance(obj, torch.Tensor):
+        return (tuple(obj.shape), str(obj.dtype), obj.untyped_storage().data_ptr(), obj.untyped_storage().nbytes())
+
+    return None
+
+
+########
+# PROCESS MEMORY
+########
+
+
+def get_process_memory_info(
+    pid=None
+):
+    """
+    Retrieves memory usage information of a process.
+
+    Reads `/proc/<pid>/smaps_rollup` (Linux only). The values are:
+
+        - "rss": Resident set size.
+        - "pss": Proportional set size (shared pages divided among the processes sharing them).
+        - "uss": Unique set size (private pages), which grows with copy-on-write in forked
+          DataLoader workers.
+        - "shared": Resident shared pages.
+
+    :param pid: int, optional
+        Process ID. If not provided, the current process is used.
+
+    :return: dict of str -> int
+        Memory usage information, in bytes.
+    """
+
+    if pid is None:
+        pid = os.getpid()
+
+    smaps_dict = {}
+
+    with open("/proc/{:d}/smaps_rollup".format(pid), "r") as smaps_file:
+        for line in smaps_file:
+            line_tkns = line.split()
+            if len(line_tkns) == 3 and line_tkns[2] == "kB":
+                smaps_dict[line_tkns[0].rstrip(":")] = int(line_tkns[1]) * 1024
+
+    return {
+        "rss": smaps_dict.get("Rss", 0),
+        "pss": smaps_dict.get("Pss", 0),
+        "uss": smaps_dict.get("Private_Clean", 0) + smaps_dict.get("Private_Dirty", 0),
+        "shared": smaps_dict.get("Shared_Clean", 0) + smaps_dict.get("Shared_Dirty", 0)
+    }
+
+
+def show_process_memory_info(
+    pid_list=None
+):
+    """
+    Prints a summary of the memory usage of multiple processes (e.g. the main process and its
+    DataLoader workers), see `get_process_memory_info`.
+
+    :param pid_list: list of int, optional
+        Process IDs. If not provided, the current process is used.
+    """
+
+    if pid_list is None:
+        pid_list = [os.getpid()]
+
+    line_fmt_str = "{:>10s} : {:>11s} {:>11s} {:>11s} {:>11s}"
+
+    print(line_fmt_str.format("PID", "RSS", "PSS", "USS", "Shared"))
+    print("-" * 60)
+
+    total_memory_info_dict = {"rss": 0, "pss": 0, "uss": 0, "shared": 0}
+
+    for pid in pid_list:
+
+        memory_info_dict = get_process_memory_info(pid)
+
+        for key in total_memory_info_dict.keys():
+            total_memory_info_dict[key] += memory_info_dict[key]
+
+        print(line_fmt_str.format(
+            str(pid),
+            *[goripy.memory.info.sprint_fancy_num_bytes(memory_info_dict[key]) for key in ["rss", "pss", "uss", "shared"]]
+        ))
+
+    print("-" * 60)
+
+    print(line_fmt_str.format(
+        "Total",
+        *[goripy.memory.info.sprint_fancy_num_bytes(total_memory_info_dict[key]) for key in ["rss", "pss", "uss", "shared"]]
+    ))
@@ -1,10 +1,400 @@
 import os
+import fcntl
 import pathlib
 
 import numpy
 
 import goripy.file.json
-import goripy.memory.get
+
+from gorideep.utils.memory import get_obj_num_bytes
+
+
+
+########
+# COMPILED METADATA STORE
+########
+
+
+# Process-wide cache of metadata stores, indexed by (metadata type, subset name)
+_metadata_store_dict = {}
+
+
+def _get_metadata_dirname():
+
+    return os.path.join(os.environ["GORIDEEPTRAIN_DATA_HOME"], "metadata")
+
+
+def _encode_str_table(
+    str_list
+):
+    """
+    Encodes a list of strings into a string table (UTF-8 byte array and offsets array).
+
+    :param str_list: list of str
+        List of strings to encode.
+
+    :return: numpy.ndarray
+        Array with all UTF-8 encoded strings concatenated.
+    :return: numpy.ndarray
+        Array with the start offsets of every string, plus the total number of bytes.
+    """
+
+    str_bytes_list = [str_.encode("utf-8") for str_ in str_list]
+
+    str_offset_arr = numpy.zeros(shape=(len(str_bytes_list) + 1,), dtype=numpy.int64)
+    str_offset_arr[1:] = numpy.cumsum([len(str_bytes) for str_bytes in str_bytes_list])
+
+    str_byte_arr = numpy.frombuffer(b"".join(str_bytes_list), dtype=numpy.uint8)
+
+    return str_byte_arr, str_offset_arr
+
+
+def _decode_str_table(
+    str_byte_arr,
+    str_offset_arr
+):
+    """
+    Decodes a string table (UTF-8 byte array and offsets array) into a list of strings.
+
+    :param str_byte_arr: numpy.ndarray
+        Array with all UTF-8 encoded strings concatenated.
+    :param str_offset_arr: numpy.ndarray
+        Array with the start offsets of every string, plus the total number of bytes.
+
+    :return: list of str
+        List of decoded strings.
+    """
+
+    str_bytes = bytes(str_byte_arr)
+    str_offset_list = str_offset_arr.tolist()
+
+    return [
+        str_bytes[str_start:str_end].decode("utf-8")
+        for str_start, str_end in zip(str_offset_list[:-1], str_offset_list[1:])
+    ]
+
+
+# Version of the compiled metadata format, stored in manifests
+
+_compiled_format_version = 1
+
+
+def _get_json_stat_dict(
+    json_filename
+):
+
+    json_stat = os.stat(json_filename)
+
+    return {
+        "json_mtime_ns": json_stat.st_mtime_ns,
+        "json_size": json_stat.st_size
+    }
+
+
+def _load_compiled_metadata_arrs(
+    json_filename,
+    compiled_filename_prefix,
+    compile_fn
+):
+    """
+    Loads compiled metadata arrays with memory mapping.
+    Arrays are (re-)compiled from the JSON metadata file if missing or outdated.
+
+    Compiled arrays are stored as `.npy` files named `<compiled_filename_prefix>.<arr_name>.npy`,
+    along with a manifest `<compiled_filename_prefix>.manifest.json` listing the array names, the
+    format version and the JSON metadata file modification time and size. The manifest is
+    written last, atomically, so compiled arrays are only regarded as valid if the manifest
+    exists, matches the JSON metadata file, and lists exactly the array files present (e.g.
+    partial sets left by interrupted compilations, or stale arrays from other format versions,
+    are compiled again).
+
+    Compilation is serialized among processes (e.g. DDP ranks starting simultaneously) with a
+    lock file `<compiled_filename_prefix>.lock`, and compiled arrays are checked again after
+    acquiring it. If compiled arrays cannot be written (e.g. read-only or shared metadata
+    directory), arrays are compiled in memory instead.
+
+    :param json_filename: str
+        Name of the JSON metadata file.
+    :param compiled_filename_prefix: str
+        Prefix of the compiled array filenames.
+    :param compile_fn: callable
+        Function converting the loaded JSON metadata into a dict of str -> numpy.ndarray.
+
+    :return: dict of str -> numpy.ndarray
+        Compiled metadata arrays, indexed by array name.
+    """
+
+    compiled_dirname = os.path.dirname(compiled_filename_prefix)
+
+    compiled_filename_dict, compiled_up_to_date = _find_compiled_metadata_arrs(json_filename, compiled_filename_prefix)
+
+    # Compile arrays if necessary, one process at a time
+
+    if not compiled_up_to_date:
+
+        try:
+
+            pathlib.Path(compiled_dirname).mkdir(parents=True, exist_ok=True)
+
+            lock_fd = os.open("{:s}.lock".format(compiled_filename_prefix), os.O_RDWR | os.O_CREAT, 0o644)
+
+            try:
+
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+
+                # Another process may have compiled the arrays in the meantime
+
+                compiled_filename_dict, compiled_up_to_date = _find_compiled_metadata_arrs(json_filename, compiled_filename_prefix)
+
+                if not compiled_up_to_date:
+                    compiled_filename_dict = _save_compiled_metadata_arrs(
+                        json_filename, compiled_filename_prefix, compile_fn, compiled_filename_dict
+                    )
+
+            finally:
+
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                os.close(lock_fd)
+
+        except OSError:
+
+            # Compile in memory if the compiled metadata directory is not writable
+
+            return compile_fn(goripy.file.json.load_json(json_filename))
+
+    # Load arrays with memory mapping
+
+    return {
+        arr_name: numpy.load(compiled_filename, mmap_mode="r")
+        for arr_name, compiled_filename in compiled_filename_dict.items()
+    }
+
+
+def _find_compiled_metadata_arrs(
+    json_filename,
+    compiled_filename_prefix
+):
+    """
+    Finds present compiled metadata arrays, and checks them against the manifest.
+
+    :param json_filename: str
+        Name of the JSON metadata file.
+    :param compiled_filename_prefix: str
+        Prefix of the compiled array filenames.
+
+    :return: dict of str -> str
+        Compiled array filenames, indexed by array name.
+    :return: bool
+        True iff the compiled arrays are up to date.
+    """
+
+    compiled_dirname = os.path.dirname(compiled_filename_prefix)
+    compiled_basename = os.path.basename(compiled_filename_prefix)
+    manifest_filename = "{:s}.manifest.json".format(compiled_filename_prefix)
+
+    # Find present compiled arrays
+
+    compiled_filename_dict = {}
+
+    if os.path.isdir(compiled_dirname):
+        for filename in os.listdir(compiled_dirname):
+            if not (filename.startswith(compiled_basename + ".") and filename.endswith(".npy")): continue
+            arr_name = filename[len(compiled_basename) + 1:-len(".npy")]
+            if "." in arr_name: continue
+            compiled_filename_dict[arr_name] = os.path.join(compiled_dirname, filename)
+
+    # Check compiled arrays against the manifest
+
+    if not os.path.isfile(manifest_filename):
+        return compiled_filename_dict, False
+
+    try:
+        manifest_dict = goripy.file.json.load_json(manifest_filename)
+    except ValueError:
+        return compiled_filename_dict, False
+
+    json_stat_dict = _get_json_stat_dict(json_filename)
+
+    compiled_up_to_date = \
+        manifest_dict.get("format_version", None) == _compiled_format_version and \
+        all(manifest_dict.get(key, None) == value for key, value in json_stat_dict.items()) and \
+        sorted(manifest_dict.get("arr_name_list", [])) == sorted(compiled_filename_dict.keys())
+
+    return compiled_filename_dict, compiled_up_to_date
+
+
+def _save_compiled_metadata_arrs(
+    json_filename,
+    compiled_filename_prefix,
+    compile_fn,
+    compiled_filename_dict
+):
+    """
+    Compiles metadata arrays from the JSON metadata file and saves them, writing the manifest
+    last. Temporary files are removed if saving fails.
+
+    :param json_filename: str
+        Name of the JSON metadata file.
+    :param compiled_filename_prefix: str
+        Prefix of the compiled array filenames.
+    :param compile_fn: callable
+        Function converting the loaded JSON metadata into a dict of str -> numpy.ndarray.
+    :param compiled_filename_dict: dict of str -> str
+        Present compiled array filenames, indexed by array name.
+
+    :return: dict of str -> str
+        Compiled array filenames, indexed by array name.
+    """
+
+    manifest_filename = "{:s}.manifest.json".format(compiled_filename_prefix)
+
+    json_stat_dict = _get_json_stat_dict(json_filename)
+    compiled_arr_dict = compile_fn(goripy.file.json.load_json(json_filename))
+
+    # Invalidate the manifest first, and remove stale arrays
+
+    if os.path.exists(manifest_filename): os.remove(manifest_filename)
+
+    for arr_name, compiled_filename in compiled_filename_dict.items():
+        if arr_name not in compiled_arr_dict: os.remove(compiled_filename)
+
+    compiled_filename_dict = {}
+    tmp_filename = None
+
+    try:
+
+        for arr_name, arr in compiled_arr_dict.items():
+
+            # Write to a temporary file first, so that concurrent readers never read partial files
+
+            compiled_filename = "{:s}.{:s}.npy".format(compiled_filename_prefix, arr_name)
+            tmp_filename = "{:s}.{:s}.{:d}.tmp.npy".format(compiled_filename_prefix, arr_name, os.getpid())
+
+            numpy.save(tmp_filename, arr)
+            os.replace(tmp_filename, compiled_filename)
+
+            compiled_filename_dict[arr_name] = compiled_filename
+
+        # Write the manifest last
+
+        tmp_filename = "{:s}.manifest.{:d}.tmp.json".format(compiled_filename_prefix, os.getpid())
+
+        goripy.file.json.save_json(
+            {
+                "format_version": _compiled_format_version,
+                **json_stat_dict,
+                "arr_name_list": sorted(compiled_arr_dict.keys())
+            },
+            tmp_filename
+        )
+        os.replace(tmp_filename, manifest_filename)
+
+    except OSError:
+
+        if tmp_filename is not None and os.path.exists(tmp_filename): os.remove(tmp_filename)
+        raise
+
+    return compiled_filename_dict
+
+
+def _compile_cat_list(
+    cat_list
+):
+
+    cat_name_byte_arr, cat_name_offset_arr = _encode_str_table([cat["cat_name"] for cat in cat_list])
+
+    return {
+        "cat_name_byte_arr": cat_name_byte_arr,
+        "cat_name_offset_arr": cat_name_offset_arr
+    }
+
+
+def _compile_multiattr_list(
+    attr_list
+):
+
+    supattr_name_to_idx_dict = {}
+    supattr_size_list = []
+
+    attr_supattr_idx_arr = numpy.empty(shape=(len(attr_list),), dtype=numpy.int64)
+    attr_supattr_attr_idx_arr = numpy.empty(shape=(len(attr_list),), dtype=numpy.int64)
+
+    for attr_idx, attr in enumerate(attr_list):
+
+        supattr_name = attr["supattr_name"]
+
+        if supattr_name not in supattr_name_to_idx_dict:
+            supattr_name_to_idx_dict[supattr_name] = len(supattr_size_list)
+            supattr_size_list.append(0)
+
+        supattr_idx = supattr_name_to_idx_dict[supattr_name]
+
+        attr_supattr_idx_arr[attr_idx] = supattr_idx
+        attr_supattr_attr_idx_arr[attr_idx] = supattr_size_list[supattr_idx]
+
+        supattr_size_list[supattr_idx] += 1
+
+    attr_name_byte_arr, attr_name_offset_arr = _encode_str_table([attr["attr_name"] for attr in attr_list])
+    supattr_name_byte_arr, supattr_name_offset_arr = _encode_str_table(list(supattr_name_to_idx_dict.keys()))
+
+    return {
+        "attr_name_byte_arr": attr_name_byte_arr,
+        "attr_name_offset_arr": attr_name_offset_arr,
+        "supattr_name_byte_arr": supattr_name_byte_arr,
+        "supattr_name_offset_arr": supattr_name_offset_arr,
+        "attr_supattr_idx_arr": attr_supattr_idx_arr,
+        "attr_supattr_attr_idx_arr": attr_supattr_attr_idx_arr
+    }
+
+
+def _get_metadata_store(
+    metadata_type,
+    subset_name,
+    json_suffix,
+    compile_fn
+):
+    """
+    Retrieves a metadata store from the process-wide cache, creating it if necessary.
+
+    :param metadata_type: str
+        Type of metadata (e.g. "cat", "multiattr").
+    :param subset_name: str
+        Name of the metadata subset to use.
+    :param json_suffix: str
+        Suffix of the JSON metadata filename, after the subset name.
+    :param compile_fn: callable
+        Function converting the loaded JSON metadata into a dict of str -> numpy.ndarray.
+
+    :return: dict
+        The metadata store, with the JSON filename and the compiled metadata arrays.
+    """
+
+    store_key = (metadata_type, subset_name)
+
+    if store_key not in _metadata_store_dict:
+
+        metadata_dirname = _get_metadata_dirname()
+        json_filename = os.path.join(metadata_dirname, "{:s}_{:s}.json".format(subset_name, json_suffix))
+
+        _metadata_store_dict[store_key] = {
+            "json_filename": json_filename,
+            "compiled_arr_dict": _load_compiled_metadata_arrs(
+                json_filename,
+                os.path.join(metadata_dirname, "compiled", "{:s}_{:s}".format(subset_name, json_suffix)),
+                compile_fn
+            )
+        }
+
+    return _metadata_store_dict[store_key]
+
+
+def clear_metadata_cache():
+    """
+    Clears the process-wide cache of metadata stores.
+    Metadata objects created afterwards will reload (and possibly re-compile) their metadata.
+    """
+
+    _metadata_store_dict.clear()
 
 
 
@@ -22,6 +412,14 @@ class CategoryMetadata:
             },
             ...
         ]
+
+    The JSON file is compiled once into memory-mapped numpy arrays, and the derived data
+    structures are shared among all instances in the process with the same subset name.
+    The raw JSON list (`cat_list`) is only loaded when accessed.
+
+    On first use, compiled arrays and a manifest are written into the `metadata/compiled/`
+    subdirectory of the data home. If it is not writable, arrays are compiled in memory in
+    every process instead.
         
     :param cat_subset_name: str
         Name of the category subset to use.
@@ -34,25 +432,28 @@ class CategoryMetadata:
 
         self._cat_subset_name = cat_subset_name
         
-        #
+        # Load shared metadata store
 
-        metadata_dirname = os.path.join(os.environ["GORIDEEPTRAIN_DATA_HOME"], "metadata")
+        self._metadata_store = _get_metadata_store("cat", cat_subset_name, "cat_list", _compile_cat_list)
 
-        self._cat_list = goripy.file.json.load_json(
-            os.path.join(metadata_dirname, "{:s}_cat_list.json".format(cat_subset_name))
-        )
+        if "cat_name_list" not in self._metadata_store:
 
-        #
+            compiled_arr_dict = self._metadata_store["compiled_arr_dict"]
 
-        self._cat_name_list = [
-            cat["cat_name"]
-            for cat in self._cat_list
-        ]
+            self._metadata_store["cat_name_list"] = _decode_str_table(
+                compiled_arr_dict["cat_name_byte_arr"],
+                compiled_arr_dict["cat_name_offset_arr"]
+            )
 
-        self._cat_name_to_idx_dict = {
-            cat_name: cat_idx
-            for cat_idx, cat_name in enumerate(self._cat_name_list)
-        }
+            self._metadata_store["cat_name_to_idx_dict"] = {
+                cat_name: cat_idx
+                for cat_idx, cat_name in enumerate(self._metadata_store["cat_name_list"])
+            }
+
+        #
+
+        self._cat_name_list = self._metadata_store["cat_name_list"]
+        self._cat_name_to_idx_dict = self._metadata_store["cat_name_to_idx_dict"]
 
 
     def generate_other_to_orig_cat_idx_mapping(
@@ -91,16 +492,18 @@ class CategoryMetadata:
         
         num_bytes = 0
 
-        num_bytes += goripy.memory.get.get_obj_bytes(self._cat_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._cat_name_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._cat_name_to_idx_dict)
+        num_bytes += get_obj_num_bytes(self._metadata_store.get("cat_list", None))
+        num_bytes += get_obj_num_bytes(self._cat_name_list)
+        num_bytes += get_obj_num_bytes(self._cat_name_to_idx_dict)
 
         return num_bytes
 
 
     @property
     def cat_list(self):
-        return self._cat_list
+        if "cat_list" not in self._metadata_store:
+            self._metadata_store["cat_list"] = goripy.file.json.load_json(self._metadata_store["json_filename"])
+        return self._metadata_store["cat_list"]
 
     @property
     def cat_name_list(self):
@@ -130,6 +533,14 @@ class MultiAttributeMetadata:
             },
             ...
         ]
+
+    The JSON file is compiled once into memory-mapped numpy arrays, and the derived data
+    structures are shared among all instances in the process with the same subset name.
+    The raw JSON list (`attr_list`) is only loaded when accessed.
+
+    On first use, compiled arrays and a manifest are written into the `metadata/compiled/`
+    subdirectory of the data home. If it is not writable, arrays are compiled in memory in
+    every process instead.
             
     :param multiattr_subset_name: str
         Name of the multiattribute subset to use.
@@ -142,71 +553,96 @@ class MultiAttributeMetadata:
 
         self._multiattr_subset_name = multiattr_subset_name
 
-        #
+        # Load shared metadata store
 
-        metadata_dirname = os.path.join(os.environ["GORIDEEPTRAIN_DATA_HOME"], "metadata")
+        self._metadata_store = _get_metadata_store("multiattr", multiattr_subset_name, "multiattr_list", _compile_multiattr_list)
 
-        self._attr_list = goripy.file.json.load_json(
-            os.path.join(metadata_dirname, "{:s}_multiattr_list.json".format(multiattr_subset_name))
-        )
+        if "attr_name_list" not in self._metadata_store:
+            self._metadata_store.update(self._build_derived_data(self._metadata_store["compiled_arr_dict"]))
 
         #
 
-        self._attr_name_list = [
-            attr["attr_name"]
-            for attr in self._attr_list
-        ]
+        self._attr_supattr_idx_arr = self._metadata_store["compiled_arr_dict"]["attr_supattr_idx_arr"]
+        self._attr_supattr_attr_idx_arr = self._metadata_store["compiled_arr_dict"]["attr_supattr_attr_idx_arr"]
 
-        self._attr_name_to_idx_dict = {
-            attr_name: attr_idx
-            for attr_idx, attr_name in enumerate(self._attr_name_list)
-        }
+        self._attr_name_list = self._metadata_store["attr_name_list"]
+        self._attr_name_to_idx_dict = self._metadata_store["attr_name_to_idx_dict"]
+        self._attr_full_name_list = self._metadata_store["attr_full_name_list"]
+        self._attr_full_name_to_idx_dict = self._metadata_store["attr_full_name_to_idx_dict"]
+        self._supattr_name_list = self._metadata_store["supattr_name_list"]
+        self._supattr_name_to_idx_dict = self._metadata_store["supattr_name_to_idx_dict"]
+        self._supattr_size_list = self._metadata_store["supattr_size_list"]
+        self._attr_idx_to_supattr_attr_idxs_list = self._metadata_store["attr_idx_to_supattr_attr_idxs_list"]
+        self._supattr_attr_idxs_to_attr_idx_list_dict = self._metadata_store["supattr_attr_idxs_to_attr_idx_list_dict"]
 
-        #
 
-        self._attr_full_name_list = [
-            "{:s} -> {:s}".format(attr["supattr_name"], attr["attr_name"])
-            for attr in self._attr_list
-        ]
+    @staticmethod
+    def _build_derived_data(
+        compiled_arr_dict
+    ):
+        """
+        Builds the derived multi-attribute data structures from the compiled metadata arrays.
 
-        self._attr_full_name_to_idx_dict = {
-            attr_full_name: attr_idx
-            for attr_idx, attr_full_name in enumerate(self._attr_full_name_list)
-        }
+        :param compiled_arr_dict: dict of str -> numpy.ndarray
+            Compiled metadata arrays, indexed by array name.
 
-        #
+        :return: dict
+            Derived data structures, indexed by attribute name.
+        """
 
-        supattr_name_set = set()
-        self._supattr_name_list = []
-        
-        for attr in self._attr_list:
-            supattr_name, attr_name = attr["supattr_name"], attr["attr_name"]
-            if supattr_name not in supattr_name_set:
-                supattr_name_set.add(supattr_name)
-                self._supattr_name_list.append(supattr_name)
-
-        self._supattr_name_to_idx_dict = {
-            supattr_name: supattr_idx
-            for supattr_idx, supattr_name in enumerate(self._supattr_name_list)
-        }
+        attr_name_list = _decode_str_table(
+            compiled_arr_dict["attr_name_byte_arr"],
+            compiled_arr_dict["attr_name_offset_arr"]
+        )
+
+        supattr_name_list = _decode_str_table(
+            compiled_arr_dict["supattr_name_byte_arr"],
+            compiled_arr_dict["supattr_name_offset_arr"]
+        )
+
+        attr_supattr_idx_list = compiled_arr_dict["attr_supattr_idx_arr"].tolist()
+        attr_supattr_attr_idx_list = compiled_arr_dict["attr_supattr_attr_idx_arr"].tolist()
 
         #
 
-        self._supattr_size_list = [0 for _ in range(len(self._supattr_name_list))]
-        self._attr_idx_to_supattr_attr_idxs_list = []
-        self._supattr_attr_idxs_to_attr_idx_list_dict = [{} for _ in range(len(self._supattr_name_list))]
+        attr_full_name_list = [
+            "{:s} -> {:s}".format(supattr_name_list[supattr_idx], attr_name)
+            for attr_name, supattr_idx in zip(attr_name_list, attr_supattr_idx_list)
+        ]
 
-        for attr_idx, attr in enumerate(self._attr_list):
+        supattr_size_list = numpy.bincount(
+            compiled_arr_dict["attr_supattr_idx_arr"],
+            minlength=len(supattr_name_list)
+        ).tolist()
 
-            supattr_name = attr["supattr_name"]
-            supattr_idx = self._supattr_name_to_idx_dict[supattr_name]
+        attr_idx_to_supattr_attr_idxs_list = list(zip(attr_supattr_idx_list, attr_supattr_attr_idx_list))
 
-            supattr_attr_idx = self._supattr_size_list[supattr_idx]
-            self._attr_idx_to_supattr_attr_idxs_list.append((supattr_idx, supattr_attr_idx))
+        supattr_attr_idxs_to_attr_idx_list_dict = [{} for _ in range(len(supattr_name_list))]
+        for attr_idx, (supattr_idx, supattr_attr_idx) in enumerate(attr_idx_to_supattr_attr_idxs_list):
+            supattr_attr_idxs_to_attr_idx_list_dict[supattr_idx][supattr_attr_idx] = attr_idx
 
-            self._supattr_attr_idxs_to_attr_idx_list_dict[supattr_idx][supattr_attr_idx] = attr_idx
+        #
 
-            self._supattr_size_list[supattr_idx] += 1
+        return {
+            "attr_name_list": attr_name_list,
+            "attr_name_to_idx_dict": {
+                attr_name: attr_idx
+                for attr_idx, attr_name in enumerate(attr_name_list)
+            },
+            "attr_full_name_list": attr_full_name_list,
+            "attr_full_name_to_idx_dict": {
+                attr_full_name: attr_idx
+                for attr_idx, attr_full_name in enumerate(attr_full_name_list)
+            },
+            "supattr_name_list": supattr_name_list,
+            "supattr_name_to_idx_dict": {
+                supattr_name: supattr_idx
+                for supattr_idx, supattr_name in enumerate(supattr_name_list)
+            },
+            "supattr_size_list": supattr_size_list,
+            "attr_idx_to_supattr_attr_idxs_list": attr_idx_to_supattr_attr_idxs_list,
+            "supattr_attr_idxs_to_attr_idx_list_dict": supattr_attr_idxs_to_attr_idx_list_dict
+        }
 
 
     def generate_other_to_orig_attr_idx_mapping(
@@ -247,23 +683,25 @@ class MultiAttributeMetadata:
         
         num_bytes = 0
 
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_name_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_name_to_idx_dict)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_full_name_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_full_name_to_idx_dict)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._supattr_name_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._supattr_name_to_idx_dict)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._supattr_size_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._attr_idx_to_supattr_attr_idxs_list)
-        num_bytes += goripy.memory.get.get_obj_bytes(self._supattr_attr_idxs_to_attr_idx_list_dict)
+        num_bytes += get_obj_num_bytes(self._metadata_store.get("attr_list", None))
+        num_bytes += get_obj_num_bytes(self._attr_name_list)
+        num_bytes += get_obj_num_bytes(self._attr_name_to_idx_dict)
+        num_bytes += get_obj_num_bytes(self._attr_full_name_list)
+        num_bytes += get_obj_num_bytes(self._attr_full_name_to_idx_dict)
+        num_bytes += get_obj_num_bytes(self._supattr_name_list)
+        num_bytes += get_obj_num_bytes(self._supattr_name_to_idx_dict)
+        num_bytes += get_obj_num_bytes(self._supattr_size_list)
+        num_bytes += get_obj_num_bytes(self._attr_idx_to_supattr_attr_idxs_list)
+        num_bytes += get_obj_num_bytes(self._supattr_attr_idxs_to_attr_idx_list_dict)
 
         return num_bytes
 
 
     @property
     def attr_list(self):
-        return self._attr_list
+        if "attr_list" not in self._metadata_store:
+            self._metadata_store["attr_list"] = goripy.file.json.load_json(self._metadata_store["json_filename"])
+        return self._metadata_store["attr_list"]
 
     @property
     def attr_name_list(self):
@@ -293,6 +731,14 @@ class MultiAttributeMetadata:
     def supattr_attr_idxs_to_attr_idx_list_dict(self):
         return self._supattr_attr_idxs_to_attr_idx_list_dict
 
+    @property
+    def attr_supattr_idx_arr(self):
+        return self._attr_supattr_idx_arr
+
+    @property
+    def attr_supattr_attr_idx_arr(self):
+        return self._attr_supattr_attr_idx_arr
+
     def get_num_attrs(self):
         return len(self._attr_name_list)
 
@@ -329,7 +775,8 @@ class CategoryToMultiAttributeMask:
         self._cat_to_supattr_mask = numpy.load(
             os.path.join(metadata_dirname, "{:s}_cat_to_{:s}_multiattr_mask.npy".format(
                 cat_subset_name, multiattr_subset_name
-            ))
+            )),
+            mmap_mode="r"
         )
 
 
@@ -345,7 +792,7 @@ class CategoryToMultiAttributeMask:
         
         num_bytes = 0
 
-        num_bytes += goripy.memory.get.get_obj_bytes(self._cat_to_supattr_mask)
+        num_bytes += get_obj_num_bytes(self._cat_to_supattr_mask)
 
         return num_bytes
 